@@ -0,0 +1,67 @@
+"""
+Adaptive check intervals
+- every scan is one observation: (seconds since the previous check, changed?)
+- change rate λ = decayed changes / decayed observed time (Poisson),
+  seeded with a prior that reproduces the configured interval
+- next interval = -ln(1 - p) / λ → a change happens within one interval
+  with probability p; clamped to the site's min / max
+- an observed change halves the interval at once (recruitment bursts)
+"""
+
+import os
+import math
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ADAPTIVE_CHANGE_PROB = float(os.getenv("ADAPTIVE_CHANGE_PROB", "0.2"))
+ADAPTIVE_HALF_LIFE_DAYS = float(os.getenv("ADAPTIVE_HALF_LIFE_DAYS", "7"))
+ADAPTIVE_PRIOR_WEIGHT = 3       # prior is worth this many configured intervals
+
+_TARGET = -math.log(1 - min(max(ADAPTIVE_CHANGE_PROB, 0.01), 0.99))
+
+
+def bounds(site) -> tuple[int, int]:
+    low = max(1, site.min_interval or 60)
+    high = max(low, site.max_interval or low)
+    return low, high
+
+
+def current_interval(site) -> int:
+    """
+    Interval the scheduler should use for this site
+    """
+    if site.adaptive and site.effective_interval:
+        return site.effective_interval
+    return site.interval
+
+
+def observe(site, previous_check: int, now: int, changed: bool):
+    """
+    Folds one scan result into the site's change-rate estimate and
+    sets site.effective_interval
+    """
+    if not site.adaptive:
+        return
+
+    elapsed = now - (previous_check or 0)
+    if not previous_check or elapsed <= 0:
+        return
+
+    decay = 0.5 ** (elapsed / (ADAPTIVE_HALF_LIFE_DAYS * 86400))
+    site.changes_observed = (site.changes_observed or 0.0) * decay + (1.0 if changed else 0.0)
+    site.time_observed = (site.time_observed or 0.0) * decay + elapsed
+
+    base = max(1, site.interval or 300)
+    prior_time = ADAPTIVE_PRIOR_WEIGHT * base
+    prior_changes = ADAPTIVE_PRIOR_WEIGHT * _TARGET
+    rate = (site.changes_observed + prior_changes) / (site.time_observed + prior_time)
+    site.change_rate = rate
+
+    interval = _TARGET / rate
+    if changed:
+        interval = min(interval, (site.effective_interval or base) / 2)
+
+    low, high = bounds(site)
+    site.effective_interval = int(min(max(interval, low), high))
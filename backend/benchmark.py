@@ -0,0 +1,498 @@
+"""
+Offline benchmark
+- local stand-in government portal: notice boards with large tables and
+  PDF lists, slow pages, pages that change on a schedule, error pages
+- fake Telegram Bot API on the same server (alerts are timed, never sent)
+- drives scan_website directly ("scan") or the full scheduler →
+  check_website pipeline ("pipeline") against a throw-away database
+- reports scans/min, p50/p95/p99 latency, peak RSS, Chromium processes,
+  alert latency; results saved as JSON so runs can be compared
+
+Usage:
+    python benchmark.py --mode scan --sites 20 --concurrency 4 --duration 60
+    python benchmark.py --mode pipeline --sites 100 --concurrency 8 --interval 30
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BENCH_TOKEN = "bench-token"
+PDF_BYTES = b"%PDF-1.4\n% benchmark\n" + b"0" * 4096 + b"\n%%EOF\n"
+
+
+# =========================
+# STAND-IN PORTAL + FAKE TELEGRAM
+# =========================
+class Portal:
+    """
+    Page kinds by path:
+      /notice/<n>   static notice board (table + PDF links)
+      /changing/<n> gets a new revision every change_every seconds
+      /slow/<n>     notice board after slow_ms
+      /error/<n>    404 "page not found"
+      /pdf/<name>   small PDF
+      /bot<token>/<method>  fake Telegram Bot API
+    """
+
+    REVISION = re.compile(r"revision (\d+)")
+
+    def __init__(self, rows: int, change_every: float, slow_ms: int):
+        self.rows = rows
+        self.change_every = change_every
+        self.slow_ms = slow_ms
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.telegram = []          # (received_at, method, text)
+        self.alert_latencies = []   # seconds from page change to Telegram
+
+        self.server = None
+        self.base_url = ""
+
+    # ---------- pages ----------
+    def revision(self, now: float | None = None) -> int:
+        return int((now or time.time()) // self.change_every)
+
+    def notice_board(self, site: int, revision: int | None = None) -> str:
+        rows = []
+        for i in range(self.rows):
+            rows.append(
+                f"<tr><td>{i + 1}</td>"
+                f"<td>Notice {site}-{i}: recruitment of assistant posts, advt no. {1000 + i}</td>"
+                f"<td>{(i % 28) + 1:02d}-01-2026</td>"
+                f"<td><a href=\"/pdf/notice-{site}-{i}.pdf\">Download</a></td></tr>"
+            )
+
+        headline = "Latest vacancy (Bharti) and admit card notices"
+        if revision is not None:
+            headline += f"<p>Notice revision {revision} published</p>"
+
+        return (
+            "<html><head><title>Staff Selection Portal</title>"
+            "<script src=\"https://www.googletagmanager.com/gtag/js\"></script></head>"
+            f"<body><h1>Notice Board {site}</h1><div id=\"notice-table\">{headline}"
+            "<table><tr><th>#</th><th>Subject</th><th>Date</th><th>PDF</th></tr>"
+            + "".join(rows) +
+            "</table></div><footer>© Staff Selection Portal</footer></body></html>"
+        )
+
+    # ---------- telegram ----------
+    def record_telegram(self, method: str, text: str):
+        received = time.time()
+        with self.lock:
+            self.telegram.append((received, method, text))
+            match = self.REVISION.search(text or "")
+            if match:
+                changed_at = int(match.group(1)) * self.change_every
+                self.alert_latencies.append(received - changed_at)
+
+    # ---------- server ----------
+    def start(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type="text/html; charset=utf-8"):
+                data = body if isinstance(body, bytes) else body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                with portal.lock:
+                    portal.requests += 1
+
+                parts = urlparse(self.path).path.strip("/").split("/")
+                kind = parts[0] if parts else ""
+                site = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+
+                if kind == "notice":
+                    self._send(200, portal.notice_board(site))
+                elif kind == "changing":
+                    self._send(200, portal.notice_board(site, portal.revision()))
+                elif kind == "slow":
+                    time.sleep(portal.slow_ms / 1000)
+                    self._send(200, portal.notice_board(site))
+                elif kind == "error":
+                    self._send(404, "<html><body><h1>404 - Page not found</h1></body></html>")
+                elif kind == "pdf":
+                    self._send(200, PDF_BYTES, "application/pdf")
+                else:
+                    self._send(404, "not found", "text/plain")
+
+            def do_POST(self):
+                parts = urlparse(self.path).path.strip("/").split("/")
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+
+                if len(parts) == 2 and parts[0].startswith("bot"):
+                    text = ""
+                    content_type = self.headers.get("Content-Type", "")
+                    if content_type.startswith("application/x-www-form-urlencoded"):
+                        form = parse_qs(body.decode("utf-8", "replace"))
+                        text = (form.get("text") or form.get("caption") or [""])[0]
+                    else:
+                        # multipart (photo / document): only the caption matters
+                        match = re.search(rb'name="caption"\r\n\r\n(.*?)\r\n--', body, re.S)
+                        text = match.group(1).decode("utf-8", "replace") if match else ""
+                    portal.record_telegram(parts[1], text)
+                    self._send(200, '{"ok": true, "result": {}}', "application/json")
+                else:
+                    self._send(404, "not found", "text/plain")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name="portal", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+
+    def site_urls(self, count: int) -> list[tuple[str, str]]:
+        """
+        (kind, url) mix: 60% static, 20% changing, 10% slow, 10% error
+        """
+        kinds = ["notice"] * 6 + ["changing"] * 2 + ["slow", "error"]
+        return [
+            (kinds[i % len(kinds)], f"{self.base_url}/{kinds[i % len(kinds)]}/{i}")
+            for i in range(count)
+        ]
+
+
+# =========================
+# PROCESS SAMPLING (/proc, Linux)
+# =========================
+def _proc_table() -> dict:
+    """
+    pid → (ppid, name, rss_kb)
+    """
+    table = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+            name = stat[stat.index("(") + 1:stat.rindex(")")]
+            ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+            rss_kb = 0
+            with open(f"/proc/{entry}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss_kb = int(line.split()[1])
+                        break
+            table[int(entry)] = (ppid, name, rss_kb)
+        except (OSError, ValueError):
+            continue
+    return table
+
+
+def sample_processes() -> dict | None:
+    if not os.path.isdir("/proc"):
+        return None
+
+    table = _proc_table()
+    root = os.getpid()
+    tree = {root}
+    changed = True
+    while changed:
+        changed = False
+        for pid, (ppid, _, _) in table.items():
+            if ppid in tree and pid not in tree:
+                tree.add(pid)
+                changed = True
+
+    chromium = [p for p in tree if "chrom" in table.get(p, (0, "", 0))[1].lower()
+                or "headless_shell" in table.get(p, (0, "", 0))[1]]
+    return {
+        "rss_mb": sum(table[p][2] for p in tree if p in table) / 1024,
+        "chromium_processes": len(chromium),
+    }
+
+
+class Sampler:
+
+    def __init__(self, every: float = 0.5):
+        self.every = every
+        self.peak_rss_mb = 0.0
+        self.peak_chromium = 0
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="sampler", daemon=True)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            sample = sample_processes()
+            if sample is None:
+                return
+            self.samples += 1
+            self.peak_rss_mb = max(self.peak_rss_mb, sample["rss_mb"])
+            self.peak_chromium = max(self.peak_chromium, sample["chromium_processes"])
+            self._stop.wait(self.every)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(2)
+
+
+# =========================
+# REPORTING
+# =========================
+def percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def latency_summary(values: list[float]) -> dict:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+# =========================
+# ENVIRONMENT (before any backend module is imported)
+# =========================
+def prepare_environment(args, portal: Portal) -> str:
+    workdir = tempfile.mkdtemp(prefix="webmon-bench-")
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["TELEGRAM_BOT_TOKEN"] = BENCH_TOKEN
+    os.environ["TELEGRAM_CHAT_ID"] = "1"
+    os.environ["TELEGRAM_API_URL"] = portal.base_url
+    os.environ["SCAN_CONCURRENCY"] = str(args.concurrency)
+    os.environ["BROWSER_POOL_SIZE"] = str(args.browsers)
+    os.environ["PREFLIGHT_ENABLED"] = "0" if args.no_preflight else "1"
+    os.environ["FAST_SCAN_ENABLED"] = "0" if args.no_fast_scan else "1"
+
+    # outbox / pdfs / screenshots are created relative to the working dir
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.chdir(workdir)
+    return workdir
+
+
+# =========================
+# MODE: scan_website only
+# =========================
+def run_scan_mode(args, portal: Portal) -> dict:
+    from browser_service import scan_website
+    from browser_pool import get_pool, shutdown_pool, pool_stats
+
+    sites = portal.site_urls(args.sites)
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    deadline = time.time() + args.duration
+
+    get_pool().start()
+
+    def worker(offset: int):
+        nonlocal errors
+        i = offset
+        while time.time() < deadline:
+            kind, url = sites[i % len(sites)]
+            start = time.perf_counter()
+            result = scan_website(url, "bharti")
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if result.get("error") or result.get("page_hash") is None:
+                    errors += 1
+            i += args.concurrency
+
+    started = time.time()
+    worker_failures = []
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(worker, n) for n in range(args.concurrency)]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                # a dead worker (e.g. no Chromium) must not read as a clean zero
+                print("❌ Benchmark worker failed:", repr(e))
+                worker_failures.append(repr(e))
+    wall = time.time() - started
+
+    pool = pool_stats()
+    shutdown_pool()
+
+    return {
+        "scans": len(latencies),
+        "errors": errors + len(worker_failures),
+        "worker_failures": worker_failures,
+        "wall_seconds": wall,
+        "scans_per_minute": len(latencies) / wall * 60 if wall else 0,
+        "latency_seconds": latency_summary(latencies),
+        "browser_launches": pool.get("launches"),
+    }
+
+
+# =========================
+# MODE: scheduler → check_website pipeline
+# =========================
+def run_pipeline_mode(args, portal: Portal) -> dict:
+    import main
+    from database import SessionLocal, ensure_schema
+    from models import Website, WebsiteKeyword
+
+    ensure_schema()
+
+    db = SessionLocal()
+    try:
+        for i, (kind, url) in enumerate(portal.site_urls(args.sites)):
+            site = Website(
+                name=f"bench-{kind}-{i}",
+                url=url,
+                interval=args.interval,
+                keyword="",
+                keyword_found=False,
+                alert_sent=False,
+                wait_selector="#notice-table" if kind != "error" else None,
+            )
+            # static boards are keyword sites, changing boards full-page sites
+            if kind in ("notice", "slow"):
+                site.keyword = "admit card"
+                site.keywords = [WebsiteKeyword(keyword="admit card")]
+            db.add(site)
+        db.commit()
+    finally:
+        db.close()
+
+    latencies = []
+    lock = threading.Lock()
+    run_scan = main.scan_scheduler.run_scan
+
+    def timed_scan(site_id: int):
+        start = time.perf_counter()
+        try:
+            run_scan(site_id)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    main.scan_scheduler.run_scan = timed_scan
+    main.startup()
+
+    started = time.time()
+    time.sleep(args.duration)
+    wall = time.time() - started
+
+    scheduler = main.scan_scheduler.stats()
+    telegram = main.telegram_queue_stats()
+    pool = main.pool_stats()
+    main.shutdown()
+
+    return {
+        "scans": len(latencies),
+        "wall_seconds": wall,
+        "scans_per_minute": len(latencies) / wall * 60 if wall else 0,
+        "latency_seconds": latency_summary(latencies),
+        "scheduler_lag_max": scheduler["lag_max"],
+        "scheduler_lag_avg": scheduler["lag_avg"],
+        "scheduler_failed": scheduler["failed"],
+        "telegram_sent": telegram["sent"],
+        "browser_launches": pool.get("launches"),
+    }
+
+
+# =========================
+# ENTRY POINT
+# =========================
+def main():
+    parser = argparse.ArgumentParser(description="Website monitor offline benchmark")
+    parser.add_argument("--mode", choices=("scan", "pipeline"), default="scan")
+    parser.add_argument("--sites", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--browsers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--interval", type=int, default=30, help="pipeline: site interval (s)")
+    parser.add_argument("--rows", type=int, default=300, help="table rows per notice board")
+    parser.add_argument("--change-every", type=float, default=20, help="seconds between revisions")
+    parser.add_argument("--slow-ms", type=int, default=1500)
+    parser.add_argument("--no-preflight", action="store_true")
+    parser.add_argument("--no-fast-scan", action="store_true")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--out", default=os.path.join(BACKEND_DIR, "bench_results"))
+    args = parser.parse_args()
+
+    portal = Portal(args.rows, args.change_every, args.slow_ms).start()
+    workdir = prepare_environment(args, portal)
+    print(f"🏁 Benchmark ({args.mode}) → {portal.base_url}, workdir {workdir}")
+
+    sampler = Sampler().start()
+    try:
+        if args.mode == "scan":
+            results = run_scan_mode(args, portal)
+        else:
+            results = run_pipeline_mode(args, portal)
+    finally:
+        sampler.stop()
+        portal.stop()
+
+    report = {
+        "label": args.label,
+        "mode": args.mode,
+        "timestamp": int(time.time()),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "label")},
+        "results": results,
+        "peak_rss_mb": round(sampler.peak_rss_mb, 1) if sampler.samples else None,
+        "peak_chromium_processes": sampler.peak_chromium if sampler.samples else None,
+        "portal_requests": portal.requests,
+        "telegram_messages": len(portal.telegram),
+        "alert_latency_seconds": latency_summary(portal.alert_latencies),
+    }
+
+    os.makedirs(args.out, exist_ok=True)
+    name = f"{args.mode}-{time.strftime('%Y%m%d-%H%M%S')}{'-' + args.label if args.label else ''}.json"
+    path = os.path.join(args.out, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    lat = results["latency_seconds"]
+    print(
+        f"📊 {results['scans']} scans, {results['scans_per_minute']:.1f}/min | "
+        f"p50 {lat['p50'] or 0:.2f}s p95 {lat['p95'] or 0:.2f}s p99 {lat['p99'] or 0:.2f}s | "
+        f"peak RSS {report['peak_rss_mb']} MB, chromium {report['peak_chromium_processes']} | "
+        f"alerts {report['telegram_messages']}"
+    )
+    print("💾 Saved:", path)
+
+    failed = results.get("worker_failures") or results.get("scheduler_failed")
+    if failed or results["scans"] == results.get("errors", 0):
+        print("❌ Benchmark run failed (no successful scans or failed workers)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
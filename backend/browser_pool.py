@@ -0,0 +1,595 @@
+"""
+Persistent Chromium pool
+- a few warm browsers instead of one launch per scan
+- every browser is owned by its own worker thread (Playwright sync API is thread-bound)
+- jobs get a fresh page inside an isolated context
+- contexts are recycled after BROWSER_CONTEXT_MAX_PAGES pages,
+  browsers after BROWSER_MAX_PAGES pages
+- governor: hard wall-clock deadline per job, RSS cap per browser,
+  orphaned Chromium reaping, cap on concurrent renders
+"""
+
+import os
+import time
+import queue
+import signal
+import threading
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+
+from dotenv import load_dotenv
+from playwright.sync_api import sync_playwright
+
+from metrics import BROWSER_LAUNCH_SECONDS, BROWSER_GOVERNOR_ACTIONS, RENDER_SLOT_WAIT_SECONDS
+
+try:
+    import psutil
+except ImportError:      # optional: process table from /proc only (Linux)
+    psutil = None
+
+load_dotenv()
+
+# =========================
+# SETTINGS
+# =========================
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+CONTEXT_MAX_PAGES = int(os.getenv("BROWSER_CONTEXT_MAX_PAGES", "20"))
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "500"))
+
+LAUNCH_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-dev-shm-usage"
+]
+
+VIEWPORT = {"width": 1280, "height": 720}
+
+# governor
+SCAN_DEADLINE_SECONDS = float(os.getenv("SCAN_DEADLINE_SECONDS", "120"))
+BROWSER_MAX_RSS_MB = float(os.getenv("BROWSER_MAX_RSS_MB", "1024"))    # per browser process tree, 0 = off
+RENDER_MAX_CONCURRENT = int(os.getenv("RENDER_MAX_CONCURRENT", "0"))   # 0 = pool size
+GOVERNOR_INTERVAL = float(os.getenv("GOVERNOR_INTERVAL", "5"))
+WORKER_RESTART_SECONDS = float(os.getenv("BROWSER_WORKER_RESTART_SECONDS", "30"))
+
+# tags every browser we launch: --webmon-browser=<owner pid>-<browser>.<restart>-<launch>
+MARKER = "--webmon-browser="
+
+
+# =========================
+# PROCESS TABLE (/proc, Linux; psutil elsewhere)
+# =========================
+def _psutil_table() -> dict:
+    table = {}
+    for proc in psutil.process_iter(["pid", "ppid", "cmdline", "memory_info"]):
+        info = proc.info
+        if info["memory_info"] is None:
+            continue        # access denied
+        table[info["pid"]] = (info["ppid"], " ".join(info["cmdline"] or ()), info["memory_info"].rss // 1024)
+    return table
+
+
+def _proc_table() -> dict:
+    """
+    pid → (ppid, cmdline, rss_kb); empty where neither /proc nor psutil
+    is available
+    """
+    table = {}
+    if not os.path.isdir("/proc"):
+        return _psutil_table() if psutil is not None else table
+
+    page_kb = os.sysconf("SC_PAGE_SIZE") // 1024
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+            ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                cmdline = f.read().replace(b"\0", b" ").decode(errors="replace")
+            with open(f"/proc/{entry}/statm") as f:
+                rss_kb = int(f.read().split()[1]) * page_kb
+            table[int(entry)] = (ppid, cmdline, rss_kb)
+        except (OSError, ValueError, IndexError):
+            continue
+    return table
+
+
+def _tree(table: dict, root: int) -> list:
+    """
+    root + all its descendants (renderers, GPU / zygote helpers)
+    """
+    tree, frontier = [root], [root]
+    while frontier:
+        children = [pid for pid, (ppid, _, _) in table.items() if ppid in frontier]
+        tree.extend(children)
+        frontier = children
+    return tree
+
+
+def _find_marked(table: dict, marker: str | None) -> int | None:
+    if not marker:
+        return None
+    needle = MARKER + marker + " "
+    for pid, (_, cmdline, _) in table.items():
+        if needle in cmdline + " ":
+            return pid
+    return None
+
+
+def _kill(pids) -> int:
+    killed = 0
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            continue
+    return killed
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# =========================
+# WORKER (ONE BROWSER)
+# =========================
+class _BrowserWorker(threading.Thread):
+
+    def __init__(self, pool, index: int, restarts: int = 0):
+        super().__init__(name=f"browser-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+        self.restarts = restarts
+
+        # Playwright could not start / crashed in this thread → no more jobs here
+        self.dead = False
+        self.died_at = 0.0
+        self.error = None
+
+        self.playwright = None
+        self.browser = None
+        self.context = None
+
+        self.context_pages = 0
+        self.browser_pages = 0
+
+        # governor
+        self.marker = None          # tag of the running browser process
+        self.job = None             # (future, started) while a job runs
+        self.rss_mb = 0.0
+        self.recycle_requested = False
+        self.holds_slot = False     # render slot taken for the current job
+        self.retired = False        # replaced after a failed deadline kill
+
+        # stats
+        self.launches = 0
+        self.contexts_created = 0
+        self.pages_served = 0
+        self.deadline_kills = 0
+        self.rss_recycles = 0
+
+    # ---------- lifecycle ----------
+    def _launch(self):
+        # set before launching so the orphan reaper never takes a starting browser
+        self.marker = f"{os.getpid()}-{self.index}.{self.restarts}-{self.launches + 1}"
+        with BROWSER_LAUNCH_SECONDS.time():
+            self.browser = self.playwright.chromium.launch(
+                headless=True,
+                args=LAUNCH_ARGS + [MARKER + self.marker]
+            )
+        self.browser_pages = 0
+        self.launches += 1
+        print(f"🌐 Browser #{self.index} launched (launch {self.launches})")
+
+    def _close_context(self):
+        if self.context is not None:
+            try:
+                self.context.close()
+            except Exception:
+                pass
+        self.context = None
+        self.context_pages = 0
+
+    def _close_browser(self):
+        self._close_context()
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+        self.browser = None
+        self.marker = None
+        self.rss_mb = 0.0
+
+    def _new_page(self):
+        if self.browser is None or not self.browser.is_connected():
+            self._close_browser()
+            self._launch()
+
+        if self.context is None:
+            self.context = self.browser.new_context(viewport=VIEWPORT)
+            self.contexts_created += 1
+
+        page = self.context.new_page()
+        page.set_default_timeout(30000)
+        return page
+
+    def _release(self, page):
+        try:
+            page.close()
+        except Exception:
+            pass
+
+        self.pages_served += 1
+        self.context_pages += 1
+        self.browser_pages += 1
+
+        # ♻️ recycle browser / context after N pages (or if it died / grew too big)
+        if self.browser is None or not self.browser.is_connected():
+            self._close_browser()
+        elif self.recycle_requested:
+            self._recycle()
+        elif self.browser_pages >= BROWSER_MAX_PAGES:
+            self._close_browser()
+        elif self.context_pages >= CONTEXT_MAX_PAGES:
+            self._close_context()
+
+    def _recycle(self):
+        print(f"♻️ Browser #{self.index} over {BROWSER_MAX_RSS_MB:.0f} MB RSS ({self.rss_mb:.0f} MB) → recycling")
+        self.recycle_requested = False
+        self.rss_recycles += 1
+        BROWSER_GOVERNOR_ACTIONS.inc(action="rss_recycle")
+        self._close_browser()
+
+    # ---------- main loop ----------
+    def run(self):
+        try:
+            with sync_playwright() as p:
+                self.playwright = p
+                self._serve()
+        except Exception as e:
+            print(f"❌ Browser #{self.index} worker crashed:", repr(e))
+            self.error = e
+            self.pool._worker_died(self, e)
+
+    def _serve(self):
+        # 🔥 warm up before the first job arrives
+        try:
+            self._launch()
+        except Exception as e:
+            print(f"❌ Browser #{self.index} warm-up failed:", repr(e))
+
+        while True:
+            try:
+                job = self.pool._jobs.get(timeout=GOVERNOR_INTERVAL)
+            except queue.Empty:
+                # idle browsers over the RSS cap are recycled right away
+                if self.recycle_requested:
+                    self._recycle()
+                continue
+            if job is None:
+                break
+
+            fn, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with RENDER_SLOT_WAIT_SECONDS.time():
+                self.pool._render_slots.acquire()
+            self.holds_slot = True
+            try:
+                self._run_job(fn, future)
+            finally:
+                self.pool._free_slot(self)
+            if self.retired:
+                break
+
+        self._close_browser()
+
+    def _run_job(self, fn, future):
+        try:
+            page = self._new_page()
+        except BaseException as e:
+            self._close_browser()
+            _settle(future, error=e)
+            return
+
+        self.job = (future, time.monotonic())
+        try:
+            _settle(future, result=fn(page))
+        except BaseException as e:
+            _settle(future, error=e)
+        finally:
+            self.job = None
+            self._release(page)
+
+    # ---------- governor (called from the watchdog thread) ----------
+    def govern(self, table: dict, now: float):
+        root = _find_marked(table, self.marker)
+        tree = _tree(table, root) if root else []
+        self.rss_mb = sum(table[pid][2] for pid in tree if pid in table) / 1024
+
+        job = self.job
+        if job is not None and now - job[1] > SCAN_DEADLINE_SECONDS:
+            future = job[0]
+            if not future.done():
+                # ⏱️ free the caller first, then unstick the worker: killing
+                # Chromium makes the blocked Playwright call raise in its thread
+                self.deadline_kills += 1
+                BROWSER_GOVERNOR_ACTIONS.inc(action="deadline_kill")
+                _settle(future, error=FutureTimeout(f"scan exceeded {SCAN_DEADLINE_SECONDS:.0f}s deadline"))
+                killed = _kill(tree)
+                print(f"⏱️ Browser #{self.index} job over {SCAN_DEADLINE_SECONDS:.0f}s → killed {killed} processes")
+                if not killed:
+                    # browser not found (no process table) or not killable:
+                    # the thread may stay stuck, so its slot goes to a new worker
+                    self.pool._retire(self)
+                return
+
+        if BROWSER_MAX_RSS_MB and self.rss_mb > BROWSER_MAX_RSS_MB:
+            self.recycle_requested = True
+
+    def stats(self) -> dict:
+        return {
+            "browser": self.index,
+            "alive": self.is_alive(),
+            "dead": self.dead,
+            "restarts": self.restarts,
+            "error": repr(self.error) if self.error else None,
+            "connected": bool(self.browser and self.browser.is_connected()),
+            "launches": self.launches,
+            "contexts_created": self.contexts_created,
+            "pages_served": self.pages_served,
+            "pages_since_launch": self.browser_pages,
+            "rss_mb": round(self.rss_mb, 1),
+            "busy_seconds": round(time.monotonic() - self.job[1], 1) if self.job else None,
+            "deadline_kills": self.deadline_kills,
+            "rss_recycles": self.rss_recycles,
+            "retired": self.retired,
+        }
+
+
+def _settle(future: Future, result=None, error: BaseException | None = None):
+    # the watchdog may already have failed this job (deadline)
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+# =========================
+# POOL
+# =========================
+class BrowserPool:
+
+    def __init__(self, size: int = POOL_SIZE):
+        self.size = max(1, size)
+        self._jobs = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.render_limit = min(self.size, RENDER_MAX_CONCURRENT or self.size)
+        self._render_slots = threading.BoundedSemaphore(self.render_limit)
+        self._stop = threading.Event()
+        self._watchdog = threading.Thread(target=self._govern_loop, name="browser-governor", daemon=True)
+        self.orphans_killed = 0
+        self.workers_retired = 0
+        self.last_error = None
+
+    def start(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Browser pool is shut down")
+            if self._workers:
+                return
+            for i in range(self.size):
+                worker = _BrowserWorker(self, i)
+                worker.start()
+                self._workers.append(worker)
+            self._watchdog.start()
+
+    def run(self, fn, timeout: float | None = None):
+        """
+        Runs fn(page) on a warm browser and returns its result
+        """
+        self.start()
+        with self._lock:
+            if all(w.dead for w in self._workers):
+                raise RuntimeError(f"No browser worker is running (last error: {self.last_error!r})")
+        future = Future()
+        self._jobs.put((fn, future))
+        return future.result(timeout)
+
+    def shutdown(self, timeout: float = 10):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers = list(self._workers)
+
+        self._stop.set()
+        for _ in workers:
+            self._jobs.put(None)
+        for worker in workers:
+            worker.join(timeout)
+
+    # ---------- failed workers ----------
+    def _free_slot(self, worker):
+        # once per job: by the worker, or by _retire while it is stuck
+        with self._lock:
+            if not worker.holds_slot:
+                return
+            worker.holds_slot = False
+        self._render_slots.release()
+
+    def _retire(self, worker):
+        """
+        A worker stuck in a job the governor could not kill: its render slot
+        is released and a new worker takes its place; the old thread exits
+        if the job ever returns
+        """
+        with self._lock:
+            if worker.retired:
+                return
+            worker.retired = True
+            self.workers_retired += 1
+            replace = not self._closed and worker in self._workers
+            if replace:
+                replacement = _BrowserWorker(self, worker.index, worker.restarts + 1)
+                self._workers[self._workers.index(worker)] = replacement
+        BROWSER_GOVERNOR_ACTIONS.inc(action="retire")
+        print(f"🪦 Browser #{worker.index} could not be killed → retired, starting a replacement")
+        self._free_slot(worker)
+        if replace:
+            replacement.start()
+
+    def _worker_died(self, worker, error: Exception):
+        """
+        A worker whose Playwright is unusable stops taking jobs; the live
+        ones keep serving the queue. Queued jobs fail only when none is left.
+        """
+        with self._lock:
+            worker.dead = True
+            worker.died_at = time.monotonic()
+            self.last_error = error
+            if not all(w.dead for w in self._workers):
+                return
+
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                continue
+            fn, future = job
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def _restart_dead(self):
+        with self._lock:
+            if self._closed:
+                return
+            now = time.monotonic()
+            for i, worker in enumerate(self._workers):
+                if worker.dead and now - worker.died_at >= WORKER_RESTART_SECONDS:
+                    print(f"🔁 Restarting browser worker #{worker.index}")
+                    replacement = _BrowserWorker(self, worker.index, worker.restarts + 1)
+                    replacement.start()
+                    self._workers[i] = replacement
+
+    # ---------- governor ----------
+    def _govern_loop(self):
+        while not self._stop.wait(GOVERNOR_INTERVAL):
+            self._restart_dead()
+            try:
+                table = _proc_table()
+                now = time.monotonic()
+                for worker in list(self._workers):
+                    worker.govern(table, now)
+            except Exception as e:
+                print("❌ Browser governor error:", repr(e))
+
+    def reap_orphans(self) -> int:
+        """
+        Kills Chromium trees tagged by us that no live browser owns:
+        leftovers of a crashed worker, a failed close, or a dead server process
+        """
+        table = _proc_table()
+        me = os.getpid()
+        live = {w.marker for w in self._workers if w.marker}
+
+        killed = 0
+        for pid, (_, cmdline, _) in table.items():
+            if MARKER not in cmdline or " --type=" in cmdline:
+                continue
+            marker = cmdline.split(MARKER, 1)[1].split(" ", 1)[0]
+            try:
+                owner = int(marker.split("-", 1)[0])
+            except ValueError:
+                continue
+            if owner == me and marker in live:
+                continue
+            if owner != me and _alive(owner):
+                continue    # another monitor process on this host
+            killed += _kill(_tree(table, pid))
+
+        if killed:
+            self.orphans_killed += killed
+            BROWSER_GOVERNOR_ACTIONS.inc(killed, action="orphan_kill")
+            print(f"🧟 Killed {killed} orphaned Chromium processes")
+        return killed
+
+    def stats(self) -> dict:
+        browsers = [w.stats() for w in self._workers]
+        launches = sum(b["launches"] for b in browsers)
+        pages = sum(b["pages_served"] for b in browsers)
+
+        return {
+            "pool_size": self.size,
+            "workers_alive": sum(not b["dead"] for b in browsers),
+            "last_error": repr(self.last_error) if self.last_error else None,
+            "context_max_pages": CONTEXT_MAX_PAGES,
+            "browser_max_pages": BROWSER_MAX_PAGES,
+            "queued": self._jobs.qsize(),
+            "launches": launches,
+            "pages_served": pages,
+            "launches_avoided": max(0, pages - launches),
+            "render_limit": self.render_limit,
+            "scan_deadline_seconds": SCAN_DEADLINE_SECONDS,
+            "max_rss_mb": BROWSER_MAX_RSS_MB,
+            "rss_mb": round(sum(b["rss_mb"] for b in browsers), 1),
+            "deadline_kills": sum(b["deadline_kills"] for b in browsers),
+            "rss_recycles": sum(b["rss_recycles"] for b in browsers),
+            "orphans_killed": self.orphans_killed,
+            "workers_retired": self.workers_retired,
+            "browsers": browsers,
+        }
+
+
+# =========================
+# SHARED INSTANCE
+# =========================
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> BrowserPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+
+def shutdown_pool():
+    with _pool_lock:
+        pool = _pool
+    if pool is not None:
+        pool.shutdown()
+        print("🛑 Browser pool stopped")
+
+
+def pool_stats() -> dict:
+    with _pool_lock:
+        pool = _pool
+    if pool is None:
+        return {"pool_size": POOL_SIZE, "launches": 0, "pages_served": 0,
+                "launches_avoided": 0, "rss_mb": 0, "browsers": []}
+    return pool.stats()
+
+
+def reap_orphans() -> int:
+    return get_pool().reap_orphans()
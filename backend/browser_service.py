@@ -1,123 +1,435 @@
-from playwright.sync_api import sync_playwright
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urlparse
 import os
 import time
 import hashlib
 
-SCREENSHOT_DIR = "screenshots"
-os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from browser_pool import get_pool
+from metrics import phase, SCAN_PHASE_SECONDS
+from keyword_matcher import KeywordMatcher
+from normalizer import Normalizer, IDENTITY
+
+# =========================
+# FAST-SCAN PROFILE
+# =========================
+FAST_SCAN_ENABLED = os.getenv("FAST_SCAN_ENABLED", "1") == "1"
+
+READY_SELECTOR_MS = int(os.getenv("READY_SELECTOR_MS", "10000"))
+READY_NETWORKIDLE_MS = int(os.getenv("READY_NETWORKIDLE_MS", "3000"))
+READY_STABLE_MS = int(os.getenv("READY_STABLE_MS", "2000"))
+READY_POLL_MS = 250
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+
+TRACKER_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "facebook.net",
+    "connect.facebook.net",
+    "hotjar.com",
+    "clarity.ms",
+    "statcounter.com",
+    "addthis.com",
+    "sharethis.com",
+)
+
+
+# =========================
+# ONE-CALL DOM EXTRACTION
+# =========================
+# text + links + title + meta in a single round trip, optionally scoped to
+# include regions (CSS, or XPath with "xpath=" / "/" prefix) with exclude
+# regions hidden while reading (restored afterwards)
+EXTRACT_JS = """
+(opts) => {
+    const invalid = [];
+    const resolve = (sel) => {
+        try {
+            if (sel.startsWith("xpath=") || sel.startsWith("/") || sel.startsWith("(")) {
+                const xpath = sel.startsWith("xpath=") ? sel.slice(6) : sel;
+                const snap = document.evaluate(
+                    xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+                );
+                const nodes = [];
+                for (let i = 0; i < snap.snapshotLength; i++) {
+                    const node = snap.snapshotItem(i);
+                    if (node.nodeType === 1) nodes.push(node);
+                }
+                return nodes;
+            }
+            return Array.from(document.querySelectorAll(sel));
+        } catch (e) {
+            invalid.push(sel);
+            return [];
+        }
+    };
+
+    const hidden = [];
+    for (const sel of opts.exclude) {
+        for (const el of resolve(sel)) {
+            hidden.push([el, el.style.getPropertyValue("display"), el.style.getPropertyPriority("display")]);
+            el.style.setProperty("display", "none", "important");
+        }
+    }
+
+    try {
+        let roots = [];
+        const unmatched = [];
+        for (const sel of opts.include) {
+            const found = resolve(sel);
+            if (!found.length) unmatched.push(sel);
+            roots.push(...found);
+        }
+        const scoped = roots.length > 0;
+        if (!scoped) roots = document.body ? [document.body] : [];
+        roots = roots.filter((r, i) => roots.indexOf(r) === i && !roots.some((o) => o !== r && o.contains(r)));
+
+        const isHidden = (el) => hidden.some(([h]) => h.contains(el));
+        const links = [];
+        for (const root of roots) {
+            for (const a of root.querySelectorAll("a[href]")) {
+                if (!isHidden(a)) links.push(a.href);
+            }
+        }
+
+        const meta = {};
+        for (const m of document.querySelectorAll("meta[name], meta[property]")) {
+            const key = m.getAttribute("name") || m.getAttribute("property");
+            if (/^(description|keywords|og:title|og:updated_time|article:modified_time)$/i.test(key)) {
+                meta[key.toLowerCase()] = m.getAttribute("content") || "";
+            }
+        }
+        meta["last-modified"] = document.lastModified;
+
+        return {
+            text: roots.map((r) => r.innerText).join("\\n"),
+            links: links,
+            title: document.title,
+            meta: meta,
+            scoped: scoped,
+            unmatched: unmatched,
+            invalid: invalid,
+        };
+    } finally {
+        for (const [el, value, priority] of hidden) {
+            if (value) el.style.setProperty("display", value, priority);
+            else el.style.removeProperty("display");
+        }
+    }
+}
+"""
 
 
 def compute_hash(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
-def scan_website(
+def _is_tracker(url: str) -> bool:
+    host = urlparse(url).netloc.lower()
+    return any(host == t or host.endswith("." + t) for t in TRACKER_HOSTS)
+
+
+def _block_heavy_resources(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or _is_tracker(request.url):
+        route.abort()
+    else:
+        route.continue_()
+
+
+def _wait_text_stable(page):
+    """
+    Polls the body text length until it stops changing (capped)
+    """
+    deadline = time.time() + READY_STABLE_MS / 1000
+    last = None
+
+    while time.time() < deadline:
+        size = page.evaluate("() => document.body ? document.body.innerText.length : 0")
+        if size == last:
+            return
+        last = size
+        page.wait_for_timeout(READY_POLL_MS)
+
+
+# re-requests the images the fast profile aborted (same document, no navigation)
+_RELOAD_IMAGES_JS = """
+() => {
+    for (const img of document.images) {
+        if (img.complete && img.naturalWidth > 0) continue;
+        const src = img.getAttribute('src');
+        const srcset = img.getAttribute('srcset');
+        if (!src && !srcset) continue;
+        if (srcset) { img.removeAttribute('srcset'); img.setAttribute('srcset', srcset); }
+        if (src) { img.removeAttribute('src'); img.setAttribute('src', src); }
+    }
+}
+"""
+
+_IMAGES_DONE_JS = "() => Array.from(document.images).every(img => img.complete)"
+
+
+def _load_images(page):
+    """
+    Fast renders block images / fonts / media: lift the blocking and load
+    the page's images in place, so the alert screenshot shows the same
+    document the text was read from (blocked fonts stay on the fallback)
+    """
+    try:
+        page.unroute("**/*", _block_heavy_resources)
+        page.evaluate(_RELOAD_IMAGES_JS)
+        page.wait_for_function(_IMAGES_DONE_JS, timeout=READY_NETWORKIDLE_MS)
+    except PlaywrightTimeoutError:
+        pass    # screenshot what has loaded so far
+    except Exception as e:
+        print("⚠️ Loading images before screenshot failed:", repr(e))
+
+
+def wait_until_ready(page, wait_selector: str | None = None):
+    """
+    Replaces the fixed sleep:
+    1. per-site selector (if configured)
+    2. network idle (capped)
+    3. body text stable (capped)
+    """
+    if wait_selector:
+        try:
+            page.wait_for_selector(wait_selector, timeout=READY_SELECTOR_MS)
+            return
+        except PlaywrightTimeoutError:
+            print("⚠️ wait_selector not found, falling back:", wait_selector)
+
+    try:
+        page.wait_for_load_state("networkidle", timeout=READY_NETWORKIDLE_MS)
+    except PlaywrightTimeoutError:
+        pass
+
+    _wait_text_stable(page)
+
+
+def render_page(
     url: str,
-    keyword: str,
-    take_screenshot: bool = False   # ✅ default FALSE
-):
+    fast: bool = True,
+    wait_selector: str | None = None,
+    include_selectors: list[str] | None = None,
+    exclude_selectors: list[str] | None = None,
+    take_screenshot: bool = False,
+    capture_if=None
+) -> dict:
+    """
+    One page load → the raw material every check of this URL needs
+    (extracted text / links / title / meta, final URL, render time).
+    Nothing site-specific happens here, so one render can be evaluated
+    for several sites (evaluate_page).
+    - screenshot only when asked, or when capture_if(page_data) says yes
+      while the page is still open
+    - fast profile: no images / media / fonts / trackers
+      (explicit screenshot scans always load everything; a detecting fast
+      render lifts the blocking and loads the images in place before its
+      screenshot, no second navigation)
+    """
+    block_resources = fast and FAST_SCAN_ENABLED and not take_screenshot
+
+    page_data = {
+        "url": url,
+        "text": None,               # raw text of the watched region
+        "links": [],
+        "title": None,
+        "meta": {},
+        "final_url": None,
+        "render_ms": None,          # goto → page ready
+        "screenshot_png": None,
+        "error": None,
+    }
+
+    regions = {
+        "include": [s for s in (include_selectors or []) if s and s.strip()],
+        "exclude": [s for s in (exclude_selectors or []) if s and s.strip()],
+    }
+
+    domain = urlparse(url).netloc.lower()
+    submitted = time.perf_counter()
+
+    def _render(page):
+        # ⏱️ queue wait + page / context creation
+        SCAN_PHASE_SECONDS.observe(time.perf_counter() - submitted, phase="acquire", domain=domain)
+
+        try:
+            if block_resources:
+                page.route("**/*", _block_heavy_resources)
+
+            # ⚡ Fast load + smart readiness (no fixed sleep)
+            render_start = time.perf_counter()
+            with phase("goto", domain):
+                page.goto(url, wait_until="domcontentloaded")
+            with phase("ready", domain):
+                wait_until_ready(page, wait_selector)
+            page_data["render_ms"] = int((time.perf_counter() - render_start) * 1000)
+
+            page_data["final_url"] = page.url
+
+            # 📦 single round trip: text + links + title + meta
+            with phase("extract", domain):
+                extracted = page.evaluate(EXTRACT_JS, regions)
+
+            for selector in extracted["invalid"]:
+                print("⚠️ Invalid region selector ignored:", selector)
+            if regions["include"] and not extracted["scoped"]:
+                print("⚠️ Include selectors matched nothing, using the whole page:", url)
+
+            page_data["text"] = extracted["text"] or ""
+            page_data["links"] = extracted["links"]
+            page_data["title"] = extracted["title"]
+            page_data["meta"] = extracted["meta"]
+
+            # =========================
+            # 📸 SCREENSHOT (requested OR detection in this render)
+            # =========================
+            if take_screenshot or (capture_if and capture_if(page_data)):
+                # raw PNG bytes → screenshot_store decides what hits the disk
+                with phase("screenshot", domain):
+                    if block_resources:
+                        _load_images(page)
+                    page_data["screenshot_png"] = page.screenshot()
+
+        except Exception as e:
+            page_data["error"] = repr(e)
+            print("❌ WEBSITE SCAN ERROR:", repr(e))
+
+    # ♻️ warm browser from the pool (no launch per scan)
+    get_pool().run(_render)
+    return page_data
+
+
+def evaluate_page(
+    page_data: dict,
+    matcher: KeywordMatcher | None = None,
+    normalizer: Normalizer | None = None
+) -> dict:
     """
-    Fast website scan:
-    - keyword detection (optional)
-    - page hash (for full-page change detection)
+    One site's view of a render:
+    - page hash (for full-page change detection), taken after the
+      normalizer masked counters / clocks / tokens
+    - keyword detection (optional): one pass for the whole keyword set
     - pdf links
-    - screenshot ONLY when explicitly asked
+    Error pages keep their hash but report no keywords / links.
     """
+    domain = urlparse(page_data["url"]).netloc.lower()
 
     result = {
         "found": False,
         "context": None,
+        "matches": {},              # keyword → context line
         "pdf_links": [],
-        "screenshot": None,
-        "final_url": None,
+        "screenshot_png": page_data["screenshot_png"],
+        "final_url": page_data["final_url"],
         "page_hash": None,          # ✅ IMPORTANT
+        "text": None,               # normalized lines (snapshots / diffs)
+        "render_ms": page_data["render_ms"],
+        "title": page_data["title"],
+        "meta": page_data["meta"],
+        "error": page_data["error"],
+        "error_page": False,
     }
+    if page_data["error"] or page_data["text"] is None:
+        return result
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=True,
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--disable-gpu",
-                "--no-sandbox",
-                "--disable-dev-shm-usage"
-            ]
-        )
+    body_text = page_data["text"]
+    body_lower = body_text.lower()
 
-        page = browser.new_page()
-        page.set_viewport_size({"width": 1280, "height": 720})
-        page.set_default_timeout(30000)
+    # =========================
+    # 🔐 PAGE HASH (ALWAYS)
+    # =========================
+    with phase("hash", domain):
+        result["page_hash"] = (normalizer or IDENTITY).fingerprint(body_text)
+        result["text"] = "\n".join(
+            " ".join(line.split()) for line in body_text.splitlines() if line.strip()
+        )
 
-        try:
-            # ⚡ Fast load
-            page.goto(url, wait_until="domcontentloaded")
-            time.sleep(2)
+    # =========================
+    # ⛔ IGNORE ERROR PAGES
+    # =========================
+    error_phrases = [
+        "default error",
+        "aspxerrorpath",
+        "page not found",
+        "404",
+        "error occurred"
+    ]
 
-            result["final_url"] = page.url
+    for phrase in error_phrases:
+        if phrase in body_lower:
+            print("⛔ ERROR PAGE DETECTED — SKIPPED CONTENT")
+            result["error_page"] = True
+            return result   # hash already set ✔
 
-            body_text = page.inner_text("body")
-            body_lower = body_text.lower()
+    # =========================
+    # 🔑 KEYWORD DETECTION (ONLY if keywords provided)
+    # =========================
+    if matcher:
+        with phase("keywords", domain):
+            result["matches"] = matcher.match(body_text)
+        if result["matches"]:
+            result["found"] = True
+            result["context"] = next(iter(result["matches"].values()))
 
-            # =========================
-            # 🔐 PAGE HASH (ALWAYS)
-            # =========================
-            clean_text = " ".join(body_text.split())
-            result["page_hash"] = compute_hash(clean_text)
+    # =========================
+    # 📄 PDF LINKS
+    # =========================
+    # (hrefs are already absolute, resolved by the browser)
+    seen = set()
+    for full_url in page_data["links"]:
+        path = urlparse(full_url).path.lower()
+        if path.endswith(".pdf") and full_url not in seen:
+            seen.add(full_url)
+            result["pdf_links"].append(full_url)
 
-            # =========================
-            # ⛔ IGNORE ERROR PAGES
-            # =========================
-            error_phrases = [
-                "default error",
-                "aspxerrorpath",
-                "page not found",
-                "404",
-                "error occurred"
-            ]
-
-            for phrase in error_phrases:
-                if phrase in body_lower:
-                    print("⛔ ERROR PAGE DETECTED — SKIPPED CONTENT")
-                    return result   # hash already set ✔
-
-            # =========================
-            # 🔑 KEYWORD DETECTION (ONLY if keyword provided)
-            # =========================
-            if keyword:
-                for line in body_text.splitlines():
-                    if keyword.lower() in line.lower():
-                        result["found"] = True
-                        result["context"] = line.strip()[:300]
-                        break
+    return result
 
-            # =========================
-            # 📄 PDF LINKS
-            # =========================
-            seen = set()
-            for link in page.query_selector_all("a"):
-                href = link.get_attribute("href")
-                if not href:
-                    continue
 
-                full_url = urljoin(result["final_url"], href)
-                if full_url.lower().endswith(".pdf") and full_url not in seen:
-                    seen.add(full_url)
-                    result["pdf_links"].append(full_url)
+def scan_website(
+    url: str,
+    keyword: str,
+    take_screenshot: bool = False,  # ✅ default FALSE
+    capture_if=None,
+    fast: bool = True,
+    wait_selector: str | None = None,
+    matcher: KeywordMatcher | None = None,
+    include_selectors: list[str] | None = None,
+    exclude_selectors: list[str] | None = None,
+    normalizer: Normalizer | None = None
+):
+    """
+    Fast website scan for one site: render_page + evaluate_page
+    - optional include / exclude regions (CSS or XPath): hash, keywords and
+      pdf links only look at the watched region
+    - keyword detection: the matcher, or the single legacy keyword
+    - screenshot ONLY when explicitly asked, or when capture_if(result)
+      says the render is a positive detection (same page, no second load)
+    """
+    if matcher is None and keyword:
+        matcher = KeywordMatcher([(keyword, False, False)])
 
-            # =========================
-            # 📸 SCREENSHOT (ONLY when requested)
-            # =========================
-            if take_screenshot:
-                domain = urlparse(result["final_url"]).netloc.replace(".", "_")
-                filename = f"{SCREENSHOT_DIR}/{domain}_{int(time.time())}.png"
-                page.screenshot(path=filename)
-                result["screenshot"] = filename
+    evaluated = {}
 
-        except Exception as e:
-            print("❌ WEBSITE SCAN ERROR:", repr(e))
+    def _capture(page_data):
+        evaluated["result"] = evaluate_page(page_data, matcher, normalizer)
+        return not evaluated["result"]["error_page"] and capture_if(evaluated["result"])
 
-        finally:
-            browser.close()
+    page_data = render_page(
+        url,
+        fast=fast,
+        wait_selector=wait_selector,
+        include_selectors=include_selectors,
+        exclude_selectors=exclude_selectors,
+        take_screenshot=take_screenshot,
+        capture_if=_capture if capture_if else None
+    )
 
+    result = evaluated.get("result") or evaluate_page(page_data, matcher, normalizer)
+    result["screenshot_png"] = page_data["screenshot_png"]
+    result["error"] = page_data["error"]
     return result
@@ -0,0 +1,80 @@
+"""
+Per-site circuit breaker
+- closed    → normal checks; failures are counted
+- open      → BREAKER_FAILURE_THRESHOLD failures in a row: no renders until
+              breaker_open_until (exponential backoff, capped)
+- half_open → one probe after the backoff: success closes, failure re-opens
+              with a longer backoff
+- one "down" alert when the breaker opens, one "recovered" when it closes
+"""
+
+import os
+import random
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))
+BREAKER_BASE_BACKOFF = int(os.getenv("BREAKER_BASE_BACKOFF", "300"))
+BREAKER_MAX_BACKOFF = int(os.getenv("BREAKER_MAX_BACKOFF", "21600"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def backoff(site) -> int:
+    """
+    Seconds until the next probe: doubles with every failure past the
+    threshold, never shorter than the site's own interval, ±10% jitter
+    """
+    extra = max(0, (site.consecutive_failures or 0) - BREAKER_FAILURE_THRESHOLD)
+    base = max(BREAKER_BASE_BACKOFF, site.interval or 0)
+    delay = min(base * 2 ** min(extra, 20), max(BREAKER_MAX_BACKOFF, base))
+    return int(delay * random.uniform(0.9, 1.1))
+
+
+def allow(site, now: int) -> bool:
+    """
+    False while the breaker is open; the first check after the backoff
+    becomes the half-open probe
+    """
+    if site.breaker_state == OPEN:
+        if now < (site.breaker_open_until or 0):
+            return False
+        site.breaker_state = HALF_OPEN
+    return True
+
+
+def record_failure(site, now: int, error: str | None) -> str | None:
+    """
+    Returns "opened" when this failure opened the breaker (send the down alert)
+    """
+    site.consecutive_failures = (site.consecutive_failures or 0) + 1
+    site.last_error = (error or "")[:500] or None
+    if not site.down_since:
+        site.down_since = now
+
+    if site.breaker_state == HALF_OPEN:
+        site.breaker_state = OPEN
+        site.breaker_open_until = now + backoff(site)
+        return None
+
+    if site.breaker_state != OPEN and site.consecutive_failures >= BREAKER_FAILURE_THRESHOLD:
+        site.breaker_state = OPEN
+        site.breaker_open_until = now + backoff(site)
+        return "opened"
+    return None
+
+
+def record_success(site, now: int) -> int | None:
+    """
+    Returns when the outage began if the breaker had been open
+    (send the recovery alert), else None
+    """
+    was_open = site.breaker_state in (OPEN, HALF_OPEN)
+    outage_start = site.down_since or now
+    site.breaker_state = CLOSED
+    site.consecutive_failures = 0
+    site.breaker_open_until = 0
+    site.down_since = None
+    return outage_start if was_open else None
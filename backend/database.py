@@ -1,13 +1,33 @@
-from sqlalchemy import create_engine
+import os
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-DATABASE_URL = "sqlite:///./database.db"
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./database.db")
 
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False}
 )
 
+
+# =========================
+# SQLITE TUNING (WAL → API reads never wait on scan writes)
+# =========================
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")      # safe with WAL, far fewer fsyncs
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-20000")       # ~20 MB page cache
+    cursor.close()
+
+
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
@@ -15,3 +35,66 @@ SessionLocal = sessionmaker(
 )
 
 Base = declarative_base()
+
+
+# =========================
+# SCHEMA UPGRADE (create_all never alters existing tables)
+# =========================
+def _sql_default(column):
+    default = column.default
+    if default is None or not default.is_scalar:
+        return None
+
+    value = default.arg
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _drop_duplicates(conn, table: str, columns: list[str]):
+    """
+    Keeps the oldest row of each duplicate group so a new unique index can
+    be created on an older database
+    """
+    cols = ", ".join(columns)
+    removed = conn.exec_driver_sql(
+        f"DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY {cols})"
+    ).rowcount
+    if removed:
+        print(f"🛠️ Removed {removed} duplicate rows from {table} ({cols})")
+
+
+def ensure_schema():
+    """
+    Creates missing tables, then adds columns / indexes that
+    an older database.db does not have yet
+    """
+    Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                sql = (
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                    f"{column.type.compile(dialect=engine.dialect)}"
+                )
+                default = _sql_default(column)
+                if default is not None:
+                    sql += f" DEFAULT {default}"
+
+                conn.exec_driver_sql(sql)
+                print(f"🛠️ Added column {table.name}.{column.name}")
+
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.unique and index.name not in existing_indexes:
+                    _drop_duplicates(conn, table.name, [c.name for c in index.columns])
+                index.create(conn, checkfirst=True)
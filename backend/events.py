@@ -0,0 +1,113 @@
+"""
+In-process event broadcaster (dashboard live updates over SSE)
+- the scan pipeline / API publish small events from any thread
+- every connected client has its own bounded asyncio queue
+- a client that falls behind gets its buffer replaced by one "resync"
+  event (it reloads the site list) instead of blocking the publisher
+- version counts published events
+- events only reach clients of the same worker process: the dashboard
+  also revalidates the site list on a slow poll (version ETag → 304)
+- scan results (status, timings, breaker) are delivered only here, the
+  site list ETag ignores them
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EVENTS_BUFFER = int(os.getenv("EVENTS_BUFFER", "256"))
+EVENTS_PING_SECONDS = float(os.getenv("EVENTS_PING_SECONDS", "15"))
+
+
+class _Subscriber:
+
+    def __init__(self, loop, size: int):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=size)
+        self.overflows = 0
+
+    def push(self, event: dict):
+        # runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflows += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"id": event["id"], "type": "resync", "ts": event["ts"]})
+
+
+class EventBroadcaster:
+
+    def __init__(self, buffer: int = EVENTS_BUFFER):
+        self.buffer = buffer
+        self.version = 0
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+        # stats
+        self.published = 0
+        self.dropped = 0        # subscriber loop already closed
+
+    def publish(self, event_type: str, /, **data):
+        with self._lock:
+            self.version += 1
+            self.published += 1
+            event = {"id": self.version, "type": event_type, "ts": int(time.time()), **data}
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.push, event)
+            except RuntimeError:
+                self.dropped += 1
+                self.unsubscribe(sub)
+
+    def subscribe(self) -> _Subscriber:
+        sub = _Subscriber(asyncio.get_running_loop(), self.buffer)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: _Subscriber):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    async def stream(self, request):
+        """
+        SSE body for one client: events as they come, a comment line as
+        keep-alive, ends when the client disconnects
+        """
+        sub = self.subscribe()
+        try:
+            yield f"retry: 3000\nevent: hello\ndata: {json.dumps({'version': self.version})}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), EVENTS_PING_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "buffer": self.buffer,
+            "version": self.version,
+            "published": self.published,
+            "overflows": sum(s.overflows for s in subscribers),
+            "dropped": self.dropped,
+        }
+
+
+events = EventBroadcaster()
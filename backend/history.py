@@ -0,0 +1,295 @@
+"""
+Scan history (append-only, bounded)
+- every check is one compact row: time, duration, status, changed
+- minute / hour / day rollups are updated incrementally in the same
+  write-behind transaction (batched with the scan state)
+- durations go into log-scale buckets → percentiles come from the
+  rollups, raw rows are never scanned for a query
+- retention per level keeps the store bounded
+"""
+
+import os
+import math
+import time
+import threading
+
+from dotenv import load_dotenv
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import SessionLocal
+from models import ScanResult, ScanRollup
+
+load_dotenv()
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+RESOLUTIONS = (MINUTE, HOUR, DAY)
+
+# seconds each level is kept
+RETENTION = {
+    "raw": float(os.getenv("HISTORY_RAW_DAYS", "3")) * DAY,
+    MINUTE: float(os.getenv("HISTORY_MINUTE_DAYS", "1")) * DAY,
+    HOUR: float(os.getenv("HISTORY_HOUR_DAYS", "60")) * DAY,
+    DAY: float(os.getenv("HISTORY_DAY_DAYS", "400")) * DAY,
+}
+
+HISTORY_MAX_BUCKETS = 500               # finest resolution that stays under this is used
+UP_STATUSES = ("rendered", "skipped")   # render_error / error count as down
+
+BUCKETS_PER_DOUBLING = 4                # ~19% wide latency buckets
+
+
+def latency_bucket(ms: float) -> int:
+    return int(math.floor(math.log2(max(ms, 1)) * BUCKETS_PER_DOUBLING))
+
+
+def bucket_value(index: int) -> float:
+    """
+    Geometric middle of a latency bucket (ms)
+    """
+    return 2 ** ((index + 0.5) / BUCKETS_PER_DOUBLING)
+
+
+# =========================
+# RECORDER (state_writer flush hook)
+# =========================
+class HistoryRecorder:
+
+    def __init__(self):
+        self._results = []
+        self._lock = threading.Lock()
+
+        # stats
+        self.recorded = 0
+        self.rollups_written = 0
+
+    def record(self, site_id: int, ts: int, duration_ms, status: str, changed: bool):
+        with self._lock:
+            self._results.append({
+                "website_id": site_id,
+                "ts": int(ts),
+                "duration_ms": int(duration_ms or 0),
+                "status": status,
+                "changed": bool(changed),
+            })
+            self.recorded += 1
+
+    def discard(self, site_id: int):
+        with self._lock:
+            self._results = [r for r in self._results if r["website_id"] != site_id]
+
+    # --- hook protocol: take → write(db) → (restore on failure) ---
+    def take(self):
+        with self._lock:
+            results, self._results = self._results, []
+        return results
+
+    def restore(self, results):
+        with self._lock:
+            self._results = results + self._results
+
+    def write(self, db, results):
+        db.bulk_insert_mappings(ScanResult, results)
+
+        # 📊 fold the batch into in-memory deltas, one per rollup row
+        deltas = {}
+        for r in results:
+            for resolution in RESOLUTIONS:
+                key = (r["website_id"], resolution, r["ts"] - r["ts"] % resolution)
+                d = deltas.get(key)
+                if d is None:
+                    d = deltas[key] = {
+                        "count": 0, "up_count": 0, "changed_count": 0,
+                        "duration_sum": 0, "duration_min": None, "duration_max": None,
+                        "histogram": {},
+                    }
+                ms = r["duration_ms"]
+                d["count"] += 1
+                d["up_count"] += r["status"] in UP_STATUSES
+                d["changed_count"] += r["changed"]
+                d["duration_sum"] += ms
+                d["duration_min"] = ms if d["duration_min"] is None else min(d["duration_min"], ms)
+                d["duration_max"] = ms if d["duration_max"] is None else max(d["duration_max"], ms)
+                index = str(latency_bucket(ms))
+                d["histogram"][index] = d["histogram"].get(index, 0) + 1
+
+        # merge with the stored rows (read + upsert inside this transaction)
+        existing = {}
+        keys = list(deltas)
+        for start in range(0, len(keys), 300):
+            chunk = keys[start:start + 300]
+            rows = db.query(ScanRollup).filter(
+                tuple_(ScanRollup.website_id, ScanRollup.resolution, ScanRollup.bucket).in_(chunk)
+            )
+            for row in rows:
+                existing[(row.website_id, row.resolution, row.bucket)] = row
+
+        values = []
+        for key, d in deltas.items():
+            old = existing.get(key)
+            if old is not None:
+                d["count"] += old.count or 0
+                d["up_count"] += old.up_count or 0
+                d["changed_count"] += old.changed_count or 0
+                d["duration_sum"] += old.duration_sum or 0
+                if old.duration_min is not None:
+                    d["duration_min"] = min(d["duration_min"], old.duration_min)
+                if old.duration_max is not None:
+                    d["duration_max"] = max(d["duration_max"], old.duration_max)
+                for index, count in (old.histogram or {}).items():
+                    d["histogram"][index] = d["histogram"].get(index, 0) + count
+            values.append({"website_id": key[0], "resolution": key[1], "bucket": key[2], **d})
+
+        for start in range(0, len(values), 300):
+            stmt = sqlite_insert(ScanRollup).values(values[start:start + 300])
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=["website_id", "resolution", "bucket"],
+                set_={
+                    column: stmt.excluded[column]
+                    for column in ("count", "up_count", "changed_count", "duration_sum",
+                                   "duration_min", "duration_max", "histogram")
+                }
+            ))
+        self.rollups_written += len(values)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._results)
+        return {
+            "pending": pending,
+            "recorded": self.recorded,
+            "rollups_written": self.rollups_written,
+            "retention_days": {str(k): v / DAY for k, v in RETENTION.items()},
+        }
+
+
+recorder = HistoryRecorder()
+
+
+# =========================
+# QUERIES (rollups only)
+# =========================
+def pick_resolution(start: int, end: int, now: int | None = None) -> int:
+    """
+    Finest level that still covers start (retention) and stays under
+    HISTORY_MAX_BUCKETS buckets
+    """
+    now = now or int(time.time())
+    for resolution in RESOLUTIONS:
+        if start < now - RETENTION[resolution]:
+            continue
+        if (end - start) / resolution <= HISTORY_MAX_BUCKETS:
+            return resolution
+    return DAY
+
+
+def _percentiles(histogram: dict, total: int, points=(50, 90, 95, 99)) -> dict:
+    result = {f"p{p}": None for p in points}
+    if not total:
+        return result
+    ordered = sorted((int(i), c) for i, c in histogram.items())
+    for p in points:
+        rank = math.ceil(total * p / 100)
+        seen = 0
+        for index, count in ordered:
+            seen += count
+            if seen >= rank:
+                result[f"p{p}"] = round(bucket_value(index))
+                break
+    return result
+
+
+def _summary(rows) -> dict:
+    count = sum(r.count or 0 for r in rows)
+    up = sum(r.up_count or 0 for r in rows)
+    histogram = {}
+    for r in rows:
+        for index, c in (r.histogram or {}).items():
+            histogram[index] = histogram.get(index, 0) + c
+    mins = [r.duration_min for r in rows if r.duration_min is not None]
+    maxs = [r.duration_max for r in rows if r.duration_max is not None]
+    return {
+        "checks": count,
+        "up": up,
+        "uptime": round(up / count, 5) if count else None,
+        "changes": sum(r.changed_count or 0 for r in rows),
+        "avg_ms": round(sum(r.duration_sum or 0 for r in rows) / count) if count else None,
+        "min_ms": min(mins) if mins else None,
+        "max_ms": max(maxs) if maxs else None,
+        **_percentiles(histogram, count),
+    }
+
+
+def _rollups(db, resolution: int, start: int, end: int, site_ids=None):
+    query = db.query(ScanRollup).filter(
+        ScanRollup.resolution == resolution,
+        ScanRollup.bucket >= start - start % resolution,
+        ScanRollup.bucket < end,
+    )
+    if site_ids is not None:
+        query = query.filter(ScanRollup.website_id.in_(site_ids))
+    return query.all()
+
+
+def summarize(site_ids, start: int, end: int) -> dict:
+    """
+    {site_id: summary} for the range (bucket-aligned at the chosen resolution);
+    site_ids None → every site with history
+    """
+    resolution = pick_resolution(start, end)
+    db = SessionLocal()
+    try:
+        rows = _rollups(db, resolution, start, end, site_ids)
+    finally:
+        db.close()
+
+    by_site = {site_id: [] for site_id in site_ids or ()}
+    for r in rows:
+        by_site.setdefault(r.website_id, []).append(r)
+    return {
+        "resolution": resolution,
+        "sites": {site_id: _summary(site_rows) for site_id, site_rows in by_site.items()},
+    }
+
+
+def series(site_id: int, start: int, end: int, resolution: int | None = None) -> dict:
+    resolution = resolution if resolution in RESOLUTIONS else pick_resolution(start, end)
+    db = SessionLocal()
+    try:
+        rows = sorted(_rollups(db, resolution, start, end, [site_id]), key=lambda r: r.bucket)
+    finally:
+        db.close()
+    return {
+        "resolution": resolution,
+        "points": [{"t": r.bucket, **_summary([r])} for r in rows],
+    }
+
+
+# =========================
+# RETENTION / CLEANUP
+# =========================
+def enforce_retention():
+    now = int(time.time())
+    db = SessionLocal()
+    try:
+        removed = db.query(ScanResult).filter(
+            ScanResult.ts < now - RETENTION["raw"]
+        ).delete(synchronize_session=False)
+        for resolution in RESOLUTIONS:
+            removed += db.query(ScanRollup).filter(
+                ScanRollup.resolution == resolution,
+                ScanRollup.bucket < now - RETENTION[resolution]
+            ).delete(synchronize_session=False)
+        db.commit()
+        if removed:
+            print(f"🧹 History retention removed {removed} rows")
+    finally:
+        db.close()
+
+
+def delete_history(db, site_ids):
+    site_ids = list(site_ids)
+    if not site_ids:
+        return
+    db.query(ScanResult).filter(ScanResult.website_id.in_(site_ids)).delete(synchronize_session=False)
+    db.query(ScanRollup).filter(ScanRollup.website_id.in_(site_ids)).delete(synchronize_session=False)
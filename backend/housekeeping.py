@@ -0,0 +1,78 @@
+"""
+Background housekeeping
+- periodic maintenance jobs (log compaction, ...) on one daemon thread
+- jobs never run inside the scan / request path
+"""
+
+import threading
+import time
+
+_jobs = []
+_lock = threading.Lock()
+_wake = threading.Event()
+_thread = None
+_stop = False
+
+
+def register(name: str, interval: float, fn, run_at_start: bool = False):
+    with _lock:
+        _jobs.append({
+            "name": name,
+            "interval": interval,
+            "fn": fn,
+            "next_run": 0.0 if run_at_start else time.time() + interval,
+            "runs": 0,
+            "last_duration": 0.0,
+            "last_error": None,
+        })
+    _wake.set()
+
+
+def _loop():
+    while not _stop:
+        now = time.time()
+        with _lock:
+            due = [job for job in _jobs if job["next_run"] <= now]
+
+        for job in due:
+            started = time.time()
+            try:
+                job["fn"]()
+                job["last_error"] = None
+            except Exception as e:
+                job["last_error"] = repr(e)
+                print(f"❌ Housekeeping job '{job['name']}' failed:", repr(e))
+            job["runs"] += 1
+            job["last_duration"] = round(time.time() - started, 3)
+            job["next_run"] = time.time() + job["interval"]
+
+        with _lock:
+            upcoming = min((job["next_run"] for job in _jobs), default=now + 60)
+        _wake.wait(max(0.5, upcoming - time.time()))
+        _wake.clear()
+
+
+def start():
+    global _thread, _stop
+    if _thread is not None:
+        return
+    _stop = False
+    _thread = threading.Thread(target=_loop, name="housekeeping", daemon=True)
+    _thread.start()
+
+
+def stop():
+    global _thread, _stop
+    _stop = True
+    _wake.set()
+    if _thread is not None:
+        _thread.join(5)
+        _thread = None
+
+
+def stats() -> list:
+    with _lock:
+        return [
+            {k: v for k, v in job.items() if k != "fn"}
+            for job in _jobs
+        ]
@@ -0,0 +1,237 @@
+"""
+Multi-keyword matching in one pass
+- plain keywords → one Aho-Corasick automaton over the lowercased text
+- regex keywords → one combined, case-insensitive pattern; patterns with
+  groups / backreferences / inline flags are compiled on their own
+  (wrapping them would renumber their groups)
+- the combined pass only sees non-overlapping matches → regex keywords
+  it did not report (overlapping / nested hits) are searched on their own
+- optional whole-word matching
+- compiled matchers are cached per site and rebuilt only when the set changes
+"""
+
+import re
+import bisect
+import threading
+from collections import deque
+
+
+# =========================
+# AHO-CORASICK
+# =========================
+class AhoCorasick:
+
+    def __init__(self, patterns: list[str]):
+        self.patterns = patterns
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append(index)
+
+        # breadth-first failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and char not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(char, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def iter_matches(self, text: str):
+        """
+        Yields (start, end, pattern_index) in one linear pass
+        """
+        goto, fail, output, patterns = self.goto, self.fail, self.output, self.patterns
+        state = 0
+        for pos, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield pos + 1 - len(patterns[index]), pos + 1, index
+
+
+# =========================
+# KEYWORD SET MATCHER
+# =========================
+FLAGS = re.IGNORECASE | re.MULTILINE
+
+_INLINE_FLAGS = re.compile(r"\(\?[aiLmsux]+\)")
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+def _regex_pattern(keyword: str, whole_word: bool) -> str:
+    return rf"\b(?:{keyword})\b" if whole_word else keyword
+
+
+def validate_keywords(specs) -> list[str]:
+    """
+    Problems with a keyword set (regexes that do not compile), empty when usable.
+    specs: KeywordSpec models or (keyword, is_regex, whole_word) tuples
+    """
+    errors = []
+    for spec in specs:
+        keyword, is_regex, whole_word = (
+            spec if isinstance(spec, tuple) else (spec.keyword, spec.is_regex, spec.whole_word)
+        )
+        keyword = (keyword or "").strip()
+        if not is_regex or not keyword:
+            continue
+        try:
+            re.compile(_regex_pattern(keyword, whole_word), FLAGS)
+        except re.error as e:
+            errors.append(f"invalid regex keyword '{keyword}': {e}")
+    return errors
+
+
+class KeywordMatcher:
+
+    def __init__(self, specs):
+        """
+        specs: [(keyword, is_regex, whole_word), ...]
+        """
+        self.specs = []
+        self.errors = {}
+
+        plain, regex_parts = [], []
+        self._separate = []             # (spec index, compiled) for patterns that can't be combined
+        self._combined = []             # (spec index, compiled) of the combined pattern's parts
+        for keyword, is_regex, whole_word in specs:
+            keyword = (keyword or "").strip()
+            if not keyword or any(s[0] == keyword for s in self.specs):
+                continue
+
+            if is_regex:
+                pattern = _regex_pattern(keyword, whole_word)
+                try:
+                    compiled = re.compile(pattern, FLAGS)
+                except re.error as e:
+                    self.errors[keyword] = str(e)
+                    continue
+                if compiled.groups or _INLINE_FLAGS.search(pattern):
+                    self._separate.append((len(self.specs), compiled))
+                else:
+                    regex_parts.append((f"k{len(self.specs)}", pattern))
+                    self._combined.append((len(self.specs), compiled))
+            else:
+                plain.append(len(self.specs))
+
+            self.specs.append((keyword, bool(is_regex), bool(whole_word)))
+
+        self._plain = plain
+        self._automaton = AhoCorasick([self.specs[i][0].lower() for i in plain]) if plain else None
+        self._regex = (
+            re.compile("|".join(f"(?P<{name}>{p})" for name, p in regex_parts), FLAGS)
+            if regex_parts else None
+        )
+
+    def __bool__(self):
+        return bool(self.specs)
+
+    @property
+    def keywords(self) -> list[str]:
+        return [s[0] for s in self.specs]
+
+    def match(self, body_text: str) -> dict:
+        """
+        Returns {keyword: context_line} for every keyword that hits
+        (first occurrence wins)
+        """
+        hits = {}
+        lines = body_text.splitlines()
+        wanted = len(self.specs)
+
+        if self._automaton is not None:
+            lower = "\n".join(line.lower() for line in lines)
+            starts = [0]
+            for i, char in enumerate(lower):
+                if char == "\n":
+                    starts.append(i + 1)
+
+            for start, end, index in self._automaton.iter_matches(lower):
+                keyword, _, whole_word = self.specs[self._plain[index]]
+                if keyword in hits:
+                    continue
+                if whole_word and (
+                    (start > 0 and _is_word_char(lower[start - 1]))
+                    or (end < len(lower) and _is_word_char(lower[end]))
+                ):
+                    continue
+
+                line_no = bisect.bisect_right(starts, start) - 1
+                hits[keyword] = lines[line_no].strip()[:300]
+                if len(hits) == wanted:
+                    return hits
+
+        joined = None
+        if self._regex is not None:
+            joined = "\n".join(lines)
+            for m in self._regex.finditer(joined):
+                keyword = self.specs[int(m.lastgroup[1:])][0]
+                if keyword in hits:
+                    continue
+                line_no = joined.count("\n", 0, m.start())
+                hits[keyword] = lines[line_no].strip()[:300]
+                if len(hits) == wanted:
+                    return hits
+
+        # 🔁 overlapping / nested hits the combined pass skipped, then the
+        # patterns that could not be combined
+        for index, compiled in self._combined + self._separate:
+            keyword = self.specs[index][0]
+            if keyword in hits:
+                continue
+            if joined is None:
+                joined = "\n".join(lines)
+            m = compiled.search(joined)
+            if m is not None:
+                line_no = joined.count("\n", 0, m.start())
+                hits[keyword] = lines[line_no].strip()[:300]
+
+        return hits
+
+
+# =========================
+# PER-SITE CACHE
+# =========================
+_cache = {}
+_lock = threading.Lock()
+
+
+def get_matcher(site_id: int, specs) -> KeywordMatcher:
+    signature = tuple((k, bool(r), bool(w)) for k, r, w in specs)
+    with _lock:
+        cached = _cache.get(site_id)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    matcher = KeywordMatcher(signature)
+    for keyword, error in matcher.errors.items():
+        print(f"⚠️ Invalid regex keyword '{keyword}' skipped:", error)
+
+    with _lock:
+        _cache[site_id] = (signature, matcher)
+    return matcher
+
+
+def forget_matcher(site_id: int):
+    with _lock:
+        _cache.pop(site_id, None)
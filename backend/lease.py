@@ -0,0 +1,105 @@
+"""
+Scan leases (several workers / hosts on one database)
+- a due site is claimed atomically: lease_owner + lease_expires
+- the owner renews its leases while the scans run (heartbeat)
+- the lease is released together with the scan state (write-behind flush)
+- an expired lease (dead worker) can be claimed by anyone
+"""
+
+import os
+import time
+import uuid
+import socket
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, case, func, or_
+
+from database import SessionLocal
+from models import Website
+
+load_dotenv()
+
+LEASE_SECONDS = int(os.getenv("LEASE_SECONDS", "120"))
+LEASE_RENEW_SECONDS = max(1.0, LEASE_SECONDS / 3)
+
+# unique per process: uvicorn --workers N and other hosts get their own
+WORKER_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+RELEASED = {"lease_owner": None, "lease_expires": 0}
+
+
+def _due_before(now: int):
+    interval = case(
+        (and_(Website.adaptive == True, Website.effective_interval > 0), Website.effective_interval),
+        else_=Website.interval
+    )
+    return and_(
+        func.coalesce(Website.last_checked, 0) + interval <= now,
+        func.coalesce(Website.not_before, 0) <= now,
+        func.coalesce(Website.breaker_open_until, 0) <= now
+    )
+
+
+def claim_sites(site_ids, require_due: bool = True, slack: float = 0) -> set:
+    """
+    Claims the given sites for this worker in one UPDATE.
+    Returns the ids this worker now holds; the rest are leased by another
+    worker or were scanned by one since this worker's schedule was built.
+    slack: sites due within that many seconds count as due (same-URL groups)
+    """
+    site_ids = list(site_ids)
+    if not site_ids:
+        return set()
+
+    now = int(time.time())
+    db = SessionLocal()
+    try:
+        query = db.query(Website).filter(
+            Website.id.in_(site_ids),
+            Website.enabled == True,
+            or_(
+                Website.lease_owner == None,
+                Website.lease_owner == WORKER_ID,
+                Website.lease_expires < now,
+            ),
+        )
+        if require_due:
+            query = query.filter(_due_before(now + int(slack)))
+
+        query.update(
+            {Website.lease_owner: WORKER_ID, Website.lease_expires: now + LEASE_SECONDS},
+            synchronize_session=False
+        )
+        db.commit()
+
+        return {
+            site_id for (site_id,) in
+            db.query(Website.id).filter(
+                Website.id.in_(site_ids),
+                Website.lease_owner == WORKER_ID
+            )
+        }
+    finally:
+        db.close()
+
+
+def renew_leases(site_ids):
+    """
+    Heartbeat for the sites this worker is scanning right now
+    """
+    site_ids = list(site_ids)
+    if not site_ids:
+        return
+
+    db = SessionLocal()
+    try:
+        db.query(Website).filter(
+            Website.id.in_(site_ids),
+            Website.lease_owner == WORKER_ID
+        ).update(
+            {Website.lease_expires: int(time.time()) + LEASE_SECONDS},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
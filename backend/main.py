@@ -5,21 +5,50 @@ FastAPI + Scheduler + Telegram Alerts + Logs + Screenshot + PDF
 
 import os
 import time
-import threading
-import requests
 
-from fastapi import FastAPI, HTTPException
-
-from database import SessionLocal, engine
-from models import Website, WebsiteLog
-from schemas import WebsiteCreate, WebsiteResponse, WebsiteLogResponse
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import text, func
+from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import SessionLocal, ensure_schema
+from models import Website, WebsiteLog, WebsiteKeyword, AppCounter
+from schemas import (
+    WebsiteCreate, WebsiteResponse, WebsiteLogResponse, KeywordSpec, RegionUpdate,
+    NoiseRules, NoisePreview, BulkAction
+)
 
-from browser_service import scan_website
+import scan_coalescer
+from keyword_matcher import get_matcher, forget_matcher, validate_keywords
+import normalizer
+from browser_pool import get_pool, shutdown_pool, pool_stats, reap_orphans
+from scan_scheduler import ScanScheduler, domain_of
+from lease import claim_sites, renew_leases, LEASE_RENEW_SECONDS, RELEASED
+import adaptive_interval
+import circuit_breaker
+from state_writer import state_writer
+import history
+import site_io
+from site_io import keyword_rows_for, keyword_specs
+from events import events
+import housekeeping
+from pdf_service import fetch_pdfs
+import screenshot_store
+import page_snapshots
+from preflight import PREFLIGHT_ENABLED, preflight, preflight_stats, render_due
+import metrics
+from metrics import phase, SCAN_SECONDS, SCANS_TOTAL, ALERTS_TOTAL
 
 from telegram_service import (
     send_telegram,
     send_telegram_photo,
-    send_telegram_document
+    send_telegram_document,
+    start_worker as start_telegram_worker,
+    stop_worker as stop_telegram_worker,
+    adopt_orphans as adopt_telegram_orphans,
+    queue_stats as telegram_queue_stats
 )
 
 
@@ -28,35 +57,86 @@ app = FastAPI(title="Website Monitor Backend")
 # =========================
 # GLOBAL FLAGS
 # =========================
-RUN_SCHEDULER = True
 MONITORING_ENABLED = True
 
+# log retention (applied by the background compactor, not per insert)
+LOG_RETENTION_COUNT = int(os.getenv("LOG_RETENTION_COUNT", "20"))
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "0"))      # 0 = keep by count only
+LOG_COMPACT_SECONDS = int(os.getenv("LOG_COMPACT_SECONDS", "300"))
+
 
 # =========================
 # LOG HELPER
 # =========================
-def save_log(db, site_id, event_type, message, old_hash=None, new_hash=None):
-    log = WebsiteLog(
-        website_id=site_id,
-        event_type=event_type,
-        message=message,
-        old_hash=old_hash,
-        new_hash=new_hash,
-        timestamp=int(time.time())
-    )
-    db.add(log)
-    db.commit()
+def save_log(site_id, event_type, message, old_hash=None, new_hash=None):
+    # batched with the scan state by the write-behind flusher
+    state_writer.log(site_id, event_type, message, old_hash, new_hash)
+    events.publish("log", site_id=site_id, event_type=event_type, message=message)
 
-    logs = (
-        db.query(WebsiteLog)
-        .filter(WebsiteLog.website_id == site_id)
-        .order_by(WebsiteLog.timestamp.desc())
-        .all()
-    )
 
-    for extra in logs[20:]:
-        db.delete(extra)
-    db.commit()
+def compact_logs():
+    """
+    Bulk retention: newest LOG_RETENTION_COUNT rows per site (+ optional age limit)
+    """
+    db = SessionLocal()
+    try:
+        removed = db.execute(text("""
+            DELETE FROM website_logs WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY website_id
+                        ORDER BY timestamp DESC, id DESC
+                    ) AS rn
+                    FROM website_logs
+                ) WHERE rn > :keep
+            )
+        """), {"keep": LOG_RETENTION_COUNT}).rowcount
+
+        if LOG_RETENTION_DAYS > 0:
+            cutoff = int(time.time()) - LOG_RETENTION_DAYS * 86400
+            removed += db.execute(
+                text("DELETE FROM website_logs WHERE timestamp < :cutoff"),
+                {"cutoff": cutoff}
+            ).rowcount
+
+        db.commit()
+        if removed:
+            print(f"🧹 Log compaction removed {removed} rows")
+    finally:
+        db.close()
+
+
+def migrate_legacy_keywords():
+    """
+    Sites created before keyword sets: single keyword → one keyword row
+    """
+    db = SessionLocal()
+    try:
+        legacy = (
+            db.query(Website)
+            .filter(Website.keyword != None, Website.keyword != "")
+            .filter(~Website.keywords.any())
+            .all()
+        )
+        # every worker runs this at startup: a row another worker already
+        # inserted hits the unique index and is skipped
+        migrated = 0
+        for site in legacy:
+            migrated += db.execute(
+                sqlite_insert(WebsiteKeyword).values(
+                    website_id=site.id,
+                    keyword=site.keyword.strip(),
+                    is_regex=False,
+                    whole_word=False,
+                    found=bool(site.keyword_found),
+                    alert_sent=bool(site.alert_sent)
+                ).on_conflict_do_nothing(index_elements=["website_id", "keyword", "is_regex"])
+            ).rowcount
+        db.commit()
+        if migrated:
+            print(f"🔑 Migrated {migrated} single-keyword sites to keyword sets")
+    finally:
+        db.close()
 
 
 # =========================
@@ -64,64 +144,293 @@ def save_log(db, site_id, event_type, message, old_hash=None, new_hash=None):
 # =========================
 @app.on_event("startup")
 def startup():
-    Website.metadata.create_all(bind=engine)
-    threading.Thread(target=scheduler, daemon=True).start()
-    print("▶️ Scheduler + DB started")
+    ensure_schema()
+    migrate_legacy_keywords()
+    get_pool().start()
+    start_telegram_worker()
+    housekeeping.register("log_compaction", LOG_COMPACT_SECONDS, compact_logs, run_at_start=True)
+    housekeeping.register("snapshot_gc", 3600, page_snapshots.collect_garbage)
+    housekeeping.register("outbox_heartbeat", 60, adopt_telegram_orphans)
+    housekeeping.register("history_retention", 3600, history.enforce_retention)
+    housekeeping.register("browser_orphans", 300, reap_orphans, run_at_start=True)
+    housekeeping.register(
+        "screenshot_retention",
+        screenshot_store.SCREENSHOT_RETENTION_SECONDS,
+        screenshot_store.enforce_retention
+    )
+    housekeeping.start()
+    state_writer.add_hook(history.recorder)
+    state_writer.add_hook(page_snapshots.recorder)
+    state_writer.add_hook(screenshot_store.index)
+    state_writer.start()
+    scan_scheduler.start()
+    print("▶️ Scheduler + DB + Browser pool started")
 
 
 @app.on_event("shutdown")
 def shutdown():
-    global RUN_SCHEDULER
-    RUN_SCHEDULER = False
+    scan_scheduler.stop()
+    state_writer.stop()
     print("🛑 Scheduler stopped")
+    shutdown_pool()
+    stop_telegram_worker()
+    housekeeping.stop()
 
 
 # =========================
 # WEBSITE CHECK (KEYWORD / FULL PAGE CHANGE)
 # =========================
-def check_website(db, site: Website):
-    print(f"🔍 Scanning: {site.name} | {site.url} | keyword={site.keyword}")
+# scan-owned columns, persisted through the write-behind writer
+SCAN_STATE_FIELDS = (
+    "last_checked",
+    "last_status",
+    "last_hash",
+    "first_run",
+    "keyword_found",
+    "alert_sent",
+    "http_etag",
+    "http_last_modified",
+    "http_body_hash",
+    "preflight_skips",
+    "last_rendered",
+    "hash_profile",
+    "last_response_time",
+    "effective_interval",
+    "change_rate",
+    "changes_observed",
+    "time_observed",
+    "breaker_state",
+    "consecutive_failures",
+    "breaker_open_until",
+    "down_since",
+    "last_error",
+)
+
+
+# taken against one watched region; reset together when the region changes
+BASELINE_FIELDS = ("last_hash", "http_etag", "http_last_modified", "http_body_hash")
+
+
+def region_changed(site: Website) -> bool:
+    """
+    The watched region was changed while this scan ran (one PK read)
+    """
+    db = SessionLocal()
+    try:
+        current = db.query(Website.region_version).filter(Website.id == site.id).scalar()
+    finally:
+        db.close()
+    return (current or 0) != (site.region_version or 0)
+
+
+def queue_state(site: Website):
+    state_writer.update(
+        site.id,
+        **{field: getattr(site, field) for field in SCAN_STATE_FIELDS}
+    )
+
 
-    if not site.enabled or not MONITORING_ENABLED:
+def queue_keyword_state(keyword: WebsiteKeyword):
+    state_writer.update_row(
+        WebsiteKeyword,
+        keyword.id,
+        found=keyword.found,
+        alert_sent=keyword.alert_sent
+    )
+
+
+def send_alert(site: Website, message: str, scan: dict):
+    """
+    Photo + caption when the render captured a new frame,
+    plain text when there is none (or it matches the last one)
+    """
+    png = scan.get("screenshot_png")
+    if png:
+        with phase("screenshot_store", domain_of(site.url)):
+            shot = screenshot_store.save(site.id, png)
+        if not shot["duplicate"]:
+            send_telegram_photo(shot["path"], message)
+            return
+    send_telegram(message)
+
+
+def send_down_alert(site: Website):
+    retry = max(0, site.breaker_open_until - int(time.time()))
+    send_telegram(
+        f"🔴 *Website Down!*\n\n"
+        f"🏢 *Site:* {site.name}\n"
+        f"🌐 *Page:* {site.url}\n"
+        f"❌ *Error:* {site.last_error or 'unknown'}\n"
+        f"🔁 *Failed checks:* {site.consecutive_failures}\n"
+        f"⏳ *Next probe in:* {retry // 60} min\n\n"
+        f"No further alerts until it recovers."
+    )
+    ALERTS_TOTAL.inc(kind="down")
+    events.publish("alert", site_id=site.id, kind="down")
+    save_log(site.id, "down", f"Breaker opened after {site.consecutive_failures} failures: {site.last_error}")
+
+
+def send_recovery_alert(site: Website, downtime: int):
+    send_telegram(
+        f"🟢 *Website Recovered!*\n\n"
+        f"🏢 *Site:* {site.name}\n"
+        f"🌐 *Page:* {site.url}\n"
+        f"⏱️ *Down for:* {downtime // 3600}h {downtime % 3600 // 60}m"
+    )
+    ALERTS_TOTAL.inc(kind="recovery")
+    events.publish("alert", site_id=site.id, kind="recovery")
+    save_log(site.id, "recovery", f"Recovered after {downtime} s")
+
+
+def check_website(site: Website, manual: bool = False, fresh: bool = False):
+    """
+    site must come with its keywords loaded (the session is already closed).
+    manual: "check now" from the API (runs while monitoring is stopped and
+    serves as the breaker probe); fresh: never reuse a cached render
+    """
+    keyword_rows = list(site.keywords)
+    print(f"🔍 Scanning: {site.name} | {site.url} | keywords={len(keyword_rows)}")
+
+    if not site.enabled or not (MONITORING_ENABLED or manual):
         return
 
+    # 🔌 breaker open → no render until the backoff is over
+    if manual and site.breaker_state == circuit_breaker.OPEN:
+        site.breaker_state = circuit_breaker.HALF_OPEN
+    if not circuit_breaker.allow(site, int(time.time())):
+        print(f"🔌 Breaker open, skipped: {site.name}")
+        return
+
+    previous_check = site.last_checked
+    previous_status = site.last_status
+    page_changed = None         # observation for the adaptive interval (None = no data)
+    domain = domain_of(site.url)
+    started = time.perf_counter()
+    outcome = "rendered"
+    error_text = None
+
     try:
         site.last_checked = int(time.time())
 
-        # 🔍 FAST SCAN (NO screenshot)
-        fast_scan = scan_website(
+        # values the detection check needs (read here, not in the browser thread)
+        known_hash = site.last_hash
+        noise = normalizer.for_site(site)
+        # rule set changed since last_hash was taken → silent re-baseline
+        baseline_run = (
+            site.first_run
+            or not site.last_hash
+            or (site.hash_profile or "") != noise.signature
+        )
+        pending_keywords = {k.keyword for k in keyword_rows if not k.alert_sent}
+        matcher = get_matcher(
+            site.id,
+            [(k.keyword, k.is_regex, k.whole_word) for k in keyword_rows]
+        ) if keyword_rows else None
+
+        # ⚡ HTTP PREFLIGHT → skip the render when the server reports no change
+        # (never before a page-change site has its baseline, and not once the
+        # skip / age limit says a full render is due)
+        http_state = None
+        if (
+            PREFLIGHT_ENABLED and site.preflight and not site.first_run and site.last_status == "up"
+            and (keyword_rows or site.last_hash)
+            and not render_due(site.preflight_skips, site.last_rendered, site.last_checked)
+        ):
+            preflight_start = time.perf_counter()
+            with phase("preflight", domain):
+                http_state = preflight(
+                    site.url,
+                    etag=site.http_etag,
+                    last_modified=site.http_last_modified,
+                    body_hash=site.http_body_hash,
+                    normalize=noise.apply if noise.signature else None
+                )
+            if not http_state["changed"]:
+                print(f"⏭️ Unchanged (preflight): {site.name}")
+                site.last_response_time = int((time.perf_counter() - preflight_start) * 1000)
+                site.preflight_skips = (site.preflight_skips or 0) + 1
+                page_changed = False
+                outcome = "skipped"
+                return
+
+        def is_detection(scan):
+            if matcher is None:
+                return (
+                    not baseline_run
+                    and scan.get("page_hash") is not None
+                    and scan["page_hash"] != known_hash
+                )
+            return any(k in pending_keywords for k in scan.get("matches") or {})
+
+        # 🔍 SINGLE SCAN: all keywords in one pass (screenshot only if this render is an alert);
+        # the render is shared with other sites of the same URL + profile
+        fast_scan = scan_coalescer.scan(
             site.url,
-            site.keyword or "",
-            take_screenshot=False
+            matcher=matcher,
+            normalizer=noise,
+            capture_if=is_detection,
+            fast=site.fast_scan is not False,
+            wait_selector=site.wait_selector,
+            include_selectors=site.include_selectors,
+            exclude_selectors=site.exclude_selectors,
+            fresh=fresh
         )
 
+        if fast_scan.get("error"):
+            # ❌ failed render: nothing to compare (keyword state stays as it was)
+            outcome = "render_error"
+            error_text = fast_scan["error"]
+            site.last_status = "error"
+            print("❌ RENDER ERROR:", error_text)
+            save_log(site.id, "error", error_text)
+            return
+
         site.last_status = "up"
+        site.preflight_skips = 0
+        site.last_rendered = site.last_checked
+        page_changed = False
+        if fast_scan.get("render_ms") is not None:
+            site.last_response_time = fast_scan["render_ms"]
+
+        # validators are saved only after a successful render
+        if http_state:
+            site.http_etag = http_state["etag"]
+            site.http_last_modified = http_state["last_modified"]
+            site.http_body_hash = http_state["body_hash"]
 
         # ======================================================
-        # 🔁 FULL PAGE CHANGE MODE (WHEN keyword IS EMPTY)
+        # 🔁 FULL PAGE CHANGE MODE (WHEN THERE ARE NO KEYWORDS)
         # ======================================================
-        if not site.keyword:
+        if not keyword_rows:
 
             current_hash = fast_scan.get("page_hash")
             if not current_hash:
                 return
 
-            # 🟢 FIRST RUN → save hash only (NO alert)
-            if site.first_run or not site.last_hash:
+            # 🟢 FIRST RUN / NEW NOISE RULES → save hash + text snapshot only (NO alert)
+            if baseline_run:
+                if site.last_hash and not site.first_run and site.last_hash != current_hash:
+                    print(f"🧹 Noise rules changed, new baseline: {site.name}")
+                    save_log(site.id, "rebaseline", "Noise rules changed, new baseline taken",
+                             old_hash=site.last_hash, new_hash=current_hash)
                 site.last_hash = current_hash
+                site.hash_profile = noise.signature
                 site.first_run = False
-                db.commit()
+                if fast_scan.get("text") is not None:
+                    page_snapshots.record_snapshot(site.id, fast_scan["text"])
                 return
 
             # 🔁 PAGE CONTENT CHANGED
             if site.last_hash != current_hash:
 
-                # 🔍 SECOND SCAN WITH SCREENSHOT
-                alert_scan = scan_website(
-                    site.url,
-                    "",
-                    take_screenshot=True
-                )
+                # 📸 evidence comes from the same render that detected the change
+                alert_scan = fast_scan
+
+                # 🧾 what changed (only changed blocks are diffed)
+                with phase("snapshot", domain):
+                    diff = page_snapshots.record_snapshot(site.id, alert_scan.get("text") or "")
+                diff = noise.drop_noise(diff)
+                changes = page_snapshots.format_diff(diff)
 
                 message = (
                     f"🆕 *Website Updated!*\n\n"
@@ -129,97 +438,106 @@ def check_website(db, site: Website):
                     f"🌐 *Page:* {alert_scan.get('final_url') or site.url}\n"
                     f"🕒 *Time:* {time.strftime('%Y-%m-%d %H:%M:%S')}"
                 )
-
-                if alert_scan.get("screenshot"):
-                    send_telegram_photo(alert_scan["screenshot"], message)
-                else:
-                    send_telegram(message)
+                if changes:
+                    message += f"\n\n🧾 *Changes:*\n{changes}"
+
+                send_alert(site, message, alert_scan)
+                ALERTS_TOTAL.inc(kind="update")
+                events.publish("alert", site_id=site.id, kind="update")
+
+                save_log(
+                    site.id,
+                    "update",
+                    f"Page changed: +{len(diff['added'])} / -{len(diff['removed'])} lines"
+                    + (f"\n{page_snapshots.format_diff(diff, max_lines=20)}" if changes else ""),
+                    old_hash=site.last_hash,
+                    new_hash=current_hash
+                )
 
                 site.last_hash = current_hash
-                db.commit()
+                page_changed = True
 
             return  # ⛔ VERY IMPORTANT (skip keyword logic)
 
         # ======================================================
-        # 🔑 KEYWORD MODE
+        # 🔑 KEYWORD MODE (one alert for every keyword that newly hit)
         # ======================================================
-        if fast_scan.get("found") and not site.alert_sent:
+        matches = fast_scan.get("matches") or {}
+        new_hits = [k for k in keyword_rows if k.keyword in matches and not k.alert_sent]
 
-            # 🔍 SECOND SCAN WITH SCREENSHOT
-            alert_scan = scan_website(
-                site.url,
-                site.keyword,
-                take_screenshot=True
-            )
+        if new_hits:
+
+            # 📸 evidence comes from the same render that found the keywords
+            alert_scan = fast_scan
+            hit_names = ", ".join(k.keyword for k in new_hits)
 
             message = (
                 f"🚨 *NEW SARKARI UPDATE FOUND!*\n\n"
                 f"🏢 *Site:* {site.name}\n"
-                f"🔑 *Keyword:* {site.keyword}\n"
+                f"🔑 *Keyword{'s' if len(new_hits) > 1 else ''}:* {hit_names}\n"
                 f"🌐 *Page:* {alert_scan.get('final_url') or site.url}\n"
             )
 
-            if alert_scan.get("context"):
-                message += f"\n🧾 *Context:*\n{alert_scan['context']}\n"
+            message += "\n🧾 *Context:*\n"
+            if len(new_hits) == 1:
+                message += f"{matches[new_hits[0].keyword]}\n"
+            else:
+                for k in new_hits[:5]:
+                    message += f"• {k.keyword}: {matches[k.keyword]}\n"
 
             if alert_scan.get("pdf_links"):
                 message += "\n📄 *PDF Links:*\n"
                 message += "\n".join(alert_scan["pdf_links"][:3])
 
             # 📸 Screenshot (ONLY ONCE)
-            if alert_scan.get("screenshot"):
-                send_telegram_photo(alert_scan["screenshot"], message)
-            else:
-                send_telegram(message)
+            send_alert(site, message, alert_scan)
+            ALERTS_TOTAL.inc(kind="keyword")
+            events.publish("alert", site_id=site.id, kind="keyword", keywords=[k.keyword for k in new_hits])
 
 
-            # 📥 PDF DOWNLOAD + ATTACH (ONLY ONCE)
+            # 📥 PDF DOWNLOAD + ATTACH (ONLY NEW FILES, BY CONTENT HASH)
             if alert_scan.get("pdf_links"):
-                os.makedirs("downloads", exist_ok=True)
-
-                for pdf_url in alert_scan["pdf_links"][:2]:
-                    try:
-                        filename = pdf_url.split("/")[-1]
-                        local_path = os.path.join("downloads", filename)
-
-
-                        if os.path.exists(local_path):
-                            continue
-
-                        r = requests.get(pdf_url, timeout=60)
-                        if r.status_code == 200:
-                            with open(local_path, "wb") as f:
-                                f.write(r.content)
-
+                with phase("pdf", domain):
+                    pdfs = fetch_pdfs(alert_scan["pdf_links"][:2])
 
-                            send_telegram_document(
-                                local_path,
-                                caption=f"📎 {filename}\n{site.name}"
-                            )
-
-                    except Exception as pdf_err:
-                        print("❌ PDF download/send error:", pdf_err)
+                for pdf in pdfs:
+                    if not pdf["new"]:
+                        continue
 
+                    send_telegram_document(
+                        pdf["path"],
+                        caption=f"📎 {pdf['filename']}\n{site.name}",
+                        filename=pdf["filename"]
+                    )
 
             save_log(
-                db,
                 site.id,
                 "keyword",
-                f"Keyword '{site.keyword}' found"
+                "Keyword " + ", ".join(f"'{k.keyword}'" for k in new_hits) + " found"
             )
 
-            site.keyword_found = True
-            site.alert_sent = True
+            for k in new_hits:
+                k.alert_sent = True
+
+        # 🔄 per keyword: remember hits, reset the ones that disappeared
+        for k in keyword_rows:
+            before = (k.found, k.alert_sent)
+            k.found = k.keyword in matches
+            if not k.found:
+                k.alert_sent = False
+            if (k.found, k.alert_sent) != before:
+                queue_keyword_state(k)
+            if k.found != before[0]:
+                page_changed = True
 
-        # 🔄 KEYWORD REMOVED → reset
-        if site.keyword and not fast_scan.get("found"):
-            site.keyword_found = False
-            site.alert_sent = False
+        site.keyword_found = any(k.found for k in keyword_rows)
+        site.alert_sent = any(k.alert_sent for k in keyword_rows)
 
         site.first_run = False
-        db.commit()
 
     except Exception as e:
+        page_changed = None
+        outcome = "error"
         site.last_checked = int(time.time())
         site.last_status = "error"
 
@@ -229,42 +547,215 @@ def check_website(db, site: Website):
 
         if site.first_run:
             site.first_run = False
-            db.commit()
             return
 
 
-        save_log(db, site.id, "error", error_text)
-
-        send_telegram(
-            f"🚨 *Website Error!*\n\n"
-            f"Site: {site.name}\n"
-            f"Error: {error_text}"
-
+        # one Telegram alert per outage (breaker), not one per failed check
+        save_log(site.id, "error", error_text)
+
+    finally:
+        # 🔌 failures open the breaker, a success after an outage closes it
+        now = int(time.time())
+        if outcome in ("render_error", "error"):
+            if circuit_breaker.record_failure(site, now, error_text) == "opened":
+                site.last_status = "down"
+                send_down_alert(site)
+        else:
+            outage_start = circuit_breaker.record_success(site, now)
+            if outage_start is not None:
+                send_recovery_alert(site, now - outage_start)
+        if site.breaker_state == circuit_breaker.OPEN:
+            site.last_status = "down"
+
+        # ⏱️ learn how often this page changes
+        if page_changed is not None:
+            adaptive_interval.observe(site, previous_check, site.last_checked, page_changed)
+
+        # 🎯 region changed mid-scan → this scan's hash / validators are stale
+        if region_changed(site):
+            for field in BASELINE_FIELDS:
+                setattr(site, field, None)
+
+        # 💾 one coalesced write per scan (never blocks on the DB)
+        queue_state(site)
+
+        # 📈 history row (+ rollups) in the same flush
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        history.recorder.record(
+            site.id,
+            site.last_checked or time.time(),
+            site.last_response_time if outcome in history.UP_STATUSES else elapsed_ms,
+            outcome,
+            bool(page_changed)
         )
 
+        # 📡 live dashboard
+        events.publish(
+            "scan_finished",
+            site_id=site.id,
+            outcome=outcome,
+            changed=bool(page_changed),
+            last_status=site.last_status,
+            last_checked=site.last_checked,
+            last_response_time=site.last_response_time,
+            keyword_found=bool(site.keyword_found),
+            alert_sent=bool(site.alert_sent),
+            effective_interval=site.effective_interval,
+            breaker_state=site.breaker_state,
+            consecutive_failures=site.consecutive_failures,
+            last_error=site.last_error
+        )
+        if site.last_status != previous_status:
+            events.publish("status", site_id=site.id, old=previous_status, new=site.last_status)
 
-        db.commit()
+        SCANS_TOTAL.inc(result=outcome)
+        SCAN_SECONDS.observe(time.perf_counter() - started, domain=domain)
 
 
 
 # =========================
 # SCHEDULER
 # =========================
-def scheduler():
-    while RUN_SCHEDULER:
-        if not MONITORING_ENABLED:
-            time.sleep(1)
-            continue
+def load_site_for_scan(site_id: int):
+    db = SessionLocal()
+    try:
+        site = (
+            db.query(Website)
+            .options(selectinload(Website.keywords))
+            .filter(Website.id == site_id)
+            .first()
+        )
+    finally:
+        db.close()      # no connection held during the render
+
+    if not site:
+        return None
+
+    # state written by the previous scan may not be flushed yet
+    for field, value in state_writer.pending_for(site_id).items():
+        setattr(site, field, value)
+    for keyword in site.keywords:
+        for field, value in state_writer.pending_for(keyword.id, WebsiteKeyword).items():
+            setattr(keyword, field, value)
+    return site
+
+
+def run_scheduled_scan(site_id: int):
+    site = load_site_for_scan(site_id)
+    if not site:
+        return
+
+    events.publish("scan_started", site_id=site_id)
+    try:
+        check_website(site)
+    finally:
+        # 🔓 lease is released in the same flush as last_checked
+        state_writer.update(site_id, **RELEASED)
+
+    if site.adaptive:
+        scan_scheduler.retune(site.id, adaptive_interval.current_interval(site))
+
+    # 🔌 open breaker → next probe only after the backoff
+    scan_scheduler.defer(site.id, site.breaker_open_until or 0)
+
+
+def schedule_args(site) -> dict:
+    return {
+        "interval": adaptive_interval.current_interval(site),
+        "adaptive": bool(site.adaptive),
+        "max_interval": site.max_interval,
+    }
 
-        db = SessionLocal()
-        sites = db.query(Website).filter(Website.enabled == True).all()
 
-        for site in sites:
-            if time.time() - site.last_checked >= site.interval:
-                check_website(db, site)
+def schedule_base(site) -> int:
+    """
+    "last run" the scheduler starts from: a staggered import's first scan
+    becomes due at not_before, an open breaker's probe at breaker_open_until
+    """
+    hold = max(site.not_before or 0, site.breaker_open_until or 0)
+    return max(site.last_checked or 0, hold - (site.interval or 0))
 
+
+def load_enabled_sites():
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(
+                Website.id, Website.url, Website.interval, Website.last_checked,
+                Website.adaptive, Website.effective_interval, Website.max_interval,
+                Website.not_before, Website.breaker_open_until
+            )
+            .filter(Website.enabled == True)
+            .all()
+        )
+    finally:
         db.close()
-        time.sleep(1)
+
+    sites = []
+    for row in rows:
+        args = schedule_args(row)
+        sites.append((row.id, row.url, args["interval"], schedule_base(row),
+                      args["adaptive"], args["max_interval"]))
+    return sites
+
+
+scan_scheduler = ScanScheduler(
+    run_scan=run_scheduled_scan,
+    load_sites=load_enabled_sites,
+    is_enabled=lambda: MONITORING_ENABLED,
+    claim=claim_sites,
+    renew=renew_leases,
+    renew_every=LEASE_RENEW_SECONDS
+)
+
+
+# =========================
+# METRICS (read at scrape time)
+# =========================
+metrics.Gauge(
+    "webmon_scheduler_queue_depth", "Sites waiting for their next scan",
+    source=lambda: scan_scheduler.stats()["queue_depth"]
+)
+metrics.Gauge(
+    "webmon_scheduler_due_now", "Sites past their due time",
+    source=lambda: scan_scheduler.stats()["due_now"]
+)
+metrics.Gauge(
+    "webmon_scans_in_flight", "Scans running right now",
+    source=lambda: scan_scheduler.stats()["in_flight"]
+)
+metrics.Gauge(
+    "webmon_browser_launches", "Chromium launches since start",
+    source=lambda: pool_stats()["launches"]
+)
+metrics.Gauge(
+    "webmon_browser_pages_served", "Pages served by the browser pool",
+    source=lambda: pool_stats()["pages_served"]
+)
+metrics.Gauge(
+    "webmon_browser_rss_bytes", "Resident memory of all pooled Chromium processes",
+    source=lambda: pool_stats()["rss_mb"] * 1024 * 1024
+)
+metrics.Gauge(
+    "webmon_renders_saved", "Checks served by a shared or cached render",
+    source=lambda: scan_coalescer.coalescer.stats()["renders_saved"]
+)
+metrics.Gauge(
+    "webmon_telegram_pending", "Telegram messages waiting in the outbox",
+    source=lambda: telegram_queue_stats()["pending"]
+)
+metrics.Gauge(
+    "webmon_state_pending_sites", "Sites with unflushed scan state",
+    source=lambda: state_writer.stats()["pending_sites"]
+)
+metrics.Gauge(
+    "webmon_event_subscribers", "Connected live-update (SSE) clients",
+    source=lambda: events.stats()["subscribers"]
+)
+metrics.Gauge(
+    "webmon_monitoring_enabled", "Global monitoring switch",
+    source=lambda: int(MONITORING_ENABLED)
+)
 
 
 # =========================
@@ -275,23 +766,101 @@ def root():
     return {"status": "Backend running (SQLite + Screenshot + PDF)"}
 
 
+def sites_version() -> int:
+    """
+    Site list version (shared by every worker process, one PK read)
+    """
+    db = SessionLocal()
+    try:
+        return db.query(AppCounter.value).filter(AppCounter.key == "sites").scalar() or 0
+    finally:
+        db.close()
+
+
+def site_list_changed(event_type: str, **data):
+    """
+    Called by every write path that adds / edits / removes sites: bumps the
+    list version (ETag) and tells the live dashboards
+    """
+    db = SessionLocal()
+    try:
+        db.execute(
+            sqlite_insert(AppCounter).values(key="sites", value=1).on_conflict_do_update(
+                index_elements=["key"], set_={"value": AppCounter.value + 1}
+            )
+        )
+        db.commit()
+    finally:
+        db.close()
+    events.publish(event_type, **data)
+
+
 @app.get("/api/websites", response_model=list[WebsiteResponse])
-def get_websites():
+def get_websites(request: Request, response: Response):
+    """
+    The ETag is the site list version: it changes with edits, not with scans
+    (scan results reach the dashboard as scan_finished events), so a
+    revalidation is answered before any row is loaded
+    """
+    etag = f'W/"sites-{sites_version()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
     db = SessionLocal()
-    sites = db.query(Website).all()
+    sites = db.query(Website).options(selectinload(Website.keywords)).all()
     db.close()
+    for site in sites:
+        site.scheduled_interval = scan_scheduler.scheduled_interval(site.id)
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"      # revalidate, don't reuse blindly
     return sites
 
 
+@app.get("/api/events")
+async def stream_events(request: Request):
+    """
+    Server-Sent Events: scan_started / scan_finished / status / alert / log /
+    site_added / site_updated / site_deleted / monitoring, "resync" when the
+    client fell behind (reload GET /api/websites)
+    """
+    return StreamingResponse(
+        events.stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/api/websites", response_model=WebsiteResponse)
 def add_website(site: WebsiteCreate):
+    errors = (
+        validate_keywords(keyword_specs(site))
+        + normalizer.validate_rules(site.noise_masks, site.ignore_patterns)
+    )
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+
     db = SessionLocal()
 
+    keywords = keyword_rows_for(keyword_specs(site))
+
     new_site = Website(
         name=site.name,
         url=site.url,
         interval=site.interval,
-        keyword=site.keyword,
+        keyword=keywords[0].keyword if keywords else "",
+        keywords=keywords,
+        enabled=site.enabled,
+        preflight=site.preflight,
+        fast_scan=site.fast_scan,
+        wait_selector=site.wait_selector,
+        include_selectors=site.include_selectors,
+        exclude_selectors=site.exclude_selectors,
+        noise_masks=site.noise_masks,
+        ignore_patterns=site.ignore_patterns,
+        adaptive=site.adaptive,
+        min_interval=site.min_interval,
+        max_interval=site.max_interval,
         keyword_found=False,
         alert_sent=False
     )
@@ -299,11 +868,309 @@ def add_website(site: WebsiteCreate):
     db.add(new_site)
     db.commit()
     db.refresh(new_site)
+    new_site.keywords       # load before the session closes
     db.close()
 
+    scan_scheduler.notify(new_site.id, new_site.url, last_checked=0, enabled=new_site.enabled,
+                          **schedule_args(new_site))
+    site_list_changed("site_added", site_id=new_site.id)
     return new_site
 
 
+# =========================
+# BULK IMPORT / EXPORT / ACTIONS
+# =========================
+def _import_sites(body: bytes, content_type: str, stagger: bool, skip_invalid: bool) -> dict:
+    try:
+        rows = site_io.parse_upload(body, content_type)
+    except site_io.UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # ✅ everything is validated before the first insert
+    valid, invalid = site_io.validate_rows(rows)
+    if invalid and not skip_invalid:
+        raise HTTPException(status_code=400, detail={"invalid": invalid})
+
+    result = site_io.import_sites(valid, stagger=stagger)
+
+    for site_id, url, interval, not_before, adaptive, max_interval, enabled in result["created"]:
+        scan_scheduler.notify(site_id, url, interval=interval, last_checked=not_before - interval,
+                              enabled=enabled, adaptive=adaptive, max_interval=max_interval)
+    if result["created"]:
+        site_list_changed("sites_imported", count=len(result["created"]))
+
+    now = int(time.time())
+    print(f"📥 Imported {len(result['created'])} sites "
+          f"({len(result['duplicates'])} duplicates, {len(invalid)} invalid)")
+    return {
+        "created": len(result["created"]),
+        "ids": [row[0] for row in result["created"]],
+        "duplicates": result["duplicates"],
+        "invalid": invalid,
+        "batches": result["batches"],
+        "first_scans_within": max((row[3] - now for row in result["created"]), default=0),
+    }
+
+
+@app.post("/api/websites/import")
+async def import_websites(request: Request, stagger: bool = True, skip_invalid: bool = False):
+    """
+    JSON list (same fields as POST /api/websites) or CSV with a header row;
+    list columns in CSV are "a|b|c" or a JSON array
+    """
+    body = await request.body()
+    return await run_in_threadpool(
+        _import_sites, body, request.headers.get("content-type", ""), stagger, skip_invalid
+    )
+
+
+@app.get("/api/websites/export")
+def export_websites(format: str = "json"):
+    if format == "csv":
+        return StreamingResponse(
+            site_io.export_csv(),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=websites.csv"}
+        )
+    return StreamingResponse(
+        site_io.export_json(),
+        media_type="application/json",
+        headers={"Content-Disposition": "attachment; filename=websites.json"}
+    )
+
+
+@app.post("/api/websites/bulk")
+def bulk_websites(bulk: BulkAction):
+    """
+    enable / disable / delete every site matching the filter, in one transaction
+    """
+    if bulk.action not in ("enable", "disable", "delete"):
+        raise HTTPException(status_code=400, detail="action must be enable, disable or delete")
+    has_filter = any(
+        value is not None
+        for value in (bulk.ids, bulk.url_contains, bulk.name_contains, bulk.status, bulk.enabled)
+    )
+    if not has_filter and not bulk.all:
+        raise HTTPException(status_code=400, detail="no filter given (use \"all\": true for every site)")
+
+    db = SessionLocal()
+    try:
+        query = site_io.filter_sites(db.query(Website), bulk)
+
+        if bulk.action == "delete":
+            sites = query.options(
+                selectinload(Website.keywords),
+                selectinload(Website.logs)
+            ).all()
+            ids = [s.id for s in sites]
+            keyword_ids = [k.id for s in sites for k in s.keywords]
+            for site_id in ids:
+                page_snapshots.delete_snapshots(db, site_id)
+            history.delete_history(db, ids)
+            shot_paths = screenshot_store.delete_screenshots(db, ids)
+            for site in sites:
+                db.delete(site)
+            db.commit()
+            screenshot_store.remove_unreferenced(shot_paths)
+        else:
+            enabled = bulk.action == "enable"
+            sites = query.all()
+            ids = [s.id for s in sites]
+            if ids:
+                db.query(Website).filter(Website.id.in_(ids)).update(
+                    {Website.enabled: enabled}, synchronize_session=False
+                )
+            db.commit()
+            schedule = [
+                (s.id, s.url, schedule_base(s), schedule_args(s)) for s in sites
+            ]
+    finally:
+        db.close()
+
+    if bulk.action == "delete":
+        for site_id in ids:
+            state_writer.discard(site_id)
+            history.recorder.discard(site_id)
+            forget_matcher(site_id)
+            scan_scheduler.remove(site_id)
+        for keyword_id in keyword_ids:
+            state_writer.discard(keyword_id, WebsiteKeyword)
+    else:
+        for site_id, url, base, args in schedule:
+            scan_scheduler.notify(site_id, url, last_checked=base, enabled=enabled, **args)
+
+    if ids:
+        site_list_changed("sites_bulk", action=bulk.action, count=len(ids))
+    return {"action": bulk.action, "count": len(ids), "ids": ids}
+
+
+@app.put("/api/websites/{site_id}/keywords", response_model=WebsiteResponse)
+def set_keywords(site_id: int, specs: list[KeywordSpec]):
+    """
+    Replaces the site's keyword set (empty list → full page change mode)
+    """
+    errors = validate_keywords(specs)
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+
+    db = SessionLocal()
+    site = (
+        db.query(Website)
+        .options(selectinload(Website.keywords))
+        .filter(Website.id == site_id)
+        .first()
+    )
+
+    if not site:
+        db.close()
+        raise HTTPException(status_code=404, detail="Website not found")
+
+    # old rows are deleted first: a kept keyword would otherwise hit the unique index
+    for old in site.keywords:
+        state_writer.discard(old.id, WebsiteKeyword)
+        db.delete(old)
+    db.flush()
+    site.keywords = keyword_rows_for(specs)
+    site.keyword = site.keywords[0].keyword if site.keywords else ""
+    site.keyword_found = False
+    site.alert_sent = False
+    db.commit()
+    db.refresh(site)
+    site.keywords
+    db.close()
+
+    forget_matcher(site_id)
+    site_list_changed("site_updated", site_id=site_id)
+    return site
+
+
+@app.put("/api/websites/{site_id}/regions", response_model=WebsiteResponse)
+def set_regions(site_id: int, regions: RegionUpdate):
+    """
+    Changes the watched region; the next scan takes a new baseline
+    instead of alerting on the different text
+    """
+    db = SessionLocal()
+    site = (
+        db.query(Website)
+        .options(selectinload(Website.keywords))
+        .filter(Website.id == site_id)
+        .first()
+    )
+
+    if not site:
+        db.close()
+        raise HTTPException(status_code=404, detail="Website not found")
+
+    site.include_selectors = regions.include_selectors
+    site.exclude_selectors = regions.exclude_selectors
+    site.region_version = (site.region_version or 0) + 1
+    # validators too: otherwise the preflight keeps skipping the render
+    # that takes the new baseline
+    for field in BASELINE_FIELDS:
+        setattr(site, field, None)
+    db.commit()
+    db.refresh(site)
+    site.keywords
+    db.close()
+
+    # queued state from before the change must not restore the old baseline
+    # (a scan in flight checks region_version before it queues its own)
+    state_writer.update(site_id, **{field: None for field in BASELINE_FIELDS})
+    site_list_changed("site_updated", site_id=site_id)
+    return site
+
+
+@app.put("/api/websites/{site_id}/noise", response_model=WebsiteResponse)
+def set_noise_rules(site_id: int, rules: NoiseRules):
+    """
+    Changes the masks / ignore patterns; the next scan re-baselines silently
+    (hash_profile no longer matches)
+    """
+    errors = normalizer.validate_rules(rules.noise_masks, rules.ignore_patterns)
+    if errors:
+        raise HTTPException(status_code=400, detail=errors)
+
+    db = SessionLocal()
+    site = (
+        db.query(Website)
+        .options(selectinload(Website.keywords))
+        .filter(Website.id == site_id)
+        .first()
+    )
+
+    if not site:
+        db.close()
+        raise HTTPException(status_code=404, detail="Website not found")
+
+    site.noise_masks = rules.noise_masks
+    site.ignore_patterns = rules.ignore_patterns
+    db.commit()
+    db.refresh(site)
+    site.keywords
+    db.close()
+    site_list_changed("site_updated", site_id=site_id)
+    return site
+
+
+@app.post("/api/websites/{site_id}/noise/preview")
+def preview_noise_rules(site_id: int, preview: NoisePreview):
+    """
+    Dry run: replays a rule set over the site's last snapshots and shows
+    which changes would still alert (nothing is saved)
+    """
+    db = SessionLocal()
+    site = db.query(Website).filter(Website.id == site_id).first()
+    db.close()
+
+    if not site:
+        raise HTTPException(status_code=404, detail="Website not found")
+
+    if preview.use_site_rules:
+        rules = normalizer.for_site(site)
+    else:
+        errors = normalizer.validate_rules(preview.noise_masks, preview.ignore_patterns)
+        if errors:
+            raise HTTPException(status_code=400, detail=errors)
+        rules = normalizer.get_normalizer(preview.noise_masks, preview.ignore_patterns)
+
+    limit = min(max(preview.limit, 2), page_snapshots.SNAPSHOT_HISTORY)
+    return normalizer.dry_run(rules, page_snapshots.load_snapshots(site_id, limit))
+
+
+@app.post("/api/websites/{site_id}/check", response_model=WebsiteResponse)
+def check_website_now(site_id: int, fresh: bool = False):
+    """
+    Runs one check right away; a render of the same URL from the last
+    SCAN_CACHE_TTL seconds is reused unless fresh=true
+    """
+    site = load_site_for_scan(site_id)
+    if not site:
+        raise HTTPException(status_code=404, detail="Website not found")
+    if not site.enabled:
+        raise HTTPException(status_code=409, detail="Website is disabled")
+
+    # 🔒 same lease as a scheduled scan → never two checks of one site at once
+    if scan_scheduler.is_running(site_id) or site_id not in claim_sites([site_id], require_due=False):
+        raise HTTPException(status_code=409, detail="A check of this website is already running")
+
+    # next scheduled scan an interval after this one
+    scan_scheduler.touch(site_id, time.time())
+
+    events.publish("scan_started", site_id=site_id, manual=True)
+    try:
+        check_website(site, manual=True, fresh=fresh)
+    finally:
+        state_writer.update(site_id, **RELEASED)
+
+    if site.adaptive:
+        scan_scheduler.retune(site.id, adaptive_interval.current_interval(site))
+    scan_scheduler.defer(site.id, site.breaker_open_until or 0)
+
+    site.scheduled_interval = scan_scheduler.scheduled_interval(site.id)
+    return site
+
+
 @app.post("/api/websites/{site_id}/toggle")
 def toggle_website(site_id: int):
     db = SessionLocal()
@@ -315,7 +1182,10 @@ def toggle_website(site_id: int):
 
     site.enabled = not site.enabled
     db.commit()
+    scan_scheduler.notify(site.id, site.url, last_checked=schedule_base(site), enabled=site.enabled,
+                          **schedule_args(site))
     db.close()
+    site_list_changed("site_updated", site_id=site_id, enabled=site.enabled)
     return {"enabled": site.enabled}
 
 
@@ -328,9 +1198,21 @@ def delete_website(site_id: int):
         db.close()
         raise HTTPException(status_code=404, detail="Website not found")
 
+    keyword_ids = [k.id for k in site.keywords]
+    page_snapshots.delete_snapshots(db, site_id)
+    history.delete_history(db, [site_id])
+    shot_paths = screenshot_store.delete_screenshots(db, [site_id])
     db.delete(site)
     db.commit()
     db.close()
+    screenshot_store.remove_unreferenced(shot_paths)
+    state_writer.discard(site_id)
+    history.recorder.discard(site_id)
+    for keyword_id in keyword_ids:
+        state_writer.discard(keyword_id, WebsiteKeyword)
+    forget_matcher(site_id)
+    scan_scheduler.remove(site_id)
+    site_list_changed("site_deleted", site_id=site_id)
     return {"message": "deleted"}
 
 
@@ -338,19 +1220,96 @@ def delete_website(site_id: int):
 # LOGS
 # =========================
 @app.get("/api/logs/{website_id}", response_model=list[WebsiteLogResponse])
-def get_logs(website_id: int):
+def get_logs(website_id: int, limit: int = 20):
     db = SessionLocal()
     logs = (
         db.query(WebsiteLog)
         .filter(WebsiteLog.website_id == website_id)
         .order_by(WebsiteLog.timestamp.desc())
-        .limit(20)
+        .limit(min(max(limit, 1), 500))
         .all()
     )
     db.close()
     return logs
 
 
+# =========================
+# HISTORY (uptime / latency from the rollups)
+# =========================
+def history_range(start: int | None, end: int | None) -> tuple[int, int]:
+    end = end or int(time.time())
+    start = start if start is not None else end - 86400
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+
+def require_site(site_id: int):
+    db = SessionLocal()
+    try:
+        exists = db.query(Website.id).filter(Website.id == site_id).first()
+    finally:
+        db.close()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Website not found")
+
+
+@app.get("/api/websites/{site_id}/uptime")
+def site_uptime(site_id: int, start: int | None = None, end: int | None = None):
+    """
+    Uptime + latency percentiles (ms) over [start, end), default last 24 h
+    """
+    require_site(site_id)
+    start, end = history_range(start, end)
+    result = history.summarize([site_id], start, end)
+    return {
+        "website_id": site_id,
+        "start": start,
+        "end": end,
+        "resolution": result["resolution"],
+        **result["sites"][site_id],
+    }
+
+
+@app.get("/api/websites/{site_id}/history")
+def site_history(site_id: int, start: int | None = None, end: int | None = None,
+                 resolution: int | None = None):
+    """
+    Per-bucket series for charts (resolution 60 / 3600 / 86400, picked when omitted)
+    """
+    require_site(site_id)
+    start, end = history_range(start, end)
+    return {"website_id": site_id, "start": start, "end": end,
+            **history.series(site_id, start, end, resolution)}
+
+
+@app.get("/api/history/uptime")
+def all_uptime(start: int | None = None, end: int | None = None):
+    start, end = history_range(start, end)
+    return {"start": start, "end": end, **history.summarize(None, start, end)}
+
+
+@app.get("/api/history/stats")
+def history_stats():
+    return history.recorder.stats()
+
+
+# =========================
+# SCREENSHOTS
+# =========================
+@app.get("/api/screenshots")
+def list_screenshots(website_id: int | None = None, limit: int = 50):
+    return screenshot_store.list_screenshots(website_id, min(max(limit, 1), 500))
+
+
+@app.get("/api/screenshots/{screenshot_id}")
+def get_screenshot(screenshot_id: int):
+    path = screenshot_store.get_screenshot_path(screenshot_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    return FileResponse(path)
+
+
 # =========================
 # MONITORING CONTROL
 # =========================
@@ -358,6 +1317,7 @@ def get_logs(website_id: int):
 def stop_monitoring():
     global MONITORING_ENABLED
     MONITORING_ENABLED = False
+    events.publish("monitoring", enabled=False)
     return {"enabled": False}
 
 
@@ -365,6 +1325,8 @@ def stop_monitoring():
 def start_monitoring():
     global MONITORING_ENABLED
     MONITORING_ENABLED = True
+    scan_scheduler.wake()
+    events.publish("monitoring", enabled=True)
     return {"enabled": True}
 
 
@@ -373,7 +1335,55 @@ def monitoring_status():
     return {"enabled": MONITORING_ENABLED}
 
 
+# =========================
+# BROWSER POOL / SCHEDULER STATS
+# =========================
+@app.get("/api/browser/stats")
+def browser_stats():
+    return pool_stats()
+
+
+@app.get("/api/scheduler/stats")
+def scheduler_stats():
+    return scan_scheduler.stats()
+
+
+@app.get("/api/coalescing/stats")
+def coalescing_stats():
+    return scan_coalescer.coalescer.stats()
+
+
+@app.get("/api/state/stats")
+def state_stats():
+    return state_writer.stats()
+
+
+@app.get("/api/housekeeping/stats")
+def housekeeping_stats():
+    return housekeeping.stats()
+
+
+@app.get("/api/events/stats")
+def event_stats():
+    return events.stats()
+
+
+@app.get("/api/preflight/stats")
+def get_preflight_stats():
+    return preflight_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/api/telegram/test")
 def telegram_test():
     send_telegram("✅ Telegram Test Successful! Screenshot system ready.")
-    return {"status": "sent"}
+    return {"status": "queued"}
+
+
+@app.get("/api/telegram/stats")
+def telegram_stats():
+    return telegram_queue_stats()
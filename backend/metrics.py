@@ -0,0 +1,217 @@
+"""
+In-process metrics (Prometheus text format, no client library needed)
+- Counter / Gauge / Histogram with labels, thread-safe
+- phase timers for the scan pipeline
+- render() → body for GET /metrics
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames=(), source=None):
+        """
+        source() → value (no labels) or {label values tuple: value},
+        read at scrape time instead of set()
+        """
+        super().__init__(name, help, labelnames)
+        self.source = source
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self):
+        if self.source is not None:
+            try:
+                value = self.source()
+            except Exception as e:
+                print(f"⚠️ Metric {self.name} unavailable:", repr(e))
+                return []
+            items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+
+        lines = []
+        inf = 'le="+Inf"'
+        for key, (counts, total, summed) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, inf)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(summed)}")
+        return lines
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    return "\n".join(m.render() for m in metrics) + "\n"
+
+
+# =========================
+# SCAN PIPELINE METRICS
+# =========================
+SCAN_PHASE_SECONDS = Histogram(
+    "webmon_scan_phase_seconds",
+    "Time spent per scan phase",
+    ("phase", "domain")
+)
+SCAN_SECONDS = Histogram(
+    "webmon_scan_seconds",
+    "Total time of one site check",
+    ("domain",)
+)
+SCANS_TOTAL = Counter(
+    "webmon_scans_total",
+    "Site checks by result (rendered / skipped / error)",
+    ("result",)
+)
+ALERTS_TOTAL = Counter(
+    "webmon_alerts_total",
+    "Alerts queued by kind",
+    ("kind",)
+)
+BROWSER_LAUNCH_SECONDS = Histogram(
+    "webmon_browser_launch_seconds",
+    "Chromium launch time"
+)
+BROWSER_GOVERNOR_ACTIONS = Counter(
+    "webmon_browser_governor_actions_total",
+    "Browser governor interventions (deadline_kill / rss_recycle / orphan_kill / retire)",
+    ("action",)
+)
+RENDER_SLOT_WAIT_SECONDS = Histogram(
+    "webmon_render_slot_wait_seconds",
+    "Wait for a free render slot (RENDER_MAX_CONCURRENT)"
+)
+SCHEDULER_LAG_SECONDS = Histogram(
+    "webmon_scheduler_lag_seconds",
+    "Delay between a site's due time and its dispatch",
+    buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+)
+TELEGRAM_SEND_SECONDS = Histogram(
+    "webmon_telegram_send_seconds",
+    "Telegram API request time",
+    ("method",)
+)
+TELEGRAM_MESSAGES_TOTAL = Counter(
+    "webmon_telegram_messages_total",
+    "Telegram deliveries by outcome",
+    ("method", "result")
+)
+DB_FLUSH_SECONDS = Histogram(
+    "webmon_db_flush_seconds",
+    "Write-behind flush (one transaction) time"
+)
+
+
+@contextmanager
+def phase(name: str, domain: str = ""):
+    with SCAN_PHASE_SECONDS.time(phase=name, domain=domain):
+        yield
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, Index, LargeBinary, JSON
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -24,12 +24,69 @@ class Website(Base):
     last_hash = Column(String, nullable=True)
     first_run = Column(Boolean, default=True)
 
+    # ⚡ HTTP PREFLIGHT (skip render when the page did not change)
+    preflight = Column(Boolean, default=True)
+    http_etag = Column(String, nullable=True)
+    http_last_modified = Column(String, nullable=True)
+    http_body_hash = Column(String, nullable=True)
+    preflight_skips = Column(Integer, default=0)         # renders skipped in a row
+    last_rendered = Column(Integer, default=0)           # last full render (forced after max age)
+
+    # 🚀 RENDER PROFILE
+    fast_scan = Column(Boolean, default=True)            # block images / fonts / trackers
+    wait_selector = Column(String, nullable=True)        # e.g. "#notice-table"
+
+    # 🎯 WATCHED REGION (CSS, or XPath with "xpath=" / "/")
+    include_selectors = Column(JSON, nullable=True)      # e.g. ["#notice-table"]
+    exclude_selectors = Column(JSON, nullable=True)      # e.g. [".marquee", "#visitor-count"]
+    region_version = Column(Integer, default=0)          # bumped on every region change
+
+    # 🧹 NOISE RULES (masked before hashing, NULL masks → defaults)
+    noise_masks = Column(JSON, nullable=True)            # e.g. ["counter", "time", "date"]
+    ignore_patterns = Column(JSON, nullable=True)        # e.g. ["Last updated:.*"]
+    hash_profile = Column(String, nullable=True)         # rule set last_hash was made with
+
+    # ⏱️ ADAPTIVE INTERVAL (learned from how often the page changes)
+    adaptive = Column(Boolean, default=False)
+    min_interval = Column(Integer, default=60)
+    max_interval = Column(Integer, default=86400)
+    effective_interval = Column(Integer, nullable=True)
+    change_rate = Column(Float, default=0.0)             # changes / second
+    changes_observed = Column(Float, default=0.0)        # decayed change count
+    time_observed = Column(Float, default=0.0)           # decayed seconds observed
+
+    # ⏳ FIRST SCAN NOT BEFORE (bulk imports spread their first renders)
+    not_before = Column(Integer, default=0)
+
+    # 🔌 CIRCUIT BREAKER (closed / open / half_open)
+    breaker_state = Column(String, default="closed")
+    consecutive_failures = Column(Integer, default=0)
+    breaker_open_until = Column(Integer, default=0)      # next probe (open state)
+    down_since = Column(Integer, nullable=True)          # first failure of the outage
+    last_error = Column(String, nullable=True)
+
+    # 🔒 SCAN LEASE (one worker scans a site at a time)
+    lease_owner = Column(String, nullable=True)
+    lease_expires = Column(Integer, default=0)
+
     logs = relationship(
         "WebsiteLog",
         back_populates="website",
         cascade="all, delete"
     )
 
+    screenshots = relationship(
+        "Screenshot",
+        cascade="all, delete"
+    )
+
+    keywords = relationship(
+        "WebsiteKeyword",
+        back_populates="website",
+        cascade="all, delete",
+        order_by="WebsiteKeyword.id"
+    )
+
 
 class WebsiteLog(Base):
     __tablename__ = "website_logs"
@@ -45,3 +102,119 @@ class WebsiteLog(Base):
     timestamp = Column(Integer)
 
     website = relationship("Website", back_populates="logs")
+
+    # newest-first per site (GET /api/logs + retention)
+    __table_args__ = (
+        Index("ix_website_logs_site_ts", "website_id", "timestamp"),
+    )
+
+
+class WebsiteKeyword(Base):
+    __tablename__ = "website_keywords"
+
+    id = Column(Integer, primary_key=True, index=True)
+    website_id = Column(Integer, ForeignKey("websites.id"), index=True)
+
+    keyword = Column(String, nullable=False)
+    is_regex = Column(Boolean, default=False)
+    whole_word = Column(Boolean, default=False)
+
+    found = Column(Boolean, default=False)          # last scan result
+    alert_sent = Column(Boolean, default=False)     # prevent spam (per keyword)
+
+    website = relationship("Website", back_populates="keywords")
+
+    # one row per keyword (several workers run the legacy migration at startup)
+    __table_args__ = (
+        Index("uq_website_keywords_site_keyword", "website_id", "keyword", "is_regex", unique=True),
+    )
+
+
+class Screenshot(Base):
+    __tablename__ = "screenshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    website_id = Column(Integer, ForeignKey("websites.id"), index=True)
+
+    sha256 = Column(String, index=True)        # original PNG bytes
+    phash = Column(String, nullable=True)      # 64-bit dHash (hex), needs Pillow
+    path = Column(String, nullable=False)      # shared by identical frames
+    size = Column(Integer, default=0)          # bytes on disk
+
+    created_at = Column(Integer)
+    last_used_at = Column(Integer)             # LRU for the total-size cap
+
+
+# =========================
+# PAGE SNAPSHOTS (text history, deduplicated blocks)
+# =========================
+class PageSnapshot(Base):
+    __tablename__ = "page_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    website_id = Column(Integer, ForeignKey("websites.id"), index=True)
+    text_hash = Column(String)
+    line_count = Column(Integer, default=0)
+    created_at = Column(Integer)
+
+
+class SnapshotBlock(Base):
+    __tablename__ = "snapshot_blocks"
+
+    snapshot_id = Column(Integer, ForeignKey("page_snapshots.id"), primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    block_hash = Column(String, index=True)
+
+
+class TextBlock(Base):
+    __tablename__ = "text_blocks"
+
+    hash = Column(String, primary_key=True)
+    data = Column(LargeBinary)        # zlib-compressed UTF-8 lines
+    size = Column(Integer)            # uncompressed bytes
+
+
+# =========================
+# SCAN HISTORY (raw results + rollups)
+# =========================
+class ScanResult(Base):
+    __tablename__ = "scan_results"
+
+    id = Column(Integer, primary_key=True)
+    website_id = Column(Integer, ForeignKey("websites.id"))
+    ts = Column(Integer)                       # scan time (unix)
+    duration_ms = Column(Integer)              # render / preflight time
+    status = Column(String)                    # rendered / skipped / render_error / error
+    changed = Column(Boolean, default=False)   # page hash / keyword hits changed
+
+    __table_args__ = (
+        Index("ix_scan_results_site_ts", "website_id", "ts"),
+        Index("ix_scan_results_ts", "ts"),
+    )
+
+
+class ScanRollup(Base):
+    __tablename__ = "scan_rollups"
+
+    website_id = Column(Integer, ForeignKey("websites.id"), primary_key=True)
+    resolution = Column(Integer, primary_key=True)     # 60 / 3600 / 86400 seconds
+    bucket = Column(Integer, primary_key=True)         # bucket start (unix)
+
+    count = Column(Integer, default=0)
+    up_count = Column(Integer, default=0)
+    changed_count = Column(Integer, default=0)
+    duration_sum = Column(Integer, default=0)
+    duration_min = Column(Integer, nullable=True)
+    duration_max = Column(Integer, nullable=True)
+    histogram = Column(JSON)                           # log bucket → count
+
+    __table_args__ = (
+        Index("ix_scan_rollups_res_bucket", "resolution", "bucket"),
+    )
+
+
+class AppCounter(Base):
+    __tablename__ = "app_counters"
+
+    key = Column(String, primary_key=True)             # e.g. "sites" (site list version)
+    value = Column(Integer, default=0)
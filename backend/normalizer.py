@@ -0,0 +1,221 @@
+"""
+Noise normalization before page hashing
+- built-in masks: counter, token, date, time, number
+- per-site ignore rules (regex, matched text is dropped)
+- rules are compiled once per rule set and cached
+- signature identifies the rule set → a site re-baselines silently when it changes
+- dry_run() replays a rule set over stored snapshots
+"""
+
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import Counter
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+NOISE_DEFAULT_MASKS = [
+    m.strip() for m in os.getenv("NOISE_DEFAULT_MASKS", "counter,token,time").split(",") if m.strip()
+]
+
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+
+# applied in this order (counters before plain numbers, dates before times)
+MASKS = {
+    "counter": (
+        r"\b(?:total\s+)?(?:visitors?|visits|hits|page\s*views|views|users\s+online|online\s+users)\b"
+        r"(?:\s*(?:no\.?|number|count(?:er)?|#))?\s*[:\-–=]?\s*\d[\d,.]*"
+        r"|\b\d[\d,.]*\s+(?:visitors?|visits|hits|page\s*views|views|users\s+online)\b",
+        "<counter>"
+    ),
+    "token": (
+        r"(?<![\w+/=-])(?=[\w+/-]*\d)(?=[\w+/-]*[a-z])[\w+/-]{24,}={0,2}",
+        "<token>"
+    ),
+    "date": (
+        r"\b\d{1,4}[./-]\d{1,2}[./-]\d{1,4}\b"
+        rf"|\b\d{{1,2}}(?:st|nd|rd|th)?[\s-]+{_MONTH},?[\s-]+\d{{2,4}}\b"
+        rf"|\b{_MONTH}\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{2,4}}\b",
+        "<date>"
+    ),
+    "time": (
+        r"\b\d{1,2}:\d{2}(?::\d{2})?(?:\s*[ap]\.?m\.?)?(?:\s*(?:ist|utc|gmt))?(?![\w:])",
+        "<time>"
+    ),
+    "number": (
+        r"\d[\d,.]*",
+        "<n>"
+    ),
+}
+
+
+def _compile(pattern: str):
+    return re.compile(pattern, re.IGNORECASE | re.MULTILINE)
+
+
+_COMPILED_MASKS = {name: (_compile(p), repl) for name, (p, repl) in MASKS.items()}
+
+
+def validate_rules(masks, ignore_patterns) -> list[str]:
+    """
+    Problems with a rule set (unknown masks, invalid regexes), empty when usable
+    """
+    errors = [f"unknown mask '{m}'" for m in (masks or []) if m not in MASKS]
+    for pattern in ignore_patterns or []:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            errors.append(f"invalid ignore pattern '{pattern}': {e}")
+    return errors
+
+
+class Normalizer:
+
+    def __init__(self, masks=(), ignore_patterns=()):
+        self.masks = [m for m in MASKS if m in set(masks)]
+        self.ignore_patterns = list(ignore_patterns)
+        self.errors = {}
+
+        self._steps = []
+        for pattern in self.ignore_patterns:
+            try:
+                self._steps.append((_compile(pattern), ""))
+            except re.error as e:
+                self.errors[pattern] = str(e)
+        self._steps.extend(_COMPILED_MASKS[m] for m in self.masks)
+
+        if self._steps:
+            raw = json.dumps([self.masks, self.ignore_patterns], ensure_ascii=False)
+            self.signature = hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+        else:
+            self.signature = ""     # no rules → same hash as before normalization
+
+    def apply(self, text: str) -> str:
+        for regex, replacement in self._steps:
+            text = regex.sub(replacement, text)
+        return text
+
+    def fingerprint(self, text: str) -> str:
+        """
+        Page hash: normalized text with all whitespace collapsed
+        """
+        clean_text = " ".join(self.apply(text).split())
+        return hashlib.sha256(clean_text.encode("utf-8")).hexdigest()
+
+    def drop_noise(self, diff: dict) -> dict:
+        """
+        Removes added / removed line pairs that only differ in masked noise
+        (e.g. the visitor counter line), and lines the ignore rules remove
+        completely, from a snapshot diff
+        """
+        removed = Counter(self.apply(line) for line in diff.get("removed", []))
+        noise = Counter()
+        added = []
+        for line in diff.get("added", []):
+            key = self.apply(line)
+            if not key.strip():
+                continue
+            if removed[key] > noise[key]:
+                noise[key] += 1
+            else:
+                added.append(line)
+
+        kept_removed = []
+        for line in diff.get("removed", []):
+            key = self.apply(line)
+            if not key.strip():
+                continue
+            if noise[key]:
+                noise[key] -= 1
+            else:
+                kept_removed.append(line)
+
+        return {**diff, "added": added, "removed": kept_removed}
+
+
+IDENTITY = Normalizer()
+
+
+# =========================
+# CACHE (one compiled normalizer per rule set)
+# =========================
+_cache = {}
+_lock = threading.Lock()
+_CACHE_MAX = 512
+
+
+def get_normalizer(masks=None, ignore_patterns=None) -> Normalizer:
+    """
+    masks None → NOISE_DEFAULT_MASKS
+    """
+    masks = NOISE_DEFAULT_MASKS if masks is None else masks
+    key = (tuple(sorted(set(masks))), tuple(ignore_patterns or ()))
+    with _lock:
+        cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    normalizer = Normalizer(key[0], key[1])
+    for pattern, error in normalizer.errors.items():
+        print(f"⚠️ Invalid ignore pattern '{pattern}' skipped:", error)
+
+    with _lock:
+        if len(_cache) >= _CACHE_MAX:
+            _cache.clear()
+        _cache[key] = normalizer
+    return normalizer
+
+
+def for_site(site) -> Normalizer:
+    return get_normalizer(site.noise_masks, site.ignore_patterns)
+
+
+# =========================
+# DRY RUN
+# =========================
+def dry_run(normalizer: Normalizer, snapshots: list[dict], max_lines: int = 10) -> dict:
+    """
+    Replays a rule set over stored snapshots (newest first, as returned by
+    page_snapshots.load_snapshots): which changes would still alert?
+    """
+    rows = []
+    for snap in snapshots:
+        rows.append({
+            "id": snap["id"],
+            "created_at": snap["created_at"],
+            "raw_hash": IDENTITY.fingerprint(snap["text"]),
+            "hash": normalizer.fingerprint(snap["text"]),
+            "changed_raw": None,        # vs the next older snapshot
+            "changed": None,
+            "noise": [],
+        })
+
+    for newer, older, row, prev in zip(snapshots, snapshots[1:], rows, rows[1:]):
+        row["changed_raw"] = row["raw_hash"] != prev["raw_hash"]
+        row["changed"] = row["hash"] != prev["hash"]
+
+        new_lines = Counter(newer["text"].split("\n"))
+        old_lines = Counter(older["text"].split("\n"))
+        diff = {
+            "added": list((new_lines - old_lines).elements()),
+            "removed": list((old_lines - new_lines).elements()),
+        }
+        kept = normalizer.drop_noise(diff)
+        kept_added = Counter(kept["added"])
+        row["noise"] = list((Counter(diff["added"]) - kept_added).elements())[:max_lines]
+
+    compared = [r for r in rows if r["changed_raw"] is not None]
+    return {
+        "masks": normalizer.masks,
+        "ignore_patterns": normalizer.ignore_patterns,
+        "signature": normalizer.signature,
+        "errors": normalizer.errors,
+        "compared": len(compared),
+        "changes_raw": sum(1 for r in compared if r["changed_raw"]),
+        "changes": sum(1 for r in compared if r["changed"]),
+        "snapshots": rows,
+    }
@@ -0,0 +1,330 @@
+"""
+Page text snapshots + diff engine
+- normalized page text is split into content-defined blocks of lines
+- blocks are zlib-compressed and keyed by hash → unchanged blocks stored once
+- the last SNAPSHOT_HISTORY snapshots per site are kept
+- diff compares block hashes first and only decompresses / line-diffs
+  the blocks that changed (fast on large pages)
+- the scan thread only reads: new snapshots are written by the
+  write-behind flush (state_writer hook), the newest unflushed one per
+  site is diffed from memory
+"""
+
+import os
+import time
+import zlib
+import hashlib
+import difflib
+import threading
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import SessionLocal
+from models import PageSnapshot, SnapshotBlock, TextBlock
+
+load_dotenv()
+
+SNAPSHOT_HISTORY = int(os.getenv("SNAPSHOT_HISTORY", "5"))
+
+BLOCK_BOUNDARY_MOD = 16      # ~16 lines per block on average
+BLOCK_MAX_LINES = 64
+
+
+# =========================
+# BLOCKS
+# =========================
+def split_blocks(lines: list[str]) -> list[list[str]]:
+    """
+    Content-defined chunking: a block ends after a line whose checksum hits
+    the boundary, so an inserted line only changes the block around it
+    """
+    blocks, current = [], []
+    for line in lines:
+        current.append(line)
+        boundary = zlib.crc32(line.encode("utf-8")) % BLOCK_BOUNDARY_MOD == 0
+        if boundary or len(current) >= BLOCK_MAX_LINES:
+            blocks.append(current)
+            current = []
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+def _block_hash(block: list[str]) -> str:
+    return hashlib.sha256("\n".join(block).encode("utf-8")).hexdigest()
+
+
+def _load_blocks(db, hashes) -> dict:
+    hashes = list(set(hashes))
+    if not hashes:
+        return {}
+    rows = db.query(TextBlock.hash, TextBlock.data).filter(TextBlock.hash.in_(hashes)).all()
+    return {h: zlib.decompress(data).decode("utf-8").split("\n") for h, data in rows}
+
+
+def _latest_snapshot(db, website_id: int):
+    return (
+        db.query(PageSnapshot)
+        .filter(PageSnapshot.website_id == website_id)
+        .order_by(PageSnapshot.created_at.desc(), PageSnapshot.id.desc())
+        .first()
+    )
+
+
+def _snapshot_hashes(db, snapshot_id: int) -> list[str]:
+    return [
+        h for (h,) in db.query(SnapshotBlock.block_hash)
+        .filter(SnapshotBlock.snapshot_id == snapshot_id)
+        .order_by(SnapshotBlock.seq)
+    ]
+
+
+# =========================
+# DIFF
+# =========================
+def _diff(load_old, old_hashes, new_hashes, new_blocks) -> dict:
+    """
+    load_old(hashes) → {hash: lines} for the previous snapshot's blocks
+    """
+    added, removed = [], []
+
+    matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    changed = [op for op in matcher.get_opcodes() if op[0] != "equal"]
+
+    old_text = load_old([h for op in changed for h in old_hashes[op[1]:op[2]]])
+
+    for _, i1, i2, j1, j2 in changed:
+        old_lines = [line for h in old_hashes[i1:i2] for line in old_text.get(h, [])]
+        new_lines = [line for h in new_hashes[j1:j2] for line in new_blocks[h]]
+
+        lines = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        for tag, a1, a2, b1, b2 in lines.get_opcodes():
+            if tag in ("replace", "delete"):
+                removed.extend(old_lines[a1:a2])
+            if tag in ("replace", "insert"):
+                added.extend(new_lines[b1:b2])
+
+    return {"added": added, "removed": removed}
+
+
+# =========================
+# WRITE-BEHIND (state_writer hook)
+# =========================
+class SnapshotRecorder:
+
+    def __init__(self):
+        self._queue = []            # snapshots waiting for the flush
+        self._latest = {}           # website_id → newest snapshot not committed yet
+        self._lock = threading.Lock()
+
+        # stats
+        self.recorded = 0
+
+    def add(self, snapshot: dict):
+        with self._lock:
+            self._queue.append(snapshot)
+            self._latest[snapshot["website_id"]] = snapshot
+            self.recorded += 1
+
+    def latest(self, website_id: int):
+        with self._lock:
+            return self._latest.get(website_id)
+
+    def discard(self, website_id: int):
+        with self._lock:
+            self._queue = [s for s in self._queue if s["website_id"] != website_id]
+            self._latest.pop(website_id, None)
+
+    # --- hook protocol: take → write(db) → release (restore on failure) ---
+    def take(self):
+        with self._lock:
+            batch, self._queue = self._queue, []
+        return batch
+
+    def restore(self, batch):
+        with self._lock:
+            self._queue = batch + self._queue
+
+    def release(self, batch):
+        # committed (or dropped) → the DB is the source again
+        with self._lock:
+            for snapshot in batch:
+                if self._latest.get(snapshot["website_id"]) is snapshot:
+                    del self._latest[snapshot["website_id"]]
+
+    def write(self, db, batch):
+        blocks = {}
+        for snapshot in batch:
+            blocks.update(snapshot["blocks"])
+
+        # 📦 only blocks we have never seen are compressed + stored
+        hashes = list(blocks)
+        known = set()
+        for start in range(0, len(hashes), 500):
+            known.update(
+                h for (h,) in db.query(TextBlock.hash).filter(TextBlock.hash.in_(hashes[start:start + 500]))
+            )
+        fresh = []
+        for h in hashes:
+            if h in known:
+                continue
+            raw = "\n".join(blocks[h]).encode("utf-8")
+            fresh.append({"hash": h, "data": zlib.compress(raw, 6), "size": len(raw)})
+        for start in range(0, len(fresh), 300):
+            # another process may store the same block concurrently
+            db.execute(sqlite_insert(TextBlock).values(fresh[start:start + 300]).on_conflict_do_nothing())
+
+        for item in batch:
+            snapshot = PageSnapshot(
+                website_id=item["website_id"],
+                text_hash=item["text_hash"],
+                line_count=item["line_count"],
+                created_at=item["created_at"],
+            )
+            db.add(snapshot)
+            db.flush()
+
+            db.bulk_insert_mappings(SnapshotBlock, [
+                {"snapshot_id": snapshot.id, "seq": i, "block_hash": h}
+                for i, h in enumerate(item["hashes"])
+            ])
+
+        for website_id in {item["website_id"] for item in batch}:
+            _prune(db, website_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": len(self._queue), "recorded": self.recorded}
+
+
+recorder = SnapshotRecorder()
+
+
+# =========================
+# PUBLIC API
+# =========================
+def record_snapshot(website_id: int, page_text: str) -> dict:
+    """
+    Queues the page text for storage and returns the diff against the
+    previous snapshot: {"added": [...], "removed": [...], "first": bool}
+    """
+    lines = page_text.split("\n") if page_text else []
+    blocks = split_blocks(lines)
+    new_blocks = {_block_hash(b): b for b in blocks}
+    new_hashes = [_block_hash(b) for b in blocks]
+    text_hash = hashlib.sha256(page_text.encode("utf-8")).hexdigest()
+
+    pending = recorder.latest(website_id)
+    if pending is not None:
+        # previous snapshot not flushed yet → diff from memory
+        if pending["text_hash"] == text_hash:
+            return {"added": [], "removed": [], "first": False}
+        result = _diff(
+            lambda hashes: {h: pending["blocks"][h] for h in hashes},
+            pending["hashes"], new_hashes, new_blocks
+        )
+        result["first"] = False
+    else:
+        db = SessionLocal()
+        try:
+            previous = _latest_snapshot(db, website_id)
+            if previous is not None and previous.text_hash == text_hash:
+                return {"added": [], "removed": [], "first": False}
+
+            if previous is not None:
+                result = _diff(
+                    lambda hashes: _load_blocks(db, hashes),
+                    _snapshot_hashes(db, previous.id), new_hashes, new_blocks
+                )
+                result["first"] = False
+            else:
+                result = {"added": [], "removed": [], "first": True}
+        finally:
+            db.close()
+
+    recorder.add({
+        "website_id": website_id,
+        "text_hash": text_hash,
+        "line_count": len(lines),
+        "created_at": int(time.time()),
+        "hashes": new_hashes,
+        "blocks": new_blocks,
+    })
+    return result
+
+
+def load_snapshots(website_id: int, limit: int = SNAPSHOT_HISTORY) -> list[dict]:
+    """
+    Newest first: [{"id", "created_at", "text"}]
+    """
+    db = SessionLocal()
+    try:
+        snapshots = (
+            db.query(PageSnapshot)
+            .filter(PageSnapshot.website_id == website_id)
+            .order_by(PageSnapshot.created_at.desc(), PageSnapshot.id.desc())
+            .limit(limit)
+            .all()
+        )
+        result = []
+        for snap in snapshots:
+            hashes = _snapshot_hashes(db, snap.id)
+            blocks = _load_blocks(db, hashes)
+            lines = [line for h in hashes for line in blocks.get(h, [])]
+            result.append({"id": snap.id, "created_at": snap.created_at, "text": "\n".join(lines)})
+        return result
+    finally:
+        db.close()
+
+
+def delete_snapshots(db, website_id: int):
+    recorder.discard(website_id)
+    ids = [i for (i,) in db.query(PageSnapshot.id).filter(PageSnapshot.website_id == website_id)]
+    if ids:
+        db.query(SnapshotBlock).filter(SnapshotBlock.snapshot_id.in_(ids)).delete(synchronize_session=False)
+        db.query(PageSnapshot).filter(PageSnapshot.id.in_(ids)).delete(synchronize_session=False)
+
+
+def _prune(db, website_id: int):
+    old = [
+        i for (i,) in db.query(PageSnapshot.id)
+        .filter(PageSnapshot.website_id == website_id)
+        .order_by(PageSnapshot.created_at.desc(), PageSnapshot.id.desc())
+        .offset(SNAPSHOT_HISTORY)
+    ]
+    if old:
+        db.query(SnapshotBlock).filter(SnapshotBlock.snapshot_id.in_(old)).delete(synchronize_session=False)
+        db.query(PageSnapshot).filter(PageSnapshot.id.in_(old)).delete(synchronize_session=False)
+
+
+def collect_garbage():
+    """
+    Drops blocks no snapshot references any more
+    """
+    db = SessionLocal()
+    try:
+        removed = db.execute(text("""
+            DELETE FROM text_blocks
+            WHERE hash NOT IN (SELECT DISTINCT block_hash FROM snapshot_blocks)
+        """)).rowcount
+        db.commit()
+        if removed:
+            print(f"🧹 Snapshot GC removed {removed} text blocks")
+    finally:
+        db.close()
+
+
+def format_diff(diff: dict, max_lines: int = 8, width: int = 160) -> str:
+    """
+    Short +/- listing for Telegram / logs
+    """
+    out = []
+    for prefix, key in (("➕", "added"), ("➖", "removed")):
+        lines = [l for l in diff.get(key, []) if l.strip()]
+        for line in lines[:max_lines]:
+            out.append(f"{prefix} {line[:width]}")
+        if len(lines) > max_lines:
+            out.append(f"{prefix} … {len(lines) - max_lines} more")
+    return "\n".join(out)
@@ -1,30 +1,192 @@
+"""
+Shared PDF fetcher
+- streams to disk in chunks (no r.content in memory)
+- parallel downloads with a bounded pool
+- files stored by SHA-256 → same PDF from two URLs is stored once,
+  two different "notice.pdf" files never collide
+- URL → hash index, so a known URL is never fetched again
+- size limit per file
+"""
+
 import os
+import json
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, unquote
+
 import requests
-from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+load_dotenv()
 
 PDF_DIR = "pdfs"
+PDF_INDEX = os.path.join(PDF_DIR, "index.json")
+
+PDF_MAX_BYTES = int(float(os.getenv("PDF_MAX_MB", "50")) * 1024 * 1024)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "4"))
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "60"))
+CHUNK_SIZE = 64 * 1024
+
 os.makedirs(PDF_DIR, exist_ok=True)
 
+_session = requests.Session()
+_executor = ThreadPoolExecutor(max_workers=PDF_WORKERS, thread_name_prefix="pdf")
+
+_lock = threading.RLock()
+_inflight = {}          # url → Future (same URL requested twice at once)
+
+
+# =========================
+# URL → HASH INDEX
+# =========================
+def _load_index() -> dict:
+    try:
+        with open(PDF_INDEX, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+_index = _load_index()
+
+
+def _save_index():
+    tmp = PDF_INDEX + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_index, f)
+    os.replace(tmp, PDF_INDEX)
+
+
+def _path_for(sha256: str) -> str:
+    return os.path.join(PDF_DIR, f"{sha256}.pdf")
+
+
+def _filename_for(pdf_url: str) -> str:
+    filename = unquote(os.path.basename(urlparse(pdf_url).path))
+    if not filename.lower().endswith(".pdf"):
+        filename = "document.pdf"
+    return filename
+
+
+# =========================
+# DOWNLOAD (STREAMING)
+# =========================
+def _download(pdf_url: str) -> dict | None:
+    filename = _filename_for(pdf_url)
+
+    with _lock:
+        known = _index.get(pdf_url)
+    if known and os.path.exists(_path_for(known["sha256"])):
+        return {**known, "url": pdf_url, "path": _path_for(known["sha256"]), "new": False}
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=PDF_DIR, suffix=".part")
 
-def download_pdf(pdf_url: str) -> str | None:
-    """
-    Downloads PDF and returns local file path
-    """
     try:
-        filename = os.path.basename(urlparse(pdf_url).path)
-        if not filename.lower().endswith(".pdf"):
-            filename = "document.pdf"
+        with os.fdopen(fd, "wb") as out, _session.get(pdf_url, stream=True, timeout=PDF_TIMEOUT) as r:
+            r.raise_for_status()
+
+            declared = int(r.headers.get("Content-Length") or 0)
+            if declared > PDF_MAX_BYTES:
+                raise ValueError(f"PDF too large ({declared} bytes)")
+
+            first = True
+            for chunk in r.iter_content(CHUNK_SIZE):
+                if not chunk:
+                    continue
+                if first and not chunk.lstrip().startswith(b"%PDF"):
+                    raise ValueError("Response is not a PDF")
+                first = False
 
-        file_path = os.path.join(PDF_DIR, filename)
+                size += len(chunk)
+                if size > PDF_MAX_BYTES:
+                    raise ValueError(f"PDF exceeds {PDF_MAX_BYTES} bytes")
 
-        response = requests.get(pdf_url, timeout=30)
-        response.raise_for_status()
+                digest.update(chunk)
+                out.write(chunk)
 
-        with open(file_path, "wb") as f:
-            f.write(response.content)
+        sha256 = digest.hexdigest()
+        final_path = _path_for(sha256)
 
-        return file_path
+        with _lock:
+            is_new = not os.path.exists(final_path)
+            if is_new:
+                os.replace(tmp_path, final_path)
+            else:
+                os.remove(tmp_path)     # same PDF, other URL
+
+            entry = {"sha256": sha256, "filename": filename, "size": size}
+            _index[pdf_url] = entry
+            _save_index()
+
+        return {**entry, "url": pdf_url, "path": final_path, "new": is_new}
 
     except Exception as e:
-        print("❌ PDF download failed:", e)
+        print("❌ PDF download failed:", pdf_url, repr(e))
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return None
+
+
+def _submit(pdf_url: str):
+    """
+    Returns (future, owner). Only the owner of a download may treat it as new,
+    so the same URL requested by two scans at once is sent once.
+    """
+    with _lock:
+        future = _inflight.get(pdf_url)
+        if future is not None:
+            return future, False
+
+        future = _executor.submit(_download, pdf_url)
+        _inflight[pdf_url] = future
+        future.add_done_callback(lambda _f: _forget(pdf_url))
+        return future, True
+
+
+def _forget(pdf_url: str):
+    with _lock:
+        _inflight.pop(pdf_url, None)
+
+
+# =========================
+# PUBLIC API
+# =========================
+def fetch_pdfs(pdf_urls: list[str]) -> list[dict]:
+    """
+    Downloads in parallel, returns one entry per successful URL (input order):
+    {"url", "sha256", "filename", "size", "path", "new"}
+    "new" is False when the URL or the content was already stored.
+    """
+    submitted = [_submit(u) for u in dict.fromkeys(pdf_urls)]
+    results = [(future.result(), owner) for future, owner in submitted]
+
+    # new content downloaded by this batch (parallel downloads of the
+    # same bytes can finish in any order)
+    new_hashes = {
+        item["sha256"] for item, owner in results
+        if item is not None and owner and item["new"]
+    }
+
+    # same content behind two URLs → only the first one counts as new
+    seen = set()
+    unique = []
+    for item, _ in results:
+        if item is None:
+            continue
+        is_new = item["sha256"] in new_hashes and item["sha256"] not in seen
+        seen.add(item["sha256"])
+        unique.append({**item, "new": is_new})
+    return unique
+
+
+def download_pdf(pdf_url: str) -> str | None:
+    """
+    Downloads PDF and returns local file path
+    """
+    future, _ = _submit(pdf_url)
+    result = future.result()
+    return result["path"] if result else None
@@ -0,0 +1,140 @@
+"""
+HTTP preflight before a Playwright render
+- conditional GET with the stored ETag / Last-Modified
+- falls back to a hash of the raw response body
+- only a reported change (or any doubt) escalates to the browser
+- a full render is still forced after PREFLIGHT_MAX_SKIPS skips in a row or
+  PREFLIGHT_MAX_AGE seconds: a server whose validators never change would
+  otherwise hide every update behind the preflight
+"""
+
+import os
+import hashlib
+import threading
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PREFLIGHT_ENABLED = os.getenv("PREFLIGHT_ENABLED", "1") == "1"
+PREFLIGHT_TIMEOUT = float(os.getenv("PREFLIGHT_TIMEOUT", "10"))
+PREFLIGHT_MAX_SKIPS = int(os.getenv("PREFLIGHT_MAX_SKIPS", "24"))         # 0 = no limit
+PREFLIGHT_MAX_AGE = int(os.getenv("PREFLIGHT_MAX_AGE", "86400"))          # seconds, 0 = no limit
+
+_session = requests.Session()
+_session.headers.update({
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+    )
+})
+
+_lock = threading.Lock()
+_stats = {
+    "checks": 0,
+    "not_modified": 0,      # 304 from the server
+    "same_body": 0,         # 200 but raw hash unchanged
+    "escalated": 0,         # render needed
+    "errors": 0,
+    "forced": 0,            # render forced by the skip / age limit
+}
+
+
+def _count(key: str):
+    with _lock:
+        _stats["checks"] += 1
+        _stats[key] += 1
+
+
+def render_due(skips: int | None, last_rendered: int | None, now: float) -> bool:
+    """
+    True → skip the preflight and render (too many skips in a row, or the
+    last full render is too old); counted as "forced"
+    """
+    due = (
+        (PREFLIGHT_MAX_SKIPS > 0 and (skips or 0) >= PREFLIGHT_MAX_SKIPS)
+        or (PREFLIGHT_MAX_AGE > 0 and now - (last_rendered or 0) >= PREFLIGHT_MAX_AGE)
+    )
+    if due:
+        with _lock:
+            _stats["forced"] += 1
+    return due
+
+
+def preflight(
+    url: str,
+    etag: str | None = None,
+    last_modified: str | None = None,
+    body_hash: str | None = None,
+    normalize=None
+) -> dict:
+    """
+    normalize(text) → text with noise masked before the body is hashed
+    (visitor counters, CSRF tokens); None hashes the raw bytes
+
+    Returns:
+    {
+        "changed": bool,          # True → do the full render
+        "etag": str | None,
+        "last_modified": str | None,
+        "body_hash": str | None,
+    }
+    """
+    result = {
+        "changed": True,
+        "etag": etag,
+        "last_modified": last_modified,
+        "body_hash": body_hash,
+    }
+
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        response = _session.get(url, headers=headers, timeout=PREFLIGHT_TIMEOUT)
+    except Exception as e:
+        print("⚠️ Preflight failed, rendering anyway:", repr(e))
+        _count("errors")
+        return result
+
+    # 🟢 server says nothing changed
+    if response.status_code == 304:
+        result["changed"] = False
+        _count("not_modified")
+        return result
+
+    # ❓ blocked / broken / redirected to an error → let the browser decide
+    if response.status_code != 200:
+        _count("escalated")
+        return result
+
+    result["etag"] = response.headers.get("ETag")
+    result["last_modified"] = response.headers.get("Last-Modified")
+    if normalize is not None:
+        body = normalize(response.text).encode("utf-8")
+    else:
+        body = response.content
+    result["body_hash"] = hashlib.sha256(body).hexdigest()
+
+    if body_hash and result["body_hash"] == body_hash:
+        result["changed"] = False
+        _count("same_body")
+    else:
+        _count("escalated")
+
+    return result
+
+
+def preflight_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+
+    skipped = stats["not_modified"] + stats["same_body"]
+    stats["renders_skipped"] = skipped
+    stats["hit_rate"] = round(skipped / stats["checks"], 4) if stats["checks"] else 0.0
+    stats["enabled"] = PREFLIGHT_ENABLED
+    return stats
@@ -0,0 +1,214 @@
+"""
+Render coalescing (one page load per URL per window)
+- sites watching the same URL with the same render profile (fast scan,
+  wait selector, include / exclude regions) share one render
+- concurrent checks of one profile wait for the render already running
+  instead of starting their own (single flight)
+- finished renders are cached for SCAN_CACHE_TTL seconds, so the other rows
+  of a scheduled group, and manual checks, reuse a fresh result (without
+  the screenshot: expired entries are purged on every store, so the cache
+  never holds more than one window of page data)
+- every site still evaluates the render with its own keywords, noise rules
+  and hash state (browser_service.evaluate_page)
+- a site that needs a screenshot the shared render did not take gets a
+  fresh render of its own (alerts always carry evidence)
+"""
+
+import os
+import time
+import threading
+
+from dotenv import load_dotenv
+
+from browser_service import render_page, evaluate_page
+from scan_scheduler import url_key
+
+load_dotenv()
+
+SCAN_COALESCE_ENABLED = os.getenv("SCAN_COALESCE_ENABLED", "1") == "1"
+SCAN_CACHE_TTL = float(os.getenv("SCAN_CACHE_TTL", "30"))
+SCAN_CACHE_MAX = 512
+
+
+class _Flight:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.captures = []          # capture_if of every site waiting on this render
+        self.page_data = None
+        self.error = None           # render raised (e.g. scan deadline) → raised for everyone
+
+
+class RenderCoalescer:
+
+    def __init__(self, ttl: float = SCAN_CACHE_TTL):
+        self.ttl = ttl
+        self._cache = {}            # profile → (finished, page_data)
+        self._flights = {}          # profile → _Flight
+        self._lock = threading.Lock()
+
+        # stats
+        self.renders = 0
+        self.joined = 0
+        self.cache_hits = 0
+        self.screenshot_misses = 0
+
+    def _fresh(self, key, now: float):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if now - entry[0] > self.ttl:
+            del self._cache[key]
+            return None
+        return entry[1]
+
+    def _store(self, key, page_data):
+        now = time.monotonic()
+        self._cache = {k: v for k, v in self._cache.items() if now - v[0] <= self.ttl}
+        if len(self._cache) >= SCAN_CACHE_MAX:
+            self._cache.pop(min(self._cache, key=lambda k: self._cache[k][0]))
+        # screenshots (megabytes each) stay out of the cache: a site that
+        # needs one renders its own (usable() below)
+        self._cache[key] = (now, {**page_data, "screenshot_png": None})
+
+    def render(self, key, render, capture_if=None, fresh: bool = False) -> dict:
+        """
+        render(capture_if) → page_data; capture_if(page_data) is this
+        site's screenshot test. fresh skips the cache (a render already
+        running is still joined).
+        """
+        def usable(page_data):
+            if capture_if is None or page_data["screenshot_png"] is not None or page_data["error"]:
+                return True
+            if capture_if(page_data):
+                self.screenshot_misses += 1
+                return False
+            return True
+
+        with self._lock:
+            cached = None if fresh else self._fresh(key, time.monotonic())
+            flight = None if cached is not None else self._flights.get(key)
+            if flight is not None:
+                if capture_if is not None:
+                    flight.captures.append(capture_if)
+                self.joined += 1
+
+        if cached is not None:
+            if usable(cached):
+                self.cache_hits += 1
+                return cached
+            return self._own_render(key, render, capture_if)
+
+        # 🔗 someone is rendering this profile right now → wait for it
+        if flight is not None:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if flight.page_data is not None and usable(flight.page_data):
+                return flight.page_data
+            return self._own_render(key, render, capture_if)
+
+        return self._lead(key, render, capture_if)
+
+    def _lead(self, key, render, capture_if):
+        flight = _Flight()
+        if capture_if is not None:
+            flight.captures.append(capture_if)
+        with self._lock:
+            self._flights[key] = flight
+
+        try:
+            page_data = render(lambda data: any(capture(data) for capture in list(flight.captures)))
+            with self._lock:
+                self.renders += 1
+                self._store(key, page_data)
+            flight.page_data = page_data
+            return page_data
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.done.set()
+
+    def _own_render(self, key, render, capture_if):
+        page_data = render(capture_if)
+        with self._lock:
+            self.renders += 1
+            self._store(key, page_data)
+        return page_data
+
+    def stats(self) -> dict:
+        with self._lock:
+            cached = len(self._cache)
+            in_flight = len(self._flights)
+        served = self.renders + self.joined + self.cache_hits
+        return {
+            "enabled": SCAN_COALESCE_ENABLED,
+            "cache_ttl": self.ttl,
+            "cached": cached,
+            "in_flight": in_flight,
+            "renders": self.renders,
+            "joined": self.joined,
+            "cache_hits": self.cache_hits,
+            "renders_saved": self.joined + self.cache_hits - self.screenshot_misses,
+            "screenshot_misses": self.screenshot_misses,
+            "share_ratio": round(1 - self.renders / served, 3) if served else 0.0,
+        }
+
+
+coalescer = RenderCoalescer()
+
+
+def scan(
+    url: str,
+    matcher=None,
+    normalizer=None,
+    capture_if=None,
+    fast: bool = True,
+    wait_selector: str | None = None,
+    include_selectors: list[str] | None = None,
+    exclude_selectors: list[str] | None = None,
+    fresh: bool = False
+) -> dict:
+    """
+    Same result as browser_service.scan_website, but the page load may be
+    shared with other sites of the same URL + render profile
+    """
+    profile = (
+        url_key(url),
+        bool(fast),
+        (wait_selector or "").strip(),
+        tuple(s.strip() for s in include_selectors or () if s and s.strip()),
+        tuple(s.strip() for s in exclude_selectors or () if s and s.strip()),
+    )
+
+    evaluated = {}
+
+    def _capture(page_data):
+        # this site's view of the page decides about its screenshot
+        result = evaluate_page(page_data, matcher, normalizer)
+        evaluated[id(page_data)] = result
+        return capture_if is not None and not result["error_page"] and capture_if(result)
+
+    def _render(capture):
+        return render_page(
+            url,
+            fast=fast,
+            wait_selector=wait_selector,
+            include_selectors=include_selectors,
+            exclude_selectors=exclude_selectors,
+            capture_if=capture
+        )
+
+    if SCAN_COALESCE_ENABLED:
+        page_data = coalescer.render(profile, _render, _capture if capture_if else None, fresh=fresh)
+    else:
+        page_data = _render(_capture if capture_if else None)
+
+    result = evaluated.get(id(page_data)) or evaluate_page(page_data, matcher, normalizer)
+    result["screenshot_png"] = page_data["screenshot_png"]
+    result["error"] = page_data["error"]
+    return result
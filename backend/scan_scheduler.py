@@ -0,0 +1,601 @@
+"""
+Concurrent scan scheduler
+- sites live in a min-heap keyed by next due time
+- due sites are dispatched to a worker pool (global + per-domain limits)
+- a site is re-armed only after its scan completes
+- the heap is an in-memory index kept current by API notifications
+  (upsert / remove); a slow DB reconcile is only a safety net
+- optional leases: due sites are claimed in one batch before dispatch,
+  so several workers / hosts can share one database without double scans
+- optional render budget: adaptive sites are stretched (up to their
+  max interval) when the whole schedule needs more renders per hour
+- sites watching the same URL are grouped: when one is due, the others
+  due within SCAN_COALESCE_WINDOW run right after it on the same worker
+  (one render, see scan_coalescer)
+- exposes queue depth and scheduling lag
+"""
+
+import os
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlsplit, urlunsplit
+
+from dotenv import load_dotenv
+
+from metrics import SCHEDULER_LAG_SECONDS
+
+load_dotenv()
+
+# =========================
+# SETTINGS
+# =========================
+SCAN_CONCURRENCY = int(os.getenv("SCAN_CONCURRENCY", "4"))
+SCAN_PER_DOMAIN = int(os.getenv("SCAN_PER_DOMAIN", "2"))
+SCHEDULER_RECONCILE_SECONDS = float(os.getenv("SCHEDULER_RECONCILE_SECONDS", "60"))
+RENDER_BUDGET_PER_HOUR = float(os.getenv("RENDER_BUDGET_PER_HOUR", "0"))     # 0 = unlimited
+SCAN_COALESCE_WINDOW = float(os.getenv("SCAN_COALESCE_WINDOW", "60"))        # 0 = no grouping
+IDLE_WAIT_CAP = 5.0     # upper bound on any single wait (defensive)
+CLAIM_RETRY_SECONDS = 2.0   # claim query failed (DB locked / down) → retry soon,
+CLAIM_RETRY_MAX = 30.0      # doubling per failure in a row, up to this
+
+
+def domain_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+def url_key(url: str) -> str:
+    """
+    Same page, different spelling → same key
+    (scheme / host case, default port, trailing slash, fragment)
+    """
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url.lower()
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if port and (scheme, port) not in (("http", 80), ("https", 443)):
+        host += f":{port}"
+    return urlunsplit((scheme, host, parts.path.rstrip("/") or "/", parts.query, ""))
+
+
+class ScanScheduler:
+
+    def __init__(
+        self,
+        run_scan,
+        load_sites,
+        is_enabled=lambda: True,
+        max_workers: int = SCAN_CONCURRENCY,
+        per_domain: int = SCAN_PER_DOMAIN,
+        render_budget: float = RENDER_BUDGET_PER_HOUR,
+        claim=None,
+        renew=None,
+        renew_every: float = 30.0,
+        coalesce_window: float = SCAN_COALESCE_WINDOW,
+    ):
+        """
+        run_scan(site_id)   → scans one site (called on a worker thread)
+        load_sites()        → [(site_id, url, interval, last_checked, adaptive, max_interval), ...]
+                              for enabled sites
+        is_enabled()        → global monitoring switch
+        claim(site_ids, slack=0)
+                            → ids this worker may scan (others are leased elsewhere);
+                              slack: seconds a grouped site may be claimed early
+        renew(site_ids)     → heartbeat for the sites being scanned
+        """
+        self.run_scan = run_scan
+        self.load_sites = load_sites
+        self.is_enabled = is_enabled
+        self.max_workers = max(1, max_workers)
+        self.per_domain = max(1, per_domain)
+        self.render_budget = render_budget
+        self.claim = claim
+        self.renew = renew
+        self.renew_every = renew_every
+        self.coalesce_window = coalesce_window
+
+        self._heap = []                 # (due, seq, site_id)
+        self._entries = {}              # site_id → {"due", "interval", "domain", "group", "last_run", "adaptive", "max_interval", "hold_until"}
+        self._groups = {}               # url_key → {site_id, ...}
+        self._running = set()
+        self._busy = 0                  # worker slots in use (one per group)
+        self._domain_busy = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        self._executor = None
+        self._thread = None
+        self._stop = False
+        self._last_reconcile = 0.0
+        self._budget_scale = 1.0
+        self._budget_dirty = True
+        self._last_renew = 0.0
+
+        # stats
+        self.dispatched = 0
+        self.completed = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.avg_lag = 0.0
+        self.reconciles = 0
+        self.notifications = 0
+        self.claimed = 0
+        self.claim_conflicts = 0
+        self.claim_errors = 0
+        self._claim_failures = 0        # failed claim batches in a row (backoff)
+        self.coalesced = 0
+
+    # =========================
+    # HEAP MAINTENANCE
+    # =========================
+    def _push(self, site_id, due):
+        heapq.heappush(self._heap, (due, next(self._seq), site_id))
+
+    def _set_group(self, site_id, entry, url):
+        group = url_key(url)
+        if entry.get("group") == group:
+            return
+        self._drop_group(site_id, entry)
+        entry["group"] = group
+        self._groups.setdefault(group, set()).add(site_id)
+
+    def _drop_group(self, site_id, entry):
+        members = self._groups.get(entry.get("group"))
+        if members is not None:
+            members.discard(site_id)
+            if not members:
+                del self._groups[entry["group"]]
+
+    def _due_after(self, entry):
+        # never checked → due right now (not at the epoch)
+        if not entry["last_run"]:
+            return max(time.time(), entry.get("hold_until", 0))
+        return max(entry["last_run"] + self._scheduled(entry), entry.get("hold_until", 0))
+
+    def upsert(self, site_id: int, url: str, interval: int, last_checked: int,
+               adaptive: bool = False, max_interval: int | None = None):
+        """
+        Called by the API on add / enable / edit, and by the reconcile
+        """
+        with self._cond:
+            interval = max(1, int(interval or 0))
+            entry = self._entries.get(site_id)
+
+            if entry is None:
+                entry = {
+                    "interval": interval,
+                    "domain": domain_of(url),
+                    "last_run": last_checked or 0,
+                    "adaptive": bool(adaptive),
+                    "max_interval": max_interval,
+                }
+                self._entries[site_id] = entry
+                self._set_group(site_id, entry, url)
+                self._budget_dirty = True
+                entry["due"] = self._due_after(entry)
+                if site_id not in self._running:
+                    self._push(site_id, entry["due"])
+                self._cond.notify()
+                return
+
+            entry["domain"] = domain_of(url)
+            self._set_group(site_id, entry, url)
+            entry["max_interval"] = max_interval
+            if entry["interval"] != interval or entry["adaptive"] != bool(adaptive):
+                entry["interval"] = interval
+                entry["adaptive"] = bool(adaptive)
+                self._budget_dirty = True
+                entry["due"] = self._due_after(entry)
+                if site_id not in self._running:
+                    self._push(site_id, entry["due"])
+                self._cond.notify()
+
+    def retune(self, site_id: int, interval: int):
+        """
+        New learned interval for a site that is already scheduled
+        (never re-adds a site removed meanwhile)
+        """
+        with self._cond:
+            entry = self._entries.get(site_id)
+            interval = max(1, int(interval or 0))
+            if entry is None or entry["interval"] == interval:
+                return
+            entry["interval"] = interval
+            self._budget_dirty = True
+            if site_id not in self._running:
+                entry["due"] = self._due_after(entry)
+                self._push(site_id, entry["due"])
+                self._cond.notify()
+
+    def defer(self, site_id: int, until: float):
+        """
+        Holds a site back until the given time (open circuit breaker);
+        0 lifts the hold. Applied when the site is re-armed.
+        """
+        with self._cond:
+            entry = self._entries.get(site_id)
+            if entry is None:
+                return
+            entry["hold_until"] = until or 0
+            if site_id not in self._running:
+                entry["due"] = self._due_after(entry)
+                self._push(site_id, entry["due"])
+                self._cond.notify()
+
+    def touch(self, site_id: int, last_run: float):
+        """
+        A scan ran outside the scheduler (manual check) → next one an
+        interval after it
+        """
+        with self._cond:
+            entry = self._entries.get(site_id)
+            if entry is None or site_id in self._running:
+                return
+            entry["last_run"] = last_run
+            entry["due"] = self._due_after(entry)
+            self._push(site_id, entry["due"])
+            self._cond.notify()
+
+    def is_running(self, site_id: int) -> bool:
+        with self._cond:
+            return site_id in self._running
+
+    def remove(self, site_id: int):
+        """
+        Called by the API on disable / delete
+        """
+        with self._cond:
+            # stale heap items are skipped lazily
+            entry = self._entries.pop(site_id, None)
+            if entry is not None:
+                self._drop_group(site_id, entry)
+                self._budget_dirty = True
+
+    def notify(self, site_id: int, url: str = "", interval: int = 0,
+               last_checked: int = 0, enabled: bool = True,
+               adaptive: bool = False, max_interval: int | None = None):
+        self.notifications += 1
+        if enabled:
+            self.upsert(site_id, url, interval, last_checked, adaptive, max_interval)
+        else:
+            self.remove(site_id)
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def sync(self, rows):
+        seen = set()
+        for site_id, url, interval, last_checked, adaptive, max_interval in rows:
+            seen.add(site_id)
+            self.upsert(site_id, url, interval, last_checked, adaptive, max_interval)
+
+        with self._cond:
+            for site_id in list(self._entries):
+                if site_id not in seen:
+                    self._drop_group(site_id, self._entries.pop(site_id))
+            self._budget_dirty = True
+
+    # =========================
+    # RENDER BUDGET
+    # =========================
+    def _scale(self) -> float:
+        """
+        Factor applied to adaptive intervals so the schedule fits the
+        render budget (fixed-interval sites are never stretched)
+        """
+        if not self._budget_dirty:
+            return self._budget_scale
+        self._budget_dirty = False
+
+        if self.render_budget <= 0:
+            self._budget_scale = 1.0
+            return 1.0
+
+        fixed = adaptive = 0.0
+        for entry in self._entries.values():
+            if entry["adaptive"]:
+                adaptive += 3600.0 / entry["interval"]
+            else:
+                fixed += 3600.0 / entry["interval"]
+
+        available = self.render_budget - fixed
+        if adaptive <= available:
+            self._budget_scale = 1.0
+        else:
+            # fixed sites alone exceed the budget → adaptive sites go to their max
+            self._budget_scale = adaptive / max(available, 1e-6)
+        return self._budget_scale
+
+    def _scheduled(self, entry) -> float:
+        interval = entry["interval"]
+        if not entry["adaptive"]:
+            return interval
+        scale = self._scale()
+        if scale <= 1.0:
+            return interval
+        return max(interval, min(interval * scale, entry["max_interval"] or interval))
+
+    def scheduled_interval(self, site_id: int) -> int | None:
+        with self._cond:
+            entry = self._entries.get(site_id)
+            return int(self._scheduled(entry)) if entry else None
+
+    # =========================
+    # LIFECYCLE
+    # =========================
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop = False
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="scan"
+        )
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    # =========================
+    # DISPATCH LOOP
+    # =========================
+    def _reconcile(self):
+        try:
+            self.sync(self.load_sites())
+            self.reconciles += 1
+        except Exception as e:
+            print("❌ Scheduler reconcile failed:", repr(e))
+        self._last_reconcile = time.time()
+
+    def _heartbeat(self):
+        with self._cond:
+            running = list(self._running)
+        try:
+            self.renew(running)
+        except Exception as e:
+            print("❌ Lease renewal failed:", repr(e))
+        self._last_renew = time.time()
+
+    def _loop(self):
+        while not self._stop:
+            if time.time() - self._last_reconcile >= SCHEDULER_RECONCILE_SECONDS:
+                self._reconcile()
+            if self.renew and time.time() - self._last_renew >= self.renew_every:
+                self._heartbeat()
+
+            until_reconcile = self._last_reconcile + SCHEDULER_RECONCILE_SECONDS - time.time()
+
+            batch = []
+            with self._cond:
+                if self.is_enabled():
+                    batch, wait = self._pick_due()
+                else:
+                    wait = IDLE_WAIT_CAP      # paused; wake() on resume
+
+            if batch:
+                self._dispatch(batch)
+                continue
+
+            with self._cond:
+                if not self._stop:
+                    # 💤 sleeps until the next due site, a notification or a completion
+                    self._cond.wait(max(0.0, min(wait, until_reconcile, IDLE_WAIT_CAP)))
+
+    def _dispatch(self, batch):
+        """
+        Claims the picked sites (one DB round trip) and submits the ones
+        this worker holds; the rest wait for their next turn
+        """
+        claimed = {site_id for site_id, _, _ in batch}
+        siblings = {s for _, _, group in batch for s in group}
+        retry_in = None
+        if self.claim is not None:
+            try:
+                claimed = self.claim(list(claimed))
+                if siblings:
+                    claimed |= self.claim(list(siblings), slack=self.coalesce_window)
+                self._claim_failures = 0
+            except Exception as e:
+                # nobody else holds these sites: retry them shortly instead of
+                # pushing the whole batch back a full interval as conflicts
+                print("❌ Scan claim failed:", repr(e))
+                claimed = set()
+                self._claim_failures += 1
+                retry_in = min(CLAIM_RETRY_MAX, CLAIM_RETRY_SECONDS * 2 ** (self._claim_failures - 1))
+        else:
+            claimed |= siblings
+
+        with self._cond:
+            now = time.time()
+            if retry_in is not None:
+                self.claim_errors += 1
+            for site_id, domain, group in batch:
+                run = [s for s in [site_id] + group if s in claimed]
+
+                # 🔒 leased by another worker (or just scanned by one);
+                # a sibling's own heap item is still in place
+                for sid in [site_id] + group:
+                    if sid in run and self._executor is not None:
+                        continue
+                    self._running.discard(sid)
+                    entry = self._entries.get(sid)
+                    if sid == site_id:
+                        if retry_in is None:
+                            self.claim_conflicts += 1
+                        if entry is not None:
+                            entry["due"] = now + (retry_in if retry_in is not None else self._scheduled(entry))
+                            self._push(sid, entry["due"])
+
+                if run and self._executor is not None:
+                    self.claimed += len(run)
+                    self.dispatched += len(run)
+                    self._executor.submit(self._run, run, domain)
+                else:
+                    self._release_slot(domain)
+
+    def _release_slot(self, domain):
+        self._busy -= 1
+        self._domain_busy[domain] = self._domain_busy.get(domain, 1) - 1
+        if self._domain_busy[domain] <= 0:
+            self._domain_busy.pop(domain, None)
+
+    def _siblings(self, site_id, entry, now):
+        """
+        Other sites of the same URL that are due within the coalesce window
+        """
+        if self.coalesce_window <= 0:
+            return []
+        group = []
+        for sid in self._groups.get(entry.get("group"), ()):
+            other = self._entries.get(sid)
+            if sid == site_id or sid in self._running or other is None:
+                continue
+            if other["due"] <= now + self.coalesce_window:
+                group.append(sid)
+        return sorted(group, key=lambda sid: self._entries[sid]["due"])
+
+    def _pick_due(self):
+        """
+        Reserves every due site that fits the limits, with its same-URL
+        siblings (they share the site's worker and domain slot).
+        Returns ([(site_id, domain, [sibling ids]), ...], seconds until
+        something could be dispatched next).
+        """
+        now = time.time()
+        blocked = []
+        batch = []
+
+        while self._heap and self._busy < self.max_workers:
+            due, _, site_id = self._heap[0]
+            if due > now:
+                break
+            heapq.heappop(self._heap)
+
+            entry = self._entries.get(site_id)
+            if entry is None or entry["due"] != due or site_id in self._running:
+                continue    # stale heap item
+
+            domain = entry["domain"]
+            if self._domain_busy.get(domain, 0) >= self.per_domain:
+                blocked.append((due, site_id))
+                continue
+
+            self._running.add(site_id)
+            self._busy += 1
+            self._domain_busy[domain] = self._domain_busy.get(domain, 0) + 1
+            self._record_lag(now - due)
+
+            # 🔗 same URL due soon → scanned right after, from the same render
+            group = self._siblings(site_id, entry, now)
+            self._running.update(group)
+            self.coalesced += len(group)
+            batch.append((site_id, domain, group))
+
+        # ⏳ domain-limited sites keep their place in the queue
+        for due, site_id in blocked:
+            self._push(site_id, due)
+
+        if blocked or self._busy >= self.max_workers:
+            return batch, IDLE_WAIT_CAP    # woken early by a completion
+        if self._heap:
+            return batch, max(0.0, self._heap[0][0] - now)
+        return batch, IDLE_WAIT_CAP
+
+    def _run(self, site_ids: list, domain: str):
+        try:
+            for site_id in site_ids:
+                self._run_one(site_id)
+        finally:
+            with self._cond:
+                self._release_slot(domain)
+                self._cond.notify()
+
+    def _run_one(self, site_id: int):
+        ok = True
+        try:
+            self.run_scan(site_id)
+        except Exception as e:
+            ok = False
+            print("❌ Scheduled scan failed:", repr(e))
+        finally:
+            finished = time.time()
+            with self._cond:
+                self._running.discard(site_id)
+
+                self.completed += 1
+                if not ok:
+                    self.failed += 1
+
+                # 🔁 re-arm after completion
+                entry = self._entries.get(site_id)
+                if entry is not None:
+                    entry["last_run"] = finished
+                    entry["due"] = self._due_after(entry)
+                    self._push(site_id, entry["due"])
+
+    # =========================
+    # STATS
+    # =========================
+    def _record_lag(self, lag: float):
+        lag = max(0.0, lag)
+        SCHEDULER_LAG_SECONDS.observe(lag)
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self.avg_lag = lag if self.dispatched == 0 else 0.9 * self.avg_lag + 0.1 * lag
+
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.time()
+            waiting = [
+                e for sid, e in self._entries.items()
+                if sid not in self._running
+            ]
+            overdue = [now - e["due"] for e in waiting if e["due"] <= now]
+
+            return {
+                "sites": len(self._entries),
+                "queue_depth": len(waiting),
+                "due_now": len(overdue),
+                "in_flight": len(self._running),
+                "max_workers": self.max_workers,
+                "per_domain_limit": self.per_domain,
+                "busy_domains": dict(self._domain_busy),
+                "dispatched": self.dispatched,
+                "completed": self.completed,
+                "failed": self.failed,
+                "lag_current": round(max(overdue, default=0.0), 3),
+                "lag_last": round(self.last_lag, 3),
+                "lag_avg": round(self.avg_lag, 3),
+                "lag_max": round(self.max_lag, 3),
+                "notifications": self.notifications,
+                "reconciles": self.reconciles,
+                "claimed": self.claimed,
+                "claim_conflicts": self.claim_conflicts,
+                "claim_errors": self.claim_errors,
+                "coalesce_window": self.coalesce_window,
+                "coalesced": self.coalesced,
+                "url_groups": sum(1 for members in self._groups.values() if len(members) > 1),
+                "reconcile_every": SCHEDULER_RECONCILE_SECONDS,
+                "render_budget_per_hour": self.render_budget,
+                "renders_per_hour": round(sum(
+                    3600.0 / self._scheduled(e) for e in self._entries.values()
+                ), 1),
+                "budget_scale": round(self._scale(), 3),
+            }
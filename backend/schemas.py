@@ -1,6 +1,53 @@
 from pydantic import BaseModel
 from typing import Optional
 
+# =========================
+# KEYWORD SCHEMAS
+# =========================
+
+class KeywordSpec(BaseModel):
+    keyword: str
+    is_regex: bool = False
+    whole_word: bool = False
+
+
+class KeywordResponse(KeywordSpec):
+    id: int
+    found: bool
+    alert_sent: bool
+
+    class Config:
+        from_attributes = True
+
+
+class RegionUpdate(BaseModel):
+    include_selectors: Optional[list[str]] = None
+    exclude_selectors: Optional[list[str]] = None
+
+
+class NoiseRules(BaseModel):
+    noise_masks: Optional[list[str]] = None
+    ignore_patterns: Optional[list[str]] = None
+
+
+class NoisePreview(NoiseRules):
+    use_site_rules: bool = False        # preview the site's saved rules
+    limit: int = 5
+
+
+class BulkFilter(BaseModel):
+    ids: Optional[list[int]] = None
+    url_contains: Optional[str] = None
+    name_contains: Optional[str] = None
+    status: Optional[str] = None            # last_status, e.g. "error"
+    enabled: Optional[bool] = None
+    all: bool = False                       # required to match every site
+
+
+class BulkAction(BulkFilter):
+    action: str                             # enable / disable / delete
+
+
 # =========================
 # WEBSITE SCHEMAS
 # =========================
@@ -9,12 +56,29 @@ class WebsiteCreate(BaseModel):
     name: str
     url: str
     interval: int = 300
-    keyword: str
+    keyword: str = ""                   # single keyword (legacy) – merged into keywords
+    keywords: list[KeywordSpec] = []
+    enabled: bool = True                # False → kept but never scheduled
+    preflight: bool = True
+    fast_scan: bool = True
+    wait_selector: Optional[str] = None
+
+    # watched region: hash / keywords / pdf links only look inside it
+    include_selectors: Optional[list[str]] = None
+    exclude_selectors: Optional[list[str]] = None
+
+    # noise rules applied before hashing (None → default masks)
+    noise_masks: Optional[list[str]] = None
+    ignore_patterns: Optional[list[str]] = None
+
+    # adaptive interval: learned between min_interval and max_interval
+    adaptive: bool = False
+    min_interval: int = 60
+    max_interval: int = 86400
 
 
 class WebsiteResponse(WebsiteCreate):
     id: int
-    enabled: bool
     last_status: str
     last_response_time: float
     last_checked: int
@@ -23,6 +87,17 @@ class WebsiteResponse(WebsiteCreate):
 
     keyword_found: bool
     alert_sent: bool
+    keywords: list[KeywordResponse] = []
+
+    effective_interval: Optional[int] = None
+    change_rate: Optional[float] = None
+    scheduled_interval: Optional[int] = None    # incl. render budget
+
+    breaker_state: Optional[str] = "closed"     # closed / open / half_open
+    consecutive_failures: Optional[int] = 0
+    breaker_open_until: Optional[int] = 0
+    down_since: Optional[int] = None
+    last_error: Optional[str] = None
 
     class Config:
         from_attributes = True
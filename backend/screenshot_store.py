@@ -0,0 +1,404 @@
+"""
+Screenshot store
+- content-addressed files: screenshots/<aa>/<sha256>.<ext>
+- exact duplicates are stored once; only the exact frame of the site's
+  last alert counts as "already sent" (a perceptual hash can't tell a
+  text page with one new notice row from the old one)
+- dHash (needs Pillow) is kept on the row for lookups
+- WebP / optimized PNG encoding when Pillow is installed
+- retention: per-site count, age, total-size LRU
+- DB index (Screenshot) so the API never scans the directory; new rows
+  are written by the write-behind flush (state_writer hook), the file
+  itself is on disk before save() returns
+"""
+
+import io
+import os
+import time
+import hashlib
+import threading
+
+from dotenv import load_dotenv
+from sqlalchemy import func
+
+from database import SessionLocal
+from models import Screenshot
+from state_writer import state_writer
+
+try:
+    from PIL import Image
+except ImportError:      # optional: raw PNG + exact dedup only
+    Image = None
+
+load_dotenv()
+
+SCREENSHOT_DIR = "screenshots"
+SCREENSHOT_FORMAT = os.getenv("SCREENSHOT_FORMAT", "webp").lower()      # webp | png
+SCREENSHOT_QUALITY = int(os.getenv("SCREENSHOT_QUALITY", "80"))
+
+SCREENSHOT_KEEP_PER_SITE = int(os.getenv("SCREENSHOT_KEEP_PER_SITE", "10"))
+SCREENSHOT_MAX_AGE_DAYS = int(os.getenv("SCREENSHOT_MAX_AGE_DAYS", "30"))
+SCREENSHOT_MAX_TOTAL_MB = int(os.getenv("SCREENSHOT_MAX_TOTAL_MB", "500"))
+SCREENSHOT_RETENTION_SECONDS = int(os.getenv("SCREENSHOT_RETENTION_SECONDS", "3600"))
+
+os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+
+_lock = threading.Lock()
+
+
+# =========================
+# ENCODING / HASHING
+# =========================
+def _dhash(image) -> str:
+    """
+    64-bit difference hash → hex string
+    """
+    small = image.convert("L").resize((9, 8))
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:016x}"
+
+
+def _encode(png_bytes: bytes):
+    """
+    Returns (data, extension, phash or None)
+    """
+    if Image is None:
+        return png_bytes, "png", None
+
+    try:
+        image = Image.open(io.BytesIO(png_bytes))
+        phash = _dhash(image)
+    except Exception as e:
+        print("⚠️ Screenshot not decodable, stored as-is:", repr(e))
+        return png_bytes, "png", None
+
+    out = io.BytesIO()
+    if SCREENSHOT_FORMAT == "webp":
+        image.convert("RGB").save(out, "WEBP", quality=SCREENSHOT_QUALITY, method=4)
+        return out.getvalue(), "webp", phash
+
+    image.save(out, "PNG", optimize=True)
+    return out.getvalue(), "png", phash
+
+
+def _path_for(sha256: str, ext: str) -> str:
+    return os.path.join(SCREENSHOT_DIR, sha256[:2], f"{sha256}.{ext}")
+
+
+def _as_dict(shot: Screenshot, duplicate: bool = False) -> dict:
+    return {
+        "id": shot.id,
+        "website_id": shot.website_id,
+        "path": shot.path,
+        "sha256": shot.sha256,
+        "size": shot.size,
+        "duplicate": duplicate,
+    }
+
+
+def _pending_as_dict(row: dict, duplicate: bool = False) -> dict:
+    # no id until the flush wrote the row
+    return {
+        "id": None,
+        "website_id": row["website_id"],
+        "path": row["path"],
+        "sha256": row["sha256"],
+        "size": row["size"],
+        "duplicate": duplicate,
+    }
+
+
+# =========================
+# WRITE-BEHIND (state_writer hook)
+# =========================
+class ScreenshotIndex:
+
+    def __init__(self):
+        self._queue = []            # Screenshot mappings waiting for the flush
+        self._unflushed = []        # same rows until committed (queued or being written)
+        self._lock = threading.Lock()
+
+    def add(self, row: dict):
+        with self._lock:
+            self._queue.append(row)
+            self._unflushed.append(row)
+
+    def latest(self, website_id: int):
+        with self._lock:
+            rows = [r for r in self._unflushed if r["website_id"] == website_id]
+        return rows[-1] if rows else None
+
+    def find(self, sha256: str):
+        with self._lock:
+            return next((r for r in self._unflushed if r["sha256"] == sha256), None)
+
+    def paths(self) -> set:
+        with self._lock:
+            return {r["path"] for r in self._unflushed}
+
+    def discard(self, website_ids):
+        website_ids = set(website_ids)
+        with self._lock:
+            self._queue = [r for r in self._queue if r["website_id"] not in website_ids]
+
+    def touch(self, row: dict, now: int):
+        with self._lock:
+            row["last_used_at"] = now
+
+    # --- hook protocol: take → write(db) → release (restore on failure) ---
+    def take(self):
+        with self._lock:
+            batch, self._queue = self._queue, []
+        return batch
+
+    def restore(self, batch):
+        with self._lock:
+            self._queue = batch + self._queue
+
+    def release(self, batch):
+        with self._lock:
+            done = {id(r) for r in batch}
+            self._unflushed = [r for r in self._unflushed if id(r) not in done]
+
+    def write(self, db, batch):
+        db.bulk_insert_mappings(Screenshot, [dict(r) for r in batch])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": len(self._queue), "unflushed": len(self._unflushed)}
+
+
+index = ScreenshotIndex()
+
+
+# =========================
+# SAVE
+# =========================
+def save(website_id: int, png_bytes: bytes) -> dict:
+    """
+    Stores a screenshot for a site.
+    "duplicate" is True when it is byte-identical to the site's latest
+    screenshot → no need to upload it again.
+    """
+    sha256 = hashlib.sha256(png_bytes).hexdigest()
+    now = int(time.time())
+
+    with _lock:
+        pending = index.latest(website_id)
+        db = SessionLocal()
+        try:
+            latest = None if pending else (
+                db.query(Screenshot)
+                .filter(Screenshot.website_id == website_id)
+                .order_by(Screenshot.created_at.desc(), Screenshot.id.desc())
+                .first()
+            )
+            existing = index.find(sha256) or (
+                db.query(Screenshot)
+                .filter(Screenshot.sha256 == sha256)
+                .first()
+            )
+        finally:
+            db.close()
+
+        # 🔁 same frame as last time
+        if pending and pending["sha256"] == sha256 and os.path.exists(pending["path"]):
+            index.touch(pending, now)
+            return _pending_as_dict(pending, duplicate=True)
+        if latest and latest.sha256 == sha256 and os.path.exists(latest.path):
+            state_writer.update_row(Screenshot, latest.id, last_used_at=now)
+            return _as_dict(latest, duplicate=True)
+
+        if isinstance(existing, dict):
+            existing_path, existing_size, existing_phash = existing["path"], existing["size"], existing["phash"]
+        elif existing:
+            existing_path, existing_size, existing_phash = existing.path, existing.size, existing.phash
+        else:
+            existing_path = None
+
+        if existing_path and os.path.exists(existing_path):
+            path, size, phash = existing_path, existing_size, existing_phash
+        else:
+            data, ext, phash = _encode(png_bytes)
+            path = _path_for(sha256, ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            size = len(data)
+
+        row = {
+            "website_id": website_id,
+            "sha256": sha256,
+            "phash": phash,
+            "path": path,
+            "size": size,
+            "created_at": now,
+            "last_used_at": now,
+        }
+        index.add(row)
+        return _pending_as_dict(row)
+
+
+# =========================
+# RETENTION
+# =========================
+def enforce_retention():
+    removed_rows = 0
+
+    with _lock:
+        db = SessionLocal()
+        try:
+            before = {path for (path,) in db.query(Screenshot.path).distinct()}
+
+            # 1️⃣ per-site count
+            for (site_id,) in db.query(Screenshot.website_id).distinct():
+                old = (
+                    db.query(Screenshot.id)
+                    .filter(Screenshot.website_id == site_id)
+                    .order_by(Screenshot.created_at.desc(), Screenshot.id.desc())
+                    .offset(SCREENSHOT_KEEP_PER_SITE)
+                    .all()
+                )
+                if old:
+                    removed_rows += (
+                        db.query(Screenshot)
+                        .filter(Screenshot.id.in_([row.id for row in old]))
+                        .delete(synchronize_session=False)
+                    )
+
+            # 2️⃣ age
+            if SCREENSHOT_MAX_AGE_DAYS > 0:
+                cutoff = int(time.time()) - SCREENSHOT_MAX_AGE_DAYS * 86400
+                removed_rows += (
+                    db.query(Screenshot)
+                    .filter(Screenshot.created_at < cutoff)
+                    .delete(synchronize_session=False)
+                )
+
+            # 3️⃣ total size (least recently used files first)
+            if SCREENSHOT_MAX_TOTAL_MB > 0:
+                limit = SCREENSHOT_MAX_TOTAL_MB * 1024 * 1024
+                files = (
+                    db.query(
+                        Screenshot.path,
+                        func.max(Screenshot.size),
+                        func.max(Screenshot.last_used_at).label("used"),
+                    )
+                    .group_by(Screenshot.path)
+                    .order_by("used")
+                    .all()
+                )
+                total = sum(size or 0 for _, size, _ in files)
+                for path, size, _ in files:
+                    if total <= limit:
+                        break
+                    removed_rows += (
+                        db.query(Screenshot)
+                        .filter(Screenshot.path == path)
+                        .delete(synchronize_session=False)
+                    )
+                    total -= size or 0
+
+            db.commit()
+
+            # 🗑️ files no row points to any more (from the index, no directory scan)
+            after = {path for (path,) in db.query(Screenshot.path).distinct()}
+        finally:
+            db.close()
+
+        # files of rows the flush has not written yet stay
+        removed_files = 0
+        for path in before - after - index.paths():
+            try:
+                os.remove(path)
+                removed_files += 1
+            except FileNotFoundError:
+                pass
+
+    if removed_rows or removed_files:
+        print(f"🧹 Screenshot retention: {removed_rows} rows, {removed_files} files removed")
+
+
+def delete_screenshots(db, website_ids) -> set:
+    """
+    Deletes the sites' rows in the caller's transaction; returns their
+    file paths → remove_unreferenced() once it is committed
+    """
+    website_ids = list(website_ids)
+    index.discard(website_ids)
+    if not website_ids:
+        return set()
+    paths = {
+        path for (path,) in
+        db.query(Screenshot.path).filter(Screenshot.website_id.in_(website_ids)).distinct()
+    }
+    db.query(Screenshot).filter(Screenshot.website_id.in_(website_ids)).delete(synchronize_session=False)
+    return paths
+
+
+def remove_unreferenced(paths):
+    """
+    Removes the files no row (stored or unflushed) points to any more
+    """
+    if not paths:
+        return 0
+    removed = 0
+    with _lock:
+        db = SessionLocal()
+        try:
+            kept = {
+                path for (path,) in
+                db.query(Screenshot.path).filter(Screenshot.path.in_(list(paths))).distinct()
+            }
+        finally:
+            db.close()
+        for path in set(paths) - kept - index.paths():
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+# =========================
+# QUERIES (API)
+# =========================
+def list_screenshots(website_id: int | None = None, limit: int = 50) -> list[dict]:
+    db = SessionLocal()
+    try:
+        query = db.query(Screenshot)
+        if website_id is not None:
+            query = query.filter(Screenshot.website_id == website_id)
+        shots = (
+            query.order_by(Screenshot.created_at.desc(), Screenshot.id.desc())
+            .limit(limit)
+            .all()
+        )
+        return [
+            {**_as_dict(s), "created_at": s.created_at, "last_used_at": s.last_used_at}
+            for s in shots
+        ]
+    finally:
+        db.close()
+
+
+def get_screenshot_path(screenshot_id: int) -> str | None:
+    db = SessionLocal()
+    try:
+        shot = db.query(Screenshot).filter(Screenshot.id == screenshot_id).first()
+        if not shot or not os.path.exists(shot.path):
+            return None
+        shot.last_used_at = int(time.time())
+        db.commit()
+        return shot.path
+    finally:
+        db.close()
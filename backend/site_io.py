@@ -0,0 +1,322 @@
+"""
+Bulk site import / export
+- JSON (list, or {"sites": [...]}) or CSV, validated in one pass
+- duplicates (same URL + primary keyword) are skipped, against the DB
+  and within the file
+- inserted in batches of IMPORT_BATCH_SIZE sites per transaction
+- first scans are spread across each site's interval (not_before)
+- export streams every site + its state as JSON or CSV, page by page
+"""
+
+import os
+import io
+import csv
+import json
+import time
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy.orm import selectinload
+
+from database import SessionLocal
+from models import Website, WebsiteKeyword
+from schemas import WebsiteCreate, KeywordSpec
+import normalizer
+from keyword_matcher import validate_keywords
+
+load_dotenv()
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "200"))
+IMPORT_MAX_SITES = int(os.getenv("IMPORT_MAX_SITES", "5000"))
+EXPORT_PAGE_SIZE = 500
+
+LIST_FIELDS = ("keywords", "include_selectors", "exclude_selectors", "noise_masks", "ignore_patterns")
+
+EXPORT_FIELDS = (
+    "id", "name", "url", "interval", "enabled", "keyword", "keywords",
+    "preflight", "fast_scan", "wait_selector",
+    "include_selectors", "exclude_selectors", "noise_masks", "ignore_patterns",
+    "adaptive", "min_interval", "max_interval",
+    "last_status", "last_checked", "last_response_time", "first_run",
+    "keyword_found", "alert_sent", "effective_interval", "change_rate",
+)
+
+
+class UploadError(ValueError):
+    """
+    The upload could not be read at all (not JSON / CSV, too many rows)
+    """
+
+
+# =========================
+# PARSING
+# =========================
+def _csv_list(cell: str):
+    cell = cell.strip()
+    if cell.startswith("["):
+        return json.loads(cell)
+    return [part.strip() for part in cell.split("|") if part.strip()]
+
+
+def parse_upload(body: bytes, content_type: str = "") -> list[dict]:
+    """
+    Raw request body → list of row dicts (not validated yet)
+    """
+    text = body.decode("utf-8-sig").strip()
+    if not text:
+        return []
+
+    if "csv" in content_type or not text.startswith(("[", "{")):
+        rows = []
+        for row in csv.DictReader(io.StringIO(text)):
+            clean = {}
+            for key, value in row.items():
+                if key is None or value is None or not value.strip():
+                    continue        # empty cell → schema default
+                key = key.strip()
+                try:
+                    clean[key] = _csv_list(value) if key in LIST_FIELDS else value.strip()
+                except ValueError as e:
+                    clean[key] = value
+                    clean.setdefault("_errors", []).append(f"{key}: {e}")
+            rows.append(clean)
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise UploadError(f"invalid JSON: {e}")
+        rows = data.get("sites") if isinstance(data, dict) else data
+        if not isinstance(rows, list):
+            raise UploadError("expected a list of sites or {\"sites\": [...]}")
+
+    if len(rows) > IMPORT_MAX_SITES:
+        raise UploadError(f"{len(rows)} sites, at most {IMPORT_MAX_SITES} per import")
+    return rows
+
+
+# =========================
+# VALIDATION + DEDUP
+# =========================
+def keyword_rows_for(specs: list[KeywordSpec]) -> list[WebsiteKeyword]:
+    rows, seen = [], set()
+    for spec in specs:
+        keyword = spec.keyword.strip()
+        if not keyword or keyword in seen:
+            continue
+        seen.add(keyword)
+        rows.append(WebsiteKeyword(
+            keyword=keyword,
+            is_regex=spec.is_regex,
+            whole_word=spec.whole_word
+        ))
+    return rows
+
+
+def keyword_specs(site: WebsiteCreate) -> list[KeywordSpec]:
+    """
+    The legacy single keyword becomes the first entry of the set
+    """
+    return ([KeywordSpec(keyword=site.keyword)] if site.keyword.strip() else []) + site.keywords
+
+
+def _dedup_key(url: str, keyword: str) -> tuple:
+    return (url.strip().rstrip("/").lower(), keyword.strip().lower())
+
+
+def validate_rows(rows: list) -> tuple[list, list]:
+    """
+    One pass over all rows → ([(row number, WebsiteCreate)], [errors])
+    """
+    valid, errors = [], []
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            errors.append({"row": number, "errors": ["not an object"]})
+            continue
+
+        row = dict(row)
+        problems = row.pop("_errors", [])
+        if isinstance(row.get("keywords"), list):
+            row["keywords"] = [{"keyword": k} if isinstance(k, str) else k for k in row["keywords"]]
+
+        try:
+            site = WebsiteCreate.model_validate(row)
+        except ValidationError as e:
+            problems += [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()]
+            errors.append({"row": number, "errors": problems})
+            continue
+
+        if not site.url.startswith(("http://", "https://")):
+            problems.append("url: must start with http:// or https://")
+        if site.interval < 1:
+            problems.append("interval: must be at least 1 second")
+        problems += validate_keywords(keyword_specs(site))
+        problems += normalizer.validate_rules(site.noise_masks, site.ignore_patterns)
+
+        if problems:
+            errors.append({"row": number, "errors": problems})
+        else:
+            valid.append((number, site))
+    return valid, errors
+
+
+# =========================
+# IMPORT
+# =========================
+def import_sites(valid: list, stagger: bool = True) -> dict:
+    """
+    Inserts the validated sites in batched transactions.
+    Returns the created sites as (id, url, interval, not_before, adaptive, max_interval)
+    plus the skipped duplicates.
+    """
+    db = SessionLocal()
+    try:
+        existing = {
+            _dedup_key(url, keyword or "")
+            for url, keyword in db.query(Website.url, Website.keyword)
+        }
+    finally:
+        db.close()
+
+    fresh, duplicates = [], []
+    for number, site in valid:
+        keywords = keyword_rows_for(keyword_specs(site))
+        key = _dedup_key(site.url, keywords[0].keyword if keywords else "")
+        if key in existing:
+            duplicates.append({"row": number, "url": site.url, "keyword": key[1]})
+            continue
+        existing.add(key)
+        fresh.append((site, keywords))
+
+    now = int(time.time())
+    total = len(fresh)
+    created, batches = [], 0
+
+    for start in range(0, total, IMPORT_BATCH_SIZE):
+        batch = []
+        for index, (site, keywords) in enumerate(fresh[start:start + IMPORT_BATCH_SIZE], start=start):
+            # ⏳ i-th of n sites first scans at i/n of its interval
+            offset = int(site.interval * index / total) if stagger else 0
+            batch.append(Website(
+                name=site.name,
+                url=site.url,
+                interval=site.interval,
+                keyword=keywords[0].keyword if keywords else "",
+                keywords=keywords,
+                enabled=site.enabled,
+                preflight=site.preflight,
+                fast_scan=site.fast_scan,
+                wait_selector=site.wait_selector,
+                include_selectors=site.include_selectors,
+                exclude_selectors=site.exclude_selectors,
+                noise_masks=site.noise_masks,
+                ignore_patterns=site.ignore_patterns,
+                adaptive=site.adaptive,
+                min_interval=site.min_interval,
+                max_interval=site.max_interval,
+                not_before=now + offset,
+                keyword_found=False,
+                alert_sent=False
+            ))
+
+        db = SessionLocal()
+        try:
+            db.add_all(batch)
+            db.commit()
+            created.extend(
+                (s.id, s.url, s.interval, s.not_before, bool(s.adaptive), s.max_interval, bool(s.enabled))
+                for s in batch
+            )
+            batches += 1
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    return {"created": created, "duplicates": duplicates, "batches": batches}
+
+
+# =========================
+# BULK ACTIONS
+# =========================
+def filter_sites(query, rules):
+    """
+    rules: BulkFilter (ids / url_contains / name_contains / status / enabled)
+    """
+    if rules.ids is not None:
+        query = query.filter(Website.id.in_(rules.ids))
+    if rules.url_contains:
+        query = query.filter(Website.url.contains(rules.url_contains))
+    if rules.name_contains:
+        query = query.filter(Website.name.contains(rules.name_contains))
+    if rules.status:
+        query = query.filter(Website.last_status == rules.status)
+    if rules.enabled is not None:
+        query = query.filter(Website.enabled == rules.enabled)
+    return query
+
+
+# =========================
+# EXPORT
+# =========================
+def _export_row(site) -> dict:
+    row = {field: getattr(site, field) for field in EXPORT_FIELDS if field != "keywords"}
+    row["keywords"] = [
+        {
+            "keyword": k.keyword,
+            "is_regex": bool(k.is_regex),
+            "whole_word": bool(k.whole_word),
+            "found": bool(k.found),
+            "alert_sent": bool(k.alert_sent),
+        }
+        for k in site.keywords
+    ]
+    return row
+
+
+def _pages():
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            sites = (
+                db.query(Website)
+                .options(selectinload(Website.keywords))
+                .filter(Website.id > last_id)
+                .order_by(Website.id)
+                .limit(EXPORT_PAGE_SIZE)
+                .all()
+            )
+            rows = [_export_row(s) for s in sites]
+        finally:
+            db.close()      # no session held while the client reads
+
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]["id"]
+
+
+def export_json():
+    yield "["
+    first = True
+    for rows in _pages():
+        for row in rows:
+            yield ("" if first else ",") + "\n" + json.dumps(row, ensure_ascii=False)
+            first = False
+    yield "\n]\n"
+
+
+def export_csv():
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for rows in _pages():
+        for row in rows:
+            writer.writerow({
+                k: json.dumps(v, ensure_ascii=False) if k in LIST_FIELDS and v is not None else v
+                for k, v in row.items()
+            })
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
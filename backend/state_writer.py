@@ -0,0 +1,208 @@
+"""
+Write-behind scan state
+- the scan pipeline records per-site (and per-keyword) state changes here
+  instead of committing
+- updates to the same site are coalesced (last value wins)
+- one background flush writes everything in a single batched transaction
+- hooks (scan history, page snapshots, screenshot index) add their own
+  rows to that transaction
+- a batch that keeps failing (e.g. a constraint error) is logged and dropped
+  after STATE_FLUSH_MAX_ATTEMPTS tries instead of being retried forever
+"""
+
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from database import SessionLocal
+from models import Website, WebsiteLog
+from metrics import DB_FLUSH_SECONDS
+
+load_dotenv()
+
+STATE_FLUSH_SECONDS = float(os.getenv("STATE_FLUSH_SECONDS", "1.0"))
+STATE_FLUSH_MAX_ATTEMPTS = int(os.getenv("STATE_FLUSH_MAX_ATTEMPTS", "5"))
+
+
+class StateWriter:
+
+    def __init__(self, interval: float = STATE_FLUSH_SECONDS):
+        self.interval = interval
+        self._pending = {}          # (model, row id) → {column: value}
+        self._logs = []             # WebsiteLog mappings
+        self._hooks = []            # objects with take() / write(db, batch) / restore(batch),
+                                    # optionally release(batch) once the batch left the writer
+        self._attempts = 0          # failed flushes in a row
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stop = False
+
+        # stats
+        self.flushes = 0
+        self.rows_written = 0
+        self.updates_coalesced = 0
+        self.logs_written = 0
+        self.failures = 0
+        self.batches_dropped = 0
+
+    # =========================
+    # RECORDING
+    # =========================
+    def update(self, site_id: int, **fields):
+        self.update_row(Website, site_id, **fields)
+
+    def update_row(self, model, row_id: int, **fields):
+        with self._lock:
+            current = self._pending.setdefault((model, row_id), {})
+            self.updates_coalesced += sum(1 for k in fields if k in current)
+            current.update(fields)
+
+    def log(self, site_id, event_type, message, old_hash=None, new_hash=None):
+        with self._lock:
+            self._logs.append({
+                "website_id": site_id,
+                "event_type": event_type,
+                "message": message,
+                "old_hash": old_hash,
+                "new_hash": new_hash,
+                "timestamp": int(time.time()),
+            })
+
+    def add_hook(self, hook):
+        if hook not in self._hooks:
+            self._hooks.append(hook)
+
+    def pending_for(self, site_id: int, model=Website) -> dict:
+        """
+        Unflushed values for a row (overlay them on a freshly loaded row)
+        """
+        with self._lock:
+            return dict(self._pending.get((model, site_id), {}))
+
+    def discard(self, site_id: int, model=Website):
+        with self._lock:
+            self._pending.pop((model, site_id), None)
+            if model is Website:
+                self._logs = [l for l in self._logs if l["website_id"] != site_id]
+
+    # =========================
+    # FLUSH
+    # =========================
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            logs, self._logs = self._logs, []
+        batches = [(hook, hook.take()) for hook in self._hooks]
+        batches = [(hook, batch) for hook, batch in batches if batch]
+
+        if not pending and not logs and not batches:
+            return
+
+        db = SessionLocal()
+        started = time.perf_counter()
+        try:
+            by_model = {}
+            for (model, row_id), fields in pending.items():
+                by_model.setdefault(model, []).append({"id": row_id, **fields})
+            for model, rows in by_model.items():
+                # rows deleted since the update was recorded are dropped
+                existing = {
+                    row_id for (row_id,) in
+                    db.query(model.id).filter(model.id.in_([r["id"] for r in rows]))
+                }
+                rows = [r for r in rows if r["id"] in existing]
+                if rows:
+                    db.bulk_update_mappings(model, rows)
+            if logs:
+                db.bulk_insert_mappings(WebsiteLog, logs)
+            for hook, batch in batches:
+                hook.write(db, batch)
+            db.commit()
+            DB_FLUSH_SECONDS.observe(time.perf_counter() - started)
+
+            self.flushes += 1
+            self.rows_written += len(pending)
+            self.logs_written += len(logs)
+            self._attempts = 0
+            self._release(batches)
+
+        except Exception as e:
+            db.rollback()
+            self.failures += 1
+            self._attempts += 1
+
+            if self._attempts >= STATE_FLUSH_MAX_ATTEMPTS:
+                # ☠️ not a transient lock → keep the writer moving
+                self._attempts = 0
+                self.batches_dropped += 1
+                print(f"❌ State flush failed {STATE_FLUSH_MAX_ATTEMPTS} times, batch dropped:", repr(e))
+                print(f"   rows: {sorted((m.__name__, i) for m, i in pending)[:50]}")
+                print(f"   logs: {[(l['website_id'], l['event_type']) for l in logs][:50]}")
+                for hook, batch in batches:
+                    print(f"   {type(hook).__name__}: {len(batch)} items")
+                self._release(batches)
+                return
+
+            print(f"❌ State flush failed (attempt {self._attempts}, will retry):", repr(e))
+
+            # put back, newer values recorded meanwhile win
+            with self._lock:
+                for key, fields in pending.items():
+                    self._pending[key] = {**fields, **self._pending.get(key, {})}
+                self._logs = logs + self._logs
+            for hook, batch in batches:
+                hook.restore(batch)
+        finally:
+            db.close()
+
+    def _release(self, batches):
+        for hook, batch in batches:
+            release = getattr(hook, "release", None)
+            if release is not None:
+                release(batch)
+
+    # =========================
+    # LIFECYCLE
+    # =========================
+    def _loop(self):
+        while not self._stop:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, name="state-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending_sites = sum(1 for model, _ in self._pending if model is Website)
+            pending_logs = len(self._logs)
+        return {
+            "flush_interval": self.interval,
+            "pending_sites": pending_sites,
+            "pending_logs": pending_logs,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "updates_coalesced": self.updates_coalesced,
+            "logs_written": self.logs_written,
+            "failures": self.failures,
+            "batches_dropped": self.batches_dropped,
+        }
+
+
+state_writer = StateWriter()
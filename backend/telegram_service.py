@@ -1,7 +1,25 @@
+"""
+Telegram delivery
+- send_* functions only enqueue (scans never wait on Telegram)
+- queue is spooled to OUTBOX_DIR/<worker id> so alerts survive a restart;
+  spools of dead workers are adopted by atomic rename (sent exactly once
+  even with several workers / hosts on a shared outbox)
+- one background worker with a persistent HTTP session
+- per-chat + global rate limits, backoff retries, honors 429 retry_after
+"""
+
 import os
+import json
+import time
+import threading
+import itertools
+
 import requests
 from dotenv import load_dotenv
 
+from metrics import TELEGRAM_SEND_SECONDS, TELEGRAM_MESSAGES_TOTAL
+from lease import WORKER_ID
+
 load_dotenv()
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -10,95 +28,423 @@ CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 if not BOT_TOKEN or not CHAT_ID:
     raise RuntimeError("❌ Telegram env missing")
 
-BASE_URL = f"https://api.telegram.org/bot{BOT_TOKEN}"
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+BASE_URL = f"{TELEGRAM_API_URL}/bot{BOT_TOKEN}"
+
+# =========================
+# QUEUE SETTINGS
+# =========================
+OUTBOX_DIR = "outbox"
+FAILED_DIR = os.path.join(OUTBOX_DIR, "failed")
+OWN_DIR = os.path.join(OUTBOX_DIR, WORKER_ID)
+ALIVE_FILE = ".alive"
+OUTBOX_ORPHAN_SECONDS = int(os.getenv("OUTBOX_ORPHAN_SECONDS", "300"))    # no heartbeat → adopt
+
+TELEGRAM_CHAT_INTERVAL = float(os.getenv("TELEGRAM_CHAT_INTERVAL", "1.0"))    # ≤ 1 msg/s per chat
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))        # msgs/s for the bot
+TELEGRAM_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_MAX_ATTEMPTS", "8"))
+TELEGRAM_BACKOFF_BASE = 2.0
+TELEGRAM_BACKOFF_MAX = 300.0
+
+TIMEOUTS = {
+    "sendMessage": 60,
+    "sendPhoto": 60,
+    "sendDocument": 300,
+}
+
+os.makedirs(FAILED_DIR, exist_ok=True)
 
 
 # =========================
-# SEND TEXT MESSAGE
+# DISK SPOOL
 # =========================
-def send_telegram(message: str):
+_seq = itertools.count()
+
+
+def _spool_path(msg_id: str, folder: str = OWN_DIR) -> str:
+    return os.path.join(folder, f"{msg_id}.json")
+
+
+def _write_spool(msg: dict):
+    path = _spool_path(msg["id"])
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(msg, f)
+    os.replace(tmp, path)    # atomic
+
+
+def _remove_spool(msg: dict):
     try:
-        response = requests.post(
-            f"{BASE_URL}/sendMessage",
-            data={
-                "chat_id": CHAT_ID,
-                "text": message,
-                "parse_mode": "Markdown"
-            },
-            timeout=60
-        )
-
-        if response.status_code != 200:
-            print("❌ Telegram text error:", response.text)
-        else:
-            print("📨 Telegram text sent")
+        os.remove(_spool_path(msg["id"]))
+    except FileNotFoundError:
+        pass
+
+
+def _fail_spool(msg: dict, reason: str):
+    msg["error"] = reason
+    with open(_spool_path(msg["id"], FAILED_DIR), "w", encoding="utf-8") as f:
+        json.dump(msg, f)
+    _remove_spool(msg)
+    print(f"❌ Telegram {msg['method']} dropped:", reason)
+
+
+def heartbeat():
+    """
+    Marks this worker's spool as alive (others leave it alone)
+    """
+    os.makedirs(OWN_DIR, exist_ok=True)
+    path = os.path.join(OWN_DIR, ALIVE_FILE)
+    with open(path, "a"):
+        os.utime(path, None)
+
+
+def _retire():
+    """
+    Clean stop: the spool can be adopted right away
+    """
+    try:
+        os.remove(os.path.join(OWN_DIR, ALIVE_FILE))
+    except OSError:
+        pass
+
+
+def _orphan_dirs() -> list:
+    """
+    Spool folders without a recent heartbeat or retired by a clean stop
+    (+ the shared root for messages written before per-worker spools)
+    """
+    folders = [OUTBOX_DIR]
+    now = time.time()
+    for name in os.listdir(OUTBOX_DIR):
+        folder = os.path.join(OUTBOX_DIR, name)
+        if folder in (OWN_DIR, FAILED_DIR) or not os.path.isdir(folder):
+            continue
+        try:
+            alive = os.path.getmtime(os.path.join(folder, ALIVE_FILE))
+        except OSError:
+            alive = 0
+        if now - alive > OUTBOX_ORPHAN_SECONDS:
+            folders.append(folder)
+    return folders
+
 
-    except Exception as e:
-        print("❌ Telegram text failed:", e)
+def _adopt_spool() -> list:
+    """
+    Moves orphaned messages into this worker's spool. os.rename is atomic:
+    when two workers race for a file exactly one of them gets it.
+    """
+    messages = []
+    for folder in _orphan_dirs():
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith(".json"):
+                continue
+            target = os.path.join(OWN_DIR, name)
+            try:
+                os.rename(os.path.join(folder, name), target)
+            except OSError:
+                continue        # taken by another worker
+
+            try:
+                with open(target, encoding="utf-8") as f:
+                    messages.append(json.load(f))
+            except Exception as e:
+                print("⚠️ Unreadable outbox entry skipped:", name, repr(e))
+
+        if folder != OUTBOX_DIR:
+            try:
+                os.remove(os.path.join(folder, ALIVE_FILE))
+            except OSError:
+                pass
+            try:
+                os.rmdir(folder)
+            except OSError:
+                pass
+    return sorted(messages, key=lambda m: m["id"])
 
 
 # =========================
-# SEND PHOTO + CAPTION
+# WORKER
 # =========================
-def send_telegram_photo(photo_path: str, caption: str):
-    try:
-        if not os.path.exists(photo_path):
-            print("❌ Screenshot not found:", photo_path)
+class _TelegramWorker:
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.pending = []
+        self.cond = threading.Condition()
+        self.thread = None
+        self.stopping = False
+
+        self.chat_ready_at = {}         # chat_id → earliest next send
+        self.global_ready_at = 0.0
+
+        # stats
+        self.sent = 0
+        self.retried = 0
+        self.rate_limited = 0
+        self.dropped = 0
+
+    # ---------- queue ----------
+    def start(self):
+        with self.cond:
+            if self.thread is not None:
+                return
+            heartbeat()
+            self.pending = _adopt_spool()
+            self.stopping = False
+            self.thread = threading.Thread(target=self._loop, name="telegram", daemon=True)
+            self.thread.start()
+        if self.pending:
+            print(f"📬 Telegram outbox restored: {len(self.pending)} pending")
+
+    def stop(self, timeout: float = 5):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            thread.join(timeout)
+        _retire()
+
+    def adopt(self):
+        """
+        Picks up spools of workers that stopped without sending them
+        """
+        heartbeat()
+        messages = _adopt_spool()
+        if not messages:
             return
+        with self.cond:
+            self.pending = sorted(self.pending + messages, key=lambda m: m["id"])
+            self.cond.notify()
+        print(f"📬 Telegram outbox adopted: {len(messages)} pending")
+
+    def put(self, msg: dict):
+        _write_spool(msg)
+        with self.cond:
+            self.pending.append(msg)
+            self.cond.notify()
 
-        with open(photo_path, "rb") as photo:
-            response = requests.post(
-                f"{BASE_URL}/sendPhoto",
-                data={
-                    "chat_id": CHAT_ID,
-                    "caption": caption[:1024],
-                    "parse_mode": "Markdown"
-                },
-                files={
-                    "photo": photo
-                },
-                timeout=60
+    def _next(self):
+        """
+        First sendable message, keeping FIFO order per chat.
+        Returns (msg, wait_seconds)
+        """
+        now = time.time()
+        wait = None
+        blocked_chats = set()
+
+        for msg in self.pending:
+            chat = msg["data"]["chat_id"]
+            if chat in blocked_chats:
+                continue
+
+            ready_at = max(
+                msg.get("not_before", 0),
+                self.chat_ready_at.get(chat, 0),
+                self.global_ready_at
             )
+            if ready_at <= now:
+                return msg, 0
+
+            blocked_chats.add(chat)
+            wait = ready_at - now if wait is None else min(wait, ready_at - now)
+
+        return None, wait
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                if self.stopping:
+                    return
+                msg, wait = self._next()
+                if msg is None:
+                    self.cond.wait(wait)
+                    continue
+
+            self._deliver(msg)
 
-        if response.status_code != 200:
-            print("❌ Telegram photo error:", response.text)
+    # ---------- delivery ----------
+    def _deliver(self, msg: dict):
+        chat = msg["data"]["chat_id"]
+        now = time.time()
+        self.chat_ready_at[chat] = now + TELEGRAM_CHAT_INTERVAL
+        self.global_ready_at = now + 1.0 / TELEGRAM_GLOBAL_RATE
+
+        try:
+            with TELEGRAM_SEND_SECONDS.time(method=msg["method"]):
+                response = self._post(msg)
+        except FileNotFoundError:
+            self._finish(msg, sent=False, reason=f"file not found: {msg['file']['path']}")
+            return
+        except Exception as e:
+            self._retry(msg, repr(e))
+            return
+
+        if response.status_code == 200:
+            self._finish(msg, sent=True)
+            return
+
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+
+        if response.status_code == 429:
+            retry_after = (payload.get("parameters") or {}).get("retry_after", 5)
+            self.rate_limited += 1
+            TELEGRAM_MESSAGES_TOTAL.inc(method=msg["method"], result="rate_limited")
+            print(f"⏳ Telegram rate limited, retry after {retry_after}s")
+            with self.cond:
+                msg["not_before"] = time.time() + retry_after
+                self.chat_ready_at[chat] = msg["not_before"]
+            _write_spool(msg)
+            return
+
+        description = payload.get("description", response.text)
+
+        # 🔤 bad Markdown in a scraped context line → resend as plain text
+        if (
+            response.status_code == 400
+            and "parse" in description.lower()
+            and msg["data"].pop("parse_mode", None)
+        ):
+            _write_spool(msg)
+            return
+
+        if response.status_code >= 500:
+            self._retry(msg, description)
         else:
-            print("📸 Telegram photo sent")
+            self._finish(msg, sent=False, reason=description)
+
+    def _post(self, msg: dict):
+        url = f"{BASE_URL}/{msg['method']}"
+        timeout = TIMEOUTS.get(msg["method"], 60)
+        file_info = msg.get("file")
+
+        if not file_info:
+            return self.session.post(url, data=msg["data"], timeout=timeout)
+
+        with open(file_info["path"], "rb") as f:
+            upload = (file_info.get("filename") or os.path.basename(file_info["path"]), f)
+            return self.session.post(
+                url,
+                data=msg["data"],
+                files={file_info["field"]: upload},
+                timeout=timeout
+            )
+
+    def _retry(self, msg: dict, reason: str):
+        msg["attempts"] = msg.get("attempts", 0) + 1
+        if msg["attempts"] >= TELEGRAM_MAX_ATTEMPTS:
+            self._finish(msg, sent=False, reason=reason)
+            return
+
+        delay = min(TELEGRAM_BACKOFF_MAX, TELEGRAM_BACKOFF_BASE ** msg["attempts"])
+        msg["not_before"] = time.time() + delay
+        self.retried += 1
+        TELEGRAM_MESSAGES_TOTAL.inc(method=msg["method"], result="retried")
+        print(f"🔁 Telegram {msg['method']} retry in {delay:.0f}s:", reason)
+        _write_spool(msg)
+
+    def _finish(self, msg: dict, sent: bool, reason: str = ""):
+        with self.cond:
+            if msg in self.pending:
+                self.pending.remove(msg)
+
+        TELEGRAM_MESSAGES_TOTAL.inc(method=msg["method"], result="sent" if sent else "dropped")
+        if sent:
+            self.sent += 1
+            _remove_spool(msg)
+            print(f"📨 Telegram {msg['method']} sent")
+        else:
+            self.dropped += 1
+            _fail_spool(msg, reason)
+
+    def stats(self) -> dict:
+        with self.cond:
+            pending = len(self.pending)
+        return {
+            "pending": pending,
+            "sent": self.sent,
+            "retried": self.retried,
+            "rate_limited": self.rate_limited,
+            "dropped": self.dropped,
+            "worker_alive": bool(self.thread and self.thread.is_alive()),
+        }
+
+
+heartbeat()
+_worker = _TelegramWorker()
+
+
+def _enqueue(method: str, data: dict, file: dict | None = None):
+    msg = {
+        "id": f"{time.time_ns()}-{next(_seq):06d}",
+        "method": method,
+        "data": {"chat_id": CHAT_ID, **data},
+        "file": file,
+        "attempts": 0,
+        "not_before": 0,
+        "created": int(time.time()),
+    }
+    _worker.start()
+    _worker.put(msg)
 
-    except Exception as e:
-        print("❌ Telegram photo failed:", e)
+
+def start_worker():
+    _worker.start()
+
+
+def stop_worker():
+    _worker.stop()
+
+
+def adopt_orphans():
+    _worker.adopt()
+
+
+def queue_stats() -> dict:
+    return _worker.stats()
+
+
+# =========================
+# SEND TEXT MESSAGE
+# =========================
+def send_telegram(message: str):
+    _enqueue("sendMessage", {
+        "text": message,
+        "parse_mode": "Markdown"
+    })
+
+
+# =========================
+# SEND PHOTO + CAPTION
+# =========================
+def send_telegram_photo(photo_path: str, caption: str):
+    if not os.path.exists(photo_path):
+        print("❌ Screenshot not found:", photo_path)
+        return
+
+    _enqueue(
+        "sendPhoto",
+        {"caption": caption[:1024], "parse_mode": "Markdown"},
+        file={"field": "photo", "path": photo_path}
+    )
 
 
 # =========================
 # SEND PDF / DOCUMENT (NEW)
 # =========================
-def send_telegram_document(file_path: str, caption: str = ""):
+def send_telegram_document(file_path: str, caption: str = "", filename: str | None = None):
     """
     PDF / Document attach karke Telegram par bhejta hai
     """
-    try:
-        if not os.path.exists(file_path):
-            print("❌ PDF not found:", file_path)
-            return
-
-        with open(file_path, "rb") as doc:
-            response = requests.post(
-                f"{BASE_URL}/sendDocument",
-                data={
-                    "chat_id": CHAT_ID,
-                    "caption": caption[:1024],
-                    "parse_mode": "Markdown"
-                },
-                files={
-                    "document": doc
-                },
-                timeout=300
-            )
-
-        if response.status_code != 200:
-            print("❌ Telegram document error:", response.text)
-        else:
-            print("📎 Telegram PDF sent")
+    if not os.path.exists(file_path):
+        print("❌ PDF not found:", file_path)
+        return
 
-    except Exception as e:
-        print("❌ Telegram document failed:", e)
+    _enqueue(
+        "sendDocument",
+        {"caption": caption[:1024], "parse_mode": "Markdown"},
+        file={"field": "document", "path": file_path, "filename": filename}
+    )
@@ -0,0 +1,109 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# backend modules are imported top-level (python main.py / uvicorn main:app)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# never touch the real database.db, screenshots/ or outbox/, never reach the
+# real bot (load_dotenv does not override variables that are already set)
+_tmp_dir = tempfile.mkdtemp(prefix="wm-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+os.environ["TELEGRAM_BOT_TOKEN"] = "test-token"
+os.environ["TELEGRAM_CHAT_ID"] = "1"
+os.environ["TELEGRAM_API_URL"] = "http://127.0.0.1:9"
+os.environ["PREFLIGHT_ENABLED"] = "0"                # no real HTTP; tests opt in with a fake
+
+from database import Base, SessionLocal, ensure_schema     # noqa: E402  (needs DATABASE_URL)
+from models import Website                           # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    ensure_schema()
+    os.chdir(_tmp_dir)      # relative data dirs (screenshots/, outbox/, ...) land here
+
+
+@pytest.fixture
+def flush_hook():
+    """
+    Runs one state_writer flush for a single hook: take → write → commit → release
+    """
+    def flush(hook):
+        batch = hook.take()
+        db = SessionLocal()
+        try:
+            hook.write(db, batch)
+            db.commit()
+        finally:
+            db.close()
+        release = getattr(hook, "release", None)
+        if release is not None:
+            release(batch)
+        return batch
+    return flush
+
+
+@pytest.fixture
+def add_sites():
+    """
+    Inserts Website rows (name / url / keyword default), deleted with
+    everything that references them after the test (ids get reused)
+    """
+    created = []
+
+    def add(*rows):
+        db = SessionLocal()
+        try:
+            sites = [
+                Website(**{"name": "site", "url": "https://a.example/", "keyword": "k", **row})
+                for row in rows
+            ]
+            db.add_all(sites)
+            db.commit()
+            ids = [site.id for site in sites]
+        finally:
+            db.close()
+        created.extend(ids)
+        return ids
+
+    yield add
+
+    db = SessionLocal()
+    try:
+        for table in Base.metadata.sorted_tables:
+            if "website_id" in table.c:
+                db.execute(table.delete().where(table.c.website_id.in_(created)))
+        db.query(Website).filter(Website.id.in_(created)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+class RecordingExecutor:
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        self.submitted.append(args)
+
+
+@pytest.fixture
+def make_scheduler():
+    """
+    ScanScheduler whose worker pool only records what was submitted
+    """
+    from scan_scheduler import ScanScheduler
+
+    def make(**kwargs):
+        kwargs.setdefault("coalesce_window", 0)
+        kwargs.setdefault("run_scan", lambda site_id: None)
+        kwargs.setdefault("load_sites", lambda: [])
+        scheduler = ScanScheduler(**kwargs)
+        scheduler._executor = RecordingExecutor()
+        return scheduler
+    return make
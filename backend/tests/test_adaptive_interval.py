@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import adaptive_interval
+
+
+def make_site(**fields):
+    site = dict(
+        adaptive=True, interval=600, min_interval=60, max_interval=86400,
+        effective_interval=None, change_rate=0.0, changes_observed=0.0, time_observed=0.0,
+    )
+    site.update(fields)
+    return SimpleNamespace(**site)
+
+
+def test_current_interval_uses_effective_only_when_adaptive():
+    assert adaptive_interval.current_interval(make_site(effective_interval=120)) == 120
+    assert adaptive_interval.current_interval(make_site(adaptive=False, effective_interval=120)) == 600
+    assert adaptive_interval.current_interval(make_site()) == 600
+
+
+def test_prior_keeps_the_configured_interval():
+    site = make_site()
+    adaptive_interval.observe(site, previous_check=1000, now=1001, changed=False)
+    assert abs(site.effective_interval - 600) <= 1
+
+
+def test_quiet_page_backs_off_to_max():
+    site = make_site(max_interval=3600)
+    now = 1000
+    for _ in range(200):
+        adaptive_interval.observe(site, previous_check=now, now=now + 600, changed=False)
+        now += 600
+    assert site.effective_interval == 3600
+
+
+def test_change_halves_the_interval_at_once():
+    site = make_site(effective_interval=2000)
+    adaptive_interval.observe(site, previous_check=1000, now=1600, changed=True)
+    assert site.effective_interval <= 1000
+
+
+def test_interval_is_clamped_to_min():
+    site = make_site(min_interval=300)
+    for i in range(50):
+        adaptive_interval.observe(site, previous_check=1000 + i * 60, now=1060 + i * 60, changed=True)
+    assert site.effective_interval == 300
+
+
+def test_non_adaptive_or_first_check_is_ignored():
+    site = make_site(adaptive=False)
+    adaptive_interval.observe(site, previous_check=1000, now=2000, changed=True)
+    assert site.effective_interval is None
+
+    site = make_site()
+    adaptive_interval.observe(site, previous_check=0, now=2000, changed=True)
+    adaptive_interval.observe(site, previous_check=2000, now=2000, changed=True)
+    assert site.effective_interval is None
+
+
+def test_bounds_fix_inverted_limits():
+    assert adaptive_interval.bounds(make_site(min_interval=600, max_interval=100)) == (600, 600)
+    assert adaptive_interval.bounds(make_site(min_interval=None, max_interval=None)) == (60, 60)
@@ -0,0 +1,43 @@
+import pytest
+import requests
+
+import benchmark
+from benchmark import Portal, latency_summary, percentile
+
+
+@pytest.fixture
+def portal():
+    portal = Portal(rows=5, change_every=60, slow_ms=0).start()
+    yield portal
+    portal.stop()
+
+
+def test_portal_serves_every_page_kind(portal):
+    kinds = {kind: requests.get(url, timeout=5) for kind, url in portal.site_urls(10)}
+    assert {kind: r.status_code for kind, r in kinds.items()} == {
+        "notice": 200, "changing": 200, "slow": 200, "error": 404,
+    }
+    assert kinds["notice"].text.count("<tr>") == 6             # header + rows
+    assert f"revision {portal.revision()}" in kinds["changing"].text
+
+    pdf = requests.get(portal.base_url + "/pdf/notice-1-0.pdf", timeout=5)
+    assert pdf.content == benchmark.PDF_BYTES
+
+
+def test_fake_telegram_times_alerts_from_the_page_change(portal):
+    revision = portal.revision()
+    response = requests.post(
+        f"{portal.base_url}/bot{benchmark.BENCH_TOKEN}/sendMessage",
+        data={"chat_id": "1", "text": f"Website updated: Notice revision {revision} published"},
+        timeout=5,
+    )
+    assert response.json()["ok"] is True
+    assert [method for _, method, _ in portal.telegram] == ["sendMessage"]
+    assert 0 <= portal.alert_latencies[0] < 61
+
+
+def test_percentiles_interpolate():
+    values = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
+    assert percentile(values, 50) == 5.5
+    assert percentile([], 95) is None
+    assert latency_summary([3, 1, 2]) == {"count": 3, "p50": 2, "p95": pytest.approx(2.9), "p99": pytest.approx(2.98), "max": 3}
@@ -0,0 +1,107 @@
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import pytest
+
+import browser_pool
+from browser_pool import MARKER, BrowserPool, _BrowserWorker
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """
+    Pool with one worker that is never started (no Chromium here); started
+    replacements are recorded instead
+    """
+    started = []
+    monkeypatch.setattr(_BrowserWorker, "start", lambda self: started.append(self))
+    pool = BrowserPool(size=1)
+    pool.started = started
+    worker = _BrowserWorker(pool, 0)
+    pool._workers = [worker]
+    return pool
+
+
+def stuck_job(pool, worker):
+    """
+    worker is inside a job past the deadline, holding the render slot
+    """
+    pool._render_slots.acquire()
+    worker.holds_slot = True
+    future = Future()
+    future.set_running_or_notify_cancel()
+    worker.job = (future, 0.0)
+    return future
+
+
+def test_deadline_kill_takes_down_the_marked_browser_tree(pool):
+    worker = pool._workers[0]
+    worker.marker = f"{os.getpid()}-0.0-1"
+    browser = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)", MARKER + worker.marker])
+    try:
+        deadline = time.monotonic() + 5
+        while browser_pool._find_marked(browser_pool._proc_table(), worker.marker) is None:
+            assert time.monotonic() < deadline, "test browser never showed up"
+            time.sleep(0.02)
+        future = stuck_job(pool, worker)
+        worker.govern(browser_pool._proc_table(), browser_pool.SCAN_DEADLINE_SECONDS + 1)
+
+        assert isinstance(future.exception(), FutureTimeout)
+        assert browser.wait(5) == -9
+        assert not worker.retired and pool._workers == [worker]
+    finally:
+        browser.kill()
+
+
+def test_unkillable_browser_retires_the_worker_and_frees_its_slot(pool):
+    worker = pool._workers[0]
+    worker.marker = "gone-0.0-1"
+    future = stuck_job(pool, worker)
+
+    worker.govern({}, browser_pool.SCAN_DEADLINE_SECONDS + 1)
+
+    assert isinstance(future.exception(), FutureTimeout)
+    assert worker.retired
+    replacement = pool._workers[0]
+    assert replacement is not worker and pool.started == [replacement]
+    assert replacement.restarts == 1
+    assert pool.stats()["workers_retired"] == 1
+
+    # the slot is back, and the stuck job returning later does not release it twice
+    assert pool._render_slots.acquire(timeout=0)
+    pool._render_slots.release()
+    pool._free_slot(worker)             # BoundedSemaphore: a second release would raise
+
+
+# =========================
+# FAILED WORKERS (user-001)
+# =========================
+def queued_job(pool):
+    future = Future()
+    pool._jobs.put((lambda page: None, future))
+    return future
+
+
+def test_dead_worker_leaves_queued_jobs_to_the_live_ones(pool):
+    pool._workers.append(_BrowserWorker(pool, 1))
+    job = queued_job(pool)
+
+    pool._worker_died(pool._workers[0], RuntimeError("playwright crashed"))
+    assert not job.done() and pool._jobs.qsize() == 1
+
+
+def test_last_dead_worker_fails_the_queue_and_is_restarted_later(pool, monkeypatch):
+    job = queued_job(pool)
+    error = RuntimeError("playwright crashed")
+    pool._worker_died(pool._workers[0], error)
+    assert job.exception() is error
+
+    with pytest.raises(RuntimeError, match="No browser worker"):
+        pool.run(lambda page: None, timeout=1)
+
+    monkeypatch.setattr(browser_pool, "WORKER_RESTART_SECONDS", 0)
+    pool._restart_dead()
+    assert not pool._workers[0].dead and pool.started == [pool._workers[0]]
@@ -0,0 +1,104 @@
+import pytest
+
+import browser_service
+
+
+class RecordingPage:
+    """
+    Page stand-in that records what the screenshot preparation does to it
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def unroute(self, pattern, handler):
+        self.calls.append("unroute")
+
+    def evaluate(self, js, arg=None):
+        self.calls.append("evaluate")
+
+    def wait_for_function(self, js, timeout=None):
+        self.calls.append("wait_for_function")
+
+    def reload(self, **kwargs):
+        self.calls.append("reload")
+
+    def goto(self, url, **kwargs):
+        self.calls.append("goto")
+
+
+def test_alert_screenshot_loads_images_without_navigating():
+    page = RecordingPage()
+    browser_service._load_images(page)
+    assert page.calls == ["unroute", "evaluate", "wait_for_function"]
+
+
+def test_image_timeout_still_allows_the_screenshot():
+    page = RecordingPage()
+
+    def slow(js, timeout=None):
+        raise browser_service.PlaywrightTimeoutError("images still loading")
+
+    page.wait_for_function = slow
+    browser_service._load_images(page)      # no exception → screenshot what has loaded
+
+
+# =========================
+# SINGLE RENDER (user-002)
+# =========================
+class RenderedPage(RecordingPage):
+    url = "https://portal.example/notices"
+
+    def route(self, pattern, handler):
+        self.calls.append("route")
+
+    def evaluate(self, js, arg=None):
+        self.calls.append("evaluate")
+        return {"text": "Admit card released", "links": [], "title": "Notices",
+                "meta": {}, "invalid": [], "scoped": True}
+
+    def screenshot(self, **kwargs):
+        self.calls.append("screenshot")
+        return b"png"
+
+
+class OnePagePool:
+    def __init__(self):
+        self.page = RenderedPage()
+
+    def run(self, fn):
+        return fn(self.page)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = OnePagePool()
+    monkeypatch.setattr(browser_service, "get_pool", lambda: pool)
+    monkeypatch.setattr(browser_service, "wait_until_ready", lambda page, selector=None: None)
+    monkeypatch.setattr(browser_service, "FAST_SCAN_ENABLED", True)
+    return pool
+
+
+def test_quiet_render_takes_no_screenshot(pool):
+    data = browser_service.render_page(pool.page.url, capture_if=lambda data: False)
+    assert data["text"] == "Admit card released" and data["screenshot_png"] is None
+    assert pool.page.calls == ["route", "goto", "evaluate"]
+
+
+def test_detection_is_captured_from_the_same_page_load(pool):
+    seen = []
+    data = browser_service.render_page(pool.page.url, capture_if=lambda data: seen.append(data["text"]) or True)
+    assert seen == ["Admit card released"]
+    assert data["screenshot_png"] == b"png"
+    assert pool.page.calls.count("goto") == 1
+    assert pool.page.calls[-4:] == ["unroute", "evaluate", "wait_for_function", "screenshot"]
+
+
+def test_render_failure_is_returned_not_raised(pool):
+    def offline(url, **kwargs):
+        raise RuntimeError("net::ERR_NAME_NOT_RESOLVED")
+
+    pool.page.goto = offline
+    data = browser_service.render_page(pool.page.url)
+    assert "ERR_NAME_NOT_RESOLVED" in data["error"]
+    assert data["text"] is None
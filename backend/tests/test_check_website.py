@@ -0,0 +1,262 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+
+import database
+import main
+import normalizer
+import preflight
+from database import SessionLocal
+from models import Website, WebsiteKeyword, WebsiteLog
+from schemas import KeywordSpec
+from state_writer import state_writer
+
+
+def scan_result(page_hash="new", text="Notice board", matches=None, error=None):
+    return {
+        "error": error,
+        "render_ms": 120,
+        "page_hash": page_hash,
+        "text": text,
+        "matches": matches or {},
+        "final_url": None,
+        "screenshot_png": None,
+        "pdf_links": [],
+        "error_page": False,
+    }
+
+
+class Renders(list):
+    """
+    Scan results the fake browser returns, in order; .alerts collects the
+    alert messages
+    """
+    alerts: list
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    queue = Renders()
+    queue.alerts = []
+    monkeypatch.setattr(main.scan_coalescer, "scan", lambda url, **kwargs: queue.pop(0))
+    monkeypatch.setattr(main, "send_alert", lambda site, message, scan: queue.alerts.append(message))
+    return queue
+
+
+@pytest.fixture
+def preflights(monkeypatch):
+    """
+    Preflight that always reports "unchanged" and records its calls
+    """
+    calls = []
+
+    def fake_preflight(url, etag=None, last_modified=None, body_hash=None, normalize=None):
+        calls.append(url)
+        return {"changed": False, "etag": etag, "last_modified": last_modified, "body_hash": body_hash}
+
+    monkeypatch.setattr(main, "PREFLIGHT_ENABLED", True)
+    monkeypatch.setattr(main, "preflight", fake_preflight)
+    return calls
+
+
+@pytest.fixture
+def page_site(add_sites):
+    """
+    Page-change site (no keywords) with a baseline and stored validators
+    """
+    return add_sites(dict(
+        url="https://portal.example/notices", keyword="", interval=60,
+        first_run=False, last_status="up", last_hash="old",
+        hash_profile=normalizer.get_normalizer().signature,
+        http_etag='"v1"', http_body_hash="body-v1", last_rendered=int(time.time()),
+    ))[0]
+
+
+def scan(site_id, site=None):
+    site = site or main.load_site_for_scan(site_id)
+    main.check_website(site, manual=True)
+    state_writer.flush()
+
+
+def stored(site_id) -> Website:
+    db = SessionLocal()
+    try:
+        return db.get(Website, site_id)
+    finally:
+        db.close()
+
+
+def logs(site_id) -> list[str]:
+    db = SessionLocal()
+    try:
+        return [l.event_type for l in db.query(WebsiteLog).filter(WebsiteLog.website_id == site_id)]
+    finally:
+        db.close()
+
+
+# =========================
+# WATCHED REGION (user-018)
+# =========================
+def test_region_change_clears_baseline_and_validators(page_site):
+    main.set_regions(page_site, main.RegionUpdate(include_selectors=["#notices"]))
+    state_writer.flush()
+    site = stored(page_site)
+    assert site.region_version == 1
+    assert (site.last_hash, site.http_etag, site.http_body_hash) == (None, None, None)
+
+
+def test_new_region_is_baselined_by_a_render_not_the_preflight(page_site, renders, preflights, monkeypatch):
+    main.set_regions(page_site, main.RegionUpdate(include_selectors=["#notices"]))
+    renders.append(scan_result(page_hash="region-v1"))
+    scan(page_site)
+    assert preflights == []
+    assert stored(page_site).last_hash == "region-v1"
+
+    # 🔁 baseline taken → the next real change alerts
+    monkeypatch.setattr(main, "PREFLIGHT_ENABLED", False)
+    renders.append(scan_result(page_hash="region-v2"))
+    scan(page_site)
+    assert len(renders.alerts) == 1
+    assert "update" in logs(page_site)
+
+
+def test_scan_in_flight_does_not_restore_the_old_baseline(page_site, renders):
+    in_flight = main.load_site_for_scan(page_site)
+    main.set_regions(page_site, main.RegionUpdate(exclude_selectors=[".marquee"]))
+
+    renders.append(scan_result(page_hash="old-region-hash"))
+    scan(page_site, site=in_flight)
+    assert stored(page_site).last_hash is None
+
+
+# =========================
+# SITE LIST ETAG (user-020)
+# =========================
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    return TestClient(main.app)        # no `with`: the scheduler / browsers stay off
+
+
+def test_site_list_etag_ignores_scans_and_follows_edits(client, page_site, renders):
+    first = client.get("/api/websites")
+    etag = first.headers["etag"]
+    assert client.get("/api/websites", headers={"If-None-Match": etag}).status_code == 304
+
+    # 🔍 scan results change rows but not the list version
+    renders.append(scan_result(page_hash="new"))
+    scan(page_site)
+    assert client.get("/api/websites", headers={"If-None-Match": etag}).status_code == 304
+
+    main.toggle_website(page_site)
+    changed = client.get("/api/websites", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+# =========================
+# FORCED RENDER (user-004)
+# =========================
+def test_preflight_skips_until_a_render_is_due(page_site, renders, preflights, monkeypatch):
+    monkeypatch.setattr(preflight, "PREFLIGHT_MAX_SKIPS", 2)
+    scan(page_site)
+    scan(page_site)
+    assert len(preflights) == 2
+    assert stored(page_site).preflight_skips == 2
+
+    # 🔁 third check renders despite the "unchanged" preflight and resets the count
+    renders.append(scan_result(page_hash="new"))
+    scan(page_site)
+    assert len(preflights) == 2
+    assert renders == []
+    site = stored(page_site)
+    assert site.preflight_skips == 0
+    assert site.last_rendered == site.last_checked
+    assert len(renders.alerts) == 1
+
+
+def test_stale_last_render_forces_a_render(page_site, renders, preflights, monkeypatch):
+    monkeypatch.setattr(preflight, "PREFLIGHT_MAX_AGE", 3600)
+    db = SessionLocal()
+    db.get(Website, page_site).last_rendered = int(time.time()) - 7200
+    db.commit()
+    db.close()
+
+    renders.append(scan_result(page_hash="old"))
+    scan(page_site)
+    assert preflights == []
+    assert renders == []
+
+
+# =========================
+# KEYWORD SETS (user-013)
+# =========================
+def keyword_rows(site_id) -> list[str]:
+    db = SessionLocal()
+    try:
+        return [k.keyword for k in db.query(WebsiteKeyword).filter(WebsiteKeyword.website_id == site_id)]
+    finally:
+        db.close()
+
+
+def test_legacy_keyword_migration_runs_once_per_site(add_sites):
+    site_id = add_sites(dict(keyword="vacancy"))[0]
+    main.migrate_legacy_keywords()
+    main.migrate_legacy_keywords()
+    assert keyword_rows(site_id) == ["vacancy"]
+
+
+def test_duplicate_keyword_rows_are_rejected(add_sites):
+    site_id = add_sites(dict(keyword=""))[0]
+    db = SessionLocal()
+    try:
+        db.add_all([WebsiteKeyword(website_id=site_id, keyword="exam", is_regex=False) for _ in range(2)])
+        with pytest.raises(IntegrityError):
+            db.commit()
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_keyword_set_can_keep_an_existing_keyword(add_sites):
+    site_id = add_sites(dict(keyword=""))[0]
+    main.set_keywords(site_id, [KeywordSpec(keyword="exam"), KeywordSpec(keyword="result")])
+    main.set_keywords(site_id, [KeywordSpec(keyword="exam")])
+    assert keyword_rows(site_id) == ["exam"]
+
+
+def test_schema_upgrade_drops_duplicates_before_the_unique_index():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE t (id INTEGER PRIMARY KEY, a INTEGER, b TEXT)")
+        conn.exec_driver_sql("INSERT INTO t (a, b) VALUES (1, 'x'), (1, 'x'), (1, 'y'), (2, 'x')")
+        database._drop_duplicates(conn, "t", ["a", "b"])
+        rows = conn.exec_driver_sql("SELECT id, a, b FROM t ORDER BY id").fetchall()
+    assert [tuple(r) for r in rows] == [(1, 1, "x"), (3, 1, "y"), (4, 2, "x")]
+
+
+# =========================
+# RENDER ERRORS (user-023)
+# =========================
+def test_render_error_is_logged_like_an_exception(page_site, renders, monkeypatch):
+    renders.append(scan_result(error="net::ERR_CONNECTION_RESET"))
+    scan(page_site)
+
+    def broken(url, **kwargs):
+        raise RuntimeError("browser crashed")
+    monkeypatch.setattr(main.scan_coalescer, "scan", broken)
+    scan(page_site)
+
+    db = SessionLocal()
+    try:
+        messages = [
+            l.message for l in db.query(WebsiteLog)
+            .filter(WebsiteLog.website_id == page_site, WebsiteLog.event_type == "error")
+            .order_by(WebsiteLog.id)
+        ]
+    finally:
+        db.close()
+    assert messages == ["net::ERR_CONNECTION_RESET", "browser crashed"]
+    assert stored(page_site).consecutive_failures == 2
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+
+import circuit_breaker as cb
+
+
+def make_site(**fields):
+    site = dict(
+        interval=60, breaker_state=cb.CLOSED, consecutive_failures=0,
+        breaker_open_until=0, down_since=None, last_error=None,
+    )
+    site.update(fields)
+    return SimpleNamespace(**site)
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(cb.random, "uniform", lambda a, b: 1.0)
+
+
+def open_breaker(site, now=1000):
+    for i in range(cb.BREAKER_FAILURE_THRESHOLD):
+        result = cb.record_failure(site, now + i, "timeout")
+    return result
+
+
+def test_opens_after_threshold_failures_once():
+    site = make_site()
+    for i in range(cb.BREAKER_FAILURE_THRESHOLD - 1):
+        assert cb.record_failure(site, 1000 + i, "timeout") is None
+    assert site.breaker_state == cb.CLOSED
+    assert site.down_since == 1000
+
+    last = 1000 + cb.BREAKER_FAILURE_THRESHOLD - 1
+    assert cb.record_failure(site, last, "timeout") == "opened"
+    assert site.breaker_state == cb.OPEN
+    assert site.breaker_open_until == last + cb.BREAKER_BASE_BACKOFF
+    assert cb.record_failure(site, last + 1, "timeout") is None
+
+
+def test_open_breaker_blocks_until_backoff_then_probes():
+    site = make_site()
+    open_breaker(site)
+    assert not cb.allow(site, site.breaker_open_until - 1)
+    assert cb.allow(site, site.breaker_open_until)
+    assert site.breaker_state == cb.HALF_OPEN
+
+
+def test_failed_probe_reopens_with_longer_backoff():
+    site = make_site()
+    open_breaker(site)
+    first = site.breaker_open_until
+    cb.allow(site, first)
+
+    assert cb.record_failure(site, first, "timeout") is None
+    assert site.breaker_state == cb.OPEN
+    assert site.breaker_open_until - first == 2 * cb.BREAKER_BASE_BACKOFF
+
+
+def test_backoff_is_capped_and_never_shorter_than_the_interval():
+    assert cb.backoff(make_site(consecutive_failures=100)) == cb.BREAKER_MAX_BACKOFF
+    slow = make_site(interval=cb.BREAKER_BASE_BACKOFF * 4, consecutive_failures=cb.BREAKER_FAILURE_THRESHOLD)
+    assert cb.backoff(slow) == cb.BREAKER_BASE_BACKOFF * 4
+
+
+def test_success_after_outage_reports_its_start():
+    site = make_site()
+    open_breaker(site, now=5000)
+    cb.allow(site, site.breaker_open_until)
+
+    assert cb.record_success(site, 9000) == 5000
+    assert site.breaker_state == cb.CLOSED
+    assert site.consecutive_failures == 0
+    assert site.down_since is None
+
+
+def test_success_while_closed_is_quiet():
+    site = make_site()
+    cb.record_failure(site, 1000, "timeout")
+    assert cb.record_success(site, 1100) is None
+    assert site.consecutive_failures == 0 and site.down_since is None
+
+
+def test_last_error_is_truncated():
+    site = make_site()
+    cb.record_failure(site, 1000, "x" * 1000)
+    assert len(site.last_error) == 500
+    cb.record_failure(site, 1001, None)
+    assert site.last_error is None
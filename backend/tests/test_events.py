@@ -0,0 +1,83 @@
+import asyncio
+import json
+import threading
+
+from events import EventBroadcaster
+
+
+async def drain(sub, count):
+    return [await asyncio.wait_for(sub.queue.get(), 2) for _ in range(count)]
+
+
+def test_events_published_from_other_threads_arrive_in_order():
+    async def scenario():
+        broadcaster = EventBroadcaster()
+        sub = broadcaster.subscribe()
+        publisher = threading.Thread(target=lambda: [
+            broadcaster.publish("scan_finished", site_id=i) for i in range(3)
+        ])
+        publisher.start()
+        publisher.join()
+        return await drain(sub, 3)
+
+    received = asyncio.run(scenario())
+    assert [(e["id"], e["type"], e["site_id"]) for e in received] == [
+        (1, "scan_finished", 0), (2, "scan_finished", 1), (3, "scan_finished", 2)
+    ]
+
+
+def test_slow_client_gets_one_resync_instead_of_blocking():
+    async def scenario():
+        broadcaster = EventBroadcaster(buffer=2)
+        sub = broadcaster.subscribe()
+        for i in range(5):
+            broadcaster.publish("log", site_id=i)
+        await asyncio.sleep(0)          # let the queued pushes run
+        return [e["type"] for e in await drain(sub, sub.queue.qsize())], sub.overflows
+
+    types, overflows = asyncio.run(scenario())
+    assert types == ["resync"]          # 5 events into a buffer of 2
+    assert overflows == 2
+
+
+def test_subscriber_of_a_closed_loop_is_dropped():
+    broadcaster = EventBroadcaster()
+
+    async def connect():
+        broadcaster.subscribe()
+
+    asyncio.run(connect())              # loop closed, subscriber never left
+    broadcaster.publish("site_added", site_id=1)
+    assert broadcaster.stats()["subscribers"] == 0
+    assert broadcaster.dropped == 1
+
+
+class Client:
+    """
+    Stand-in for the Starlette request: connected for n checks
+    """
+    def __init__(self, checks):
+        self.checks = checks
+
+    async def is_disconnected(self):
+        self.checks -= 1
+        return self.checks < 0
+
+
+def test_stream_sends_hello_then_sse_frames_and_unsubscribes():
+    async def scenario():
+        broadcaster = EventBroadcaster()
+        stream = broadcaster.stream(Client(1))
+        frames = [await stream.__anext__()]
+        broadcaster.publish("status", site_id=7, old="up", new="down")
+        frames.append(await stream.__anext__())
+        frames.extend([frame async for frame in stream])
+        return broadcaster, frames
+
+    broadcaster, frames = asyncio.run(scenario())
+    assert frames[0].startswith("retry: 3000\nevent: hello\n")
+    head, data = frames[1].split("data: ")
+    assert head == "id: 1\nevent: status\n"
+    assert json.loads(data)["new"] == "down"
+    assert len(frames) == 2
+    assert broadcaster.stats()["subscribers"] == 0
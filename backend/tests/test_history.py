@@ -0,0 +1,70 @@
+import time
+
+import history
+
+
+def test_latency_buckets_are_about_19_percent_wide():
+    assert history.latency_bucket(1100) == history.latency_bucket(1150)
+    assert history.latency_bucket(1100) < history.latency_bucket(1350)
+    assert abs(history.bucket_value(history.latency_bucket(1000)) - 1000) / 1000 < 0.1
+
+
+def test_pick_resolution():
+    now = 10 * history.DAY
+    assert history.pick_resolution(now - 3600, now, now) == history.MINUTE
+    assert history.pick_resolution(now - 3 * history.DAY, now, now) == history.HOUR
+    assert history.pick_resolution(now - 400 * history.DAY, now, now + 100 * history.DAY) == history.DAY
+
+
+def test_rollups_and_percentiles(flush_hook):
+    recorder = history.HistoryRecorder()
+    now = int(time.time())
+    start = now - now % history.HOUR
+    for i in range(100):
+        recorder.record(1, start + i, duration_ms=(i + 1) * 10, status="rendered", changed=i == 5)
+    for i in range(4):
+        recorder.record(1, start + 200 + i, duration_ms=50, status="error", changed=False)
+    recorder.record(2, start, duration_ms=100, status="skipped", changed=False)
+    flush_hook(recorder)
+
+    summary = history.summarize([1, 2, 3], start, start + history.HOUR)
+    site = summary["sites"][1]
+    assert site["checks"] == 104
+    assert site["up"] == 100
+    assert site["uptime"] == round(100 / 104, 5)
+    assert site["changes"] == 1
+    assert site["min_ms"] == 10 and site["max_ms"] == 1000
+    assert site["p50"] < site["p90"] <= site["p99"]
+    assert abs(site["p90"] - 900) / 900 < 0.2
+    assert summary["sites"][2]["checks"] == 1
+    assert summary["sites"][3]["checks"] == 0
+    assert summary["sites"][3]["uptime"] is None and summary["sites"][3]["p50"] is None
+
+
+def test_second_batch_merges_into_the_same_rollup(flush_hook):
+    recorder = history.HistoryRecorder()
+    now = int(time.time())
+    start = now - now % history.HOUR
+    recorder.record(10, start + 1, duration_ms=200, status="rendered", changed=True)
+    flush_hook(recorder)
+    recorder.record(10, start + 2, duration_ms=400, status="render_error", changed=False)
+    flush_hook(recorder)
+
+    points = history.series(10, start, start + history.HOUR, history.HOUR)["points"]
+    assert len(points) == 1
+    assert points[0]["checks"] == 2
+    assert points[0]["up"] == 1
+    assert points[0]["changes"] == 1
+    assert points[0]["avg_ms"] == 300
+    assert (points[0]["min_ms"], points[0]["max_ms"]) == (200, 400)
+
+
+def test_restore_and_discard():
+    recorder = history.HistoryRecorder()
+    recorder.record(20, 1, 10, "rendered", False)
+    recorder.record(21, 1, 10, "rendered", False)
+    batch = recorder.take()
+    assert recorder.take() == []
+    recorder.restore(batch)
+    recorder.discard(20)
+    assert [r["website_id"] for r in recorder.take()] == [21]
@@ -0,0 +1,78 @@
+from keyword_matcher import AhoCorasick, KeywordMatcher, validate_keywords
+
+
+PAGE = """Latest notices
+Recruitment of Constables 2024 - apply online
+Admit card for CGL released
+Result: vacancy 12/2023"""
+
+
+def test_aho_corasick_finds_overlapping_keywords():
+    automaton = AhoCorasick(["he", "she", "hers"])
+    found = {(start, end, index) for start, end, index in automaton.iter_matches("ushers")}
+    assert found == {(1, 4, 1), (2, 4, 0), (2, 6, 2)}
+
+
+def test_plain_keywords_are_case_insensitive_with_context_line():
+    matcher = KeywordMatcher([("recruitment", False, False), ("ADMIT CARD", False, False)])
+    hits = matcher.match(PAGE)
+    assert hits == {
+        "recruitment": "Recruitment of Constables 2024 - apply online",
+        "ADMIT CARD": "Admit card for CGL released",
+    }
+
+
+def test_whole_word_skips_partial_matches():
+    matcher = KeywordMatcher([("card", False, True), ("vacan", False, True)])
+    assert list(matcher.match(PAGE)) == ["card"]
+
+
+def test_regex_keywords_share_one_pattern():
+    matcher = KeywordMatcher([(r"vacancy \d+/\d{4}", True, False), (r"cgl|chsl", True, True)])
+    hits = matcher.match(PAGE)
+    assert hits[r"vacancy \d+/\d{4}"] == "Result: vacancy 12/2023"
+    assert hits["cgl|chsl"] == "Admit card for CGL released"
+    assert matcher._regex is not None and not matcher._separate
+
+
+def test_backreference_and_inline_flags_are_matched_on_their_own():
+    matcher = KeywordMatcher([
+        (r"(\w)\1", True, False),
+        (r"(?s)notices.*online", True, False),
+        ("result", False, False),
+    ])
+    assert len(matcher._separate) == 2
+    hits = matcher.match(PAGE)
+    assert hits[r"(\w)\1"] == "Recruitment of Constables 2024 - apply online"
+    assert hits["(?s)notices.*online"] == "Latest notices"
+    assert hits["result"] == "Result: vacancy 12/2023"
+
+
+def test_invalid_regex_is_reported_and_skipped():
+    matcher = KeywordMatcher([("adm[it", True, False), ("admit", False, False)])
+    assert "adm[it" in matcher.errors
+    assert matcher.keywords == ["admit"]
+
+
+def test_duplicate_and_blank_keywords_are_ignored():
+    matcher = KeywordMatcher([("admit", False, False), (" admit ", False, False), ("", False, False)])
+    assert matcher.keywords == ["admit"]
+    assert not KeywordMatcher([])
+
+
+def test_validate_keywords():
+    assert validate_keywords([("admit", False, False), (r"\d+", True, True)]) == []
+    errors = validate_keywords([("(a", True, False), ("(a", False, False)])
+    assert len(errors) == 1
+    assert errors[0].startswith("invalid regex keyword '(a'")
+
+
+def test_overlapping_and_nested_regex_keywords_are_all_reported():
+    matcher = KeywordMatcher([("admit", True, False), ("admit card", True, False)])
+    assert matcher.match("Download admit card now") == {
+        "admit": "Download admit card now",
+        "admit card": "Download admit card now",
+    }
+
+    matcher = KeywordMatcher([(r"recruitment \d{4}", True, False), (r"\d{4}", True, False)])
+    assert set(matcher.match("recruitment 2024")) == {r"recruitment \d{4}", r"\d{4}"}
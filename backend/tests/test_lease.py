@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+import lease
+from database import SessionLocal
+from models import Website
+
+
+@pytest.fixture
+def sites(add_sites):
+    now = int(time.time())
+    rows = [
+        dict(name="due", interval=60, last_checked=now - 120),
+        dict(name="fresh", interval=60, last_checked=now - 30),
+        dict(name="taken", url="https://b.example/", interval=60, last_checked=0,
+             lease_owner="other-host", lease_expires=now + 60),
+        dict(name="expired", url="https://c.example/", interval=60, last_checked=0,
+             lease_owner="dead-host", lease_expires=now - 1),
+        dict(name="disabled", url="https://d.example/", interval=60, last_checked=0, enabled=False),
+    ]
+    return dict(zip([row["name"] for row in rows], add_sites(*rows)))
+
+
+def owners(ids):
+    db = SessionLocal()
+    try:
+        return {name: db.get(Website, site_id).lease_owner for name, site_id in ids.items()}
+    finally:
+        db.close()
+
+
+def test_claim_takes_due_free_and_expired_sites(sites):
+    claimed = lease.claim_sites(sites.values())
+    assert claimed == {sites["due"], sites["expired"]}
+    assert owners(sites) == {
+        "due": lease.WORKER_ID,
+        "fresh": None,
+        "taken": "other-host",
+        "expired": lease.WORKER_ID,
+        "disabled": None,
+    }
+
+
+def test_slack_claims_sites_due_soon(sites):
+    assert sites["fresh"] in lease.claim_sites([sites["fresh"]], slack=60)
+
+
+def test_manual_claim_ignores_due_time_but_not_other_leases(sites):
+    claimed = lease.claim_sites([sites["fresh"], sites["taken"]], require_due=False)
+    assert claimed == {sites["fresh"]}
+
+
+def test_renew_extends_own_leases_only(sites):
+    lease.claim_sites([sites["due"]])
+    db = SessionLocal()
+    db.query(Website).filter(Website.id == sites["due"]).update({Website.lease_expires: 1})
+    db.commit()
+    db.close()
+
+    lease.renew_leases([sites["due"], sites["taken"]])
+    db = SessionLocal()
+    try:
+        assert db.get(Website, sites["due"]).lease_expires > time.time()
+        assert db.get(Website, sites["taken"]).lease_owner == "other-host"
+    finally:
+        db.close()
+
+
+def test_scheduler_rearms_sites_leased_elsewhere(make_scheduler):
+    scheduler = make_scheduler(claim=lambda site_ids, slack=0: {1})
+    scheduler.upsert(1, "https://a.example/", 60, 0)
+    scheduler.upsert(2, "https://b.example/", 60, 0)
+
+    with scheduler._cond:
+        batch, _ = scheduler._pick_due()
+    scheduler._dispatch(batch)
+
+    assert scheduler._executor.submitted == [([1], "a.example")]
+    assert scheduler.claim_conflicts == 1
+    assert not scheduler.is_running(2)
+    assert scheduler._entries[2]["due"] > time.time() + 55
+    assert scheduler.stats()["busy_domains"] == {"a.example": 1}
+
+
+def test_failed_claim_retries_soon_with_backoff(make_scheduler):
+    def broken_claim(site_ids, slack=0):
+        raise RuntimeError("database is locked")
+
+    scheduler = make_scheduler(claim=broken_claim)
+    scheduler.upsert(1, "https://a.example/", 3600, 0)
+
+    delays = []
+    for _ in range(3):
+        with scheduler._cond:
+            scheduler._entries[1]["due"] = 0
+            scheduler._push(1, 0)
+            batch, _ = scheduler._pick_due()
+        started = time.time()
+        scheduler._dispatch(batch)
+        delays.append(round(scheduler._entries[1]["due"] - started))
+
+    assert delays == [2, 4, 8]
+    assert scheduler.claim_conflicts == 0
+    assert scheduler.claim_errors == 3
+    assert scheduler._executor.submitted == []
+    assert scheduler.stats()["busy_domains"] == {}
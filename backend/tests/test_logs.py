@@ -0,0 +1,68 @@
+import time
+
+from sqlalchemy import text
+
+import main
+from database import SessionLocal
+from models import WebsiteLog
+from state_writer import state_writer
+
+
+def add_logs(site_id, count, start):
+    db = SessionLocal()
+    try:
+        db.add_all([
+            WebsiteLog(website_id=site_id, event_type="check", message=f"log {i}", timestamp=start + i)
+            for i in range(count)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def messages(site_id) -> list[str]:
+    return [log.message for log in main.get_logs(site_id, limit=500)]
+
+
+def test_save_log_is_written_by_the_state_flush(add_sites):
+    site_id = add_sites(dict())[0]
+    main.save_log(site_id, "update", "Website updated")
+    assert messages(site_id) == []
+    state_writer.flush()
+    assert messages(site_id) == ["Website updated"]
+
+
+def test_compaction_keeps_the_newest_rows_per_site(add_sites, monkeypatch):
+    monkeypatch.setattr(main, "LOG_RETENTION_COUNT", 3)
+    busy, quiet = add_sites(dict(), dict())
+    now = int(time.time())
+    add_logs(busy, 10, now - 100)
+    add_logs(quiet, 2, now - 100)
+
+    main.compact_logs()
+    assert messages(busy) == ["log 9", "log 8", "log 7"]
+    assert messages(quiet) == ["log 1", "log 0"]
+
+
+def test_compaction_applies_the_age_limit(add_sites, monkeypatch):
+    monkeypatch.setattr(main, "LOG_RETENTION_DAYS", 1)
+    site_id = add_sites(dict())[0]
+    now = int(time.time())
+    add_logs(site_id, 2, now - 2 * 86400)
+    add_logs(site_id, 1, now - 60)
+
+    main.compact_logs()
+    assert messages(site_id) == ["log 0"]       # the recent one
+
+
+def test_log_listing_uses_the_site_timestamp_index():
+    db = SessionLocal()
+    try:
+        plan = " ".join(str(row[-1]) for row in db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT * FROM website_logs WHERE website_id = 1 "
+            "ORDER BY timestamp DESC LIMIT 20"
+        )))
+    finally:
+        db.close()
+    assert "ix_website_logs_site_ts" in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,63 @@
+import pytest
+
+import metrics
+from metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture
+def registered():
+    """
+    Metrics made by a test leave the global registry afterwards
+    """
+    made = []
+
+    def make(cls, *args, **kwargs):
+        metric = cls(*args, **kwargs)
+        made.append(metric)
+        return metric
+
+    yield make
+    with metrics._registry_lock:
+        for metric in made:
+            metrics._registry.remove(metric)
+
+
+def test_histogram_buckets_are_cumulative(registered):
+    hist = registered(Histogram, "t_phase_seconds", "Phase time", ("phase",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        hist.observe(value, phase="render")
+
+    lines = hist.render().split("\n")
+    assert lines[:2] == ["# HELP t_phase_seconds Phase time", "# TYPE t_phase_seconds histogram"]
+    assert lines[2:] == [
+        't_phase_seconds_bucket{phase="render",le="0.1"} 1',
+        't_phase_seconds_bucket{phase="render",le="1"} 3',
+        't_phase_seconds_bucket{phase="render",le="+Inf"} 4',
+        't_phase_seconds_count{phase="render"} 4',
+        't_phase_seconds_sum{phase="render"} 4.05',
+    ]
+
+
+def test_counter_labels_are_escaped(registered):
+    counter = registered(Counter, "t_alerts_total", "Alerts", ("kind",))
+    counter.inc(kind='say "hi"\nnow')
+    counter.inc(2, kind='say "hi"\nnow')
+    assert counter.render().split("\n")[-1] == 't_alerts_total{kind="say \\"hi\\"\\nnow"} 3'
+
+
+def test_gauge_reads_its_source_at_scrape_time(registered):
+    depth = {"value": 1}
+    gauge = registered(Gauge, "t_queue_depth", "Queue depth", source=lambda: depth["value"])
+    depth["value"] = 7
+    assert gauge.render().split("\n")[-1] == "t_queue_depth 7"
+
+    broken = registered(Gauge, "t_broken", "Broken", source=lambda: 1 / 0)
+    assert broken.render().split("\n")[2:] == []
+
+
+def test_phase_timer_feeds_the_exposition():
+    with metrics.phase("t_phase", "portal.example"):
+        pass
+    body = metrics.render()
+    assert 'webmon_scan_phase_seconds_count{phase="t_phase",domain="portal.example"} 1' in body
+    assert body.endswith("\n")
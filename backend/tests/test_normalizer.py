@@ -0,0 +1,68 @@
+from normalizer import Normalizer, IDENTITY, validate_rules, get_normalizer, dry_run
+
+
+def test_masks_replace_noise():
+    normalizer = Normalizer(["counter", "token", "date", "time"])
+    text = "Visitors: 12,345 | updated 05/03/2024 at 10:42 PM | session a1b2c3d4e5f6g7h8i9j0k1l2m3"
+    assert normalizer.apply(text) == "<counter> | updated <date> at <time> | session <token>"
+
+
+def test_fingerprint_ignores_masked_noise_and_whitespace():
+    normalizer = Normalizer(["counter", "time"])
+    a = normalizer.fingerprint("Notice board\nTotal visitors 100\nLast sync 10:00")
+    b = normalizer.fingerprint("Notice  board\nTotal visitors 250\n\nLast sync 11:30")
+    assert a == b
+    assert a != normalizer.fingerprint("Notice board\nTotal visitors 250\nNew vacancy")
+
+
+def test_ignore_patterns_drop_matched_text():
+    normalizer = Normalizer(ignore_patterns=["Last updated:.*"])
+    assert normalizer.apply("Jobs\nLast updated: today\nMore") == "Jobs\n\nMore"
+
+
+def test_no_rules_keeps_the_plain_hash():
+    assert IDENTITY.signature == ""
+    assert IDENTITY.apply("Visitors: 10") == "Visitors: 10"
+    assert Normalizer(["time"]).signature != Normalizer(["date"]).signature
+
+
+def test_validate_rules():
+    assert validate_rules(["counter"], [r"\d+"]) == []
+    errors = validate_rules(["counter", "weather"], ["(unclosed"])
+    assert errors[0] == "unknown mask 'weather'"
+    assert errors[1].startswith("invalid ignore pattern '(unclosed'")
+
+
+def test_invalid_ignore_pattern_is_skipped():
+    normalizer = Normalizer(ignore_patterns=["(unclosed", "ads"])
+    assert "(unclosed" in normalizer.errors
+    assert normalizer.apply("ads here") == " here"
+
+
+def test_get_normalizer_caches_per_rule_set():
+    a = get_normalizer(["time", "counter"], [])
+    assert get_normalizer(["counter", "time"], None) is a
+    assert get_normalizer(["counter"], []) is not a
+
+
+def test_drop_noise_removes_changed_counters_only():
+    normalizer = Normalizer(["counter"])
+    diff = {
+        "added": ["Visitors: 101", "New: vacancy 2024"],
+        "removed": ["Visitors: 100"],
+    }
+    assert normalizer.drop_noise(diff) == {"added": ["New: vacancy 2024"], "removed": []}
+
+
+def test_dry_run_counts_changes_with_and_without_rules():
+    snapshots = [       # newest first
+        {"id": 3, "created_at": 30, "text": "Jobs\nVisitors: 300\nNew notice"},
+        {"id": 2, "created_at": 20, "text": "Jobs\nVisitors: 200"},
+        {"id": 1, "created_at": 10, "text": "Jobs\nVisitors: 100"},
+    ]
+    result = dry_run(Normalizer(["counter"]), snapshots)
+    assert result["compared"] == 2
+    assert result["changes_raw"] == 2
+    assert result["changes"] == 1
+    assert result["snapshots"][1]["noise"] == ["Visitors: 200"]
+    assert result["snapshots"][2]["changed"] is None
@@ -0,0 +1,98 @@
+import pytest
+
+import page_snapshots
+from database import SessionLocal
+from models import TextBlock
+from page_snapshots import format_diff, load_snapshots, record_snapshot, recorder, split_blocks
+
+
+def page(n=200, changed=None):
+    lines = [f"Notice {i}: recruitment update" for i in range(n)]
+    for index, line in (changed or {}).items():
+        lines[index] = line
+    return "\n".join(lines)
+
+
+@pytest.fixture
+def site(add_sites, flush_hook):
+    site_id = add_sites(dict())[0]
+    recorder.release(recorder.take())   # snapshots queued by other tests (ids get reused)
+    yield site_id, lambda: flush_hook(recorder)
+
+    db = SessionLocal()
+    try:
+        page_snapshots.delete_snapshots(db, site_id)    # snapshot_blocks have no website_id
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_inserted_line_changes_only_the_block_around_it():
+    lines = page().split("\n")
+    before = split_blocks(lines)
+    after = split_blocks(lines[:100] + ["Admit card released"] + lines[100:])
+
+    assert len(before) > 4
+    unchanged = {tuple(b) for b in before} & {tuple(b) for b in after}
+    assert len(unchanged) >= len(before) - 2
+
+
+def test_diff_against_the_unflushed_and_the_stored_snapshot(site):
+    site_id, flush = site
+    assert record_snapshot(site_id, page())["first"] is True
+
+    # previous snapshot still in memory
+    diff = record_snapshot(site_id, page(changed={5: "Exam postponed"}))
+    assert diff == {"added": ["Exam postponed"], "removed": ["Notice 5: recruitment update"], "first": False}
+
+    # previous snapshot read back from the DB
+    flush()
+    assert recorder.latest(site_id) is None
+    diff = record_snapshot(site_id, page(changed={5: "Exam postponed", 150: "Result declared"}))
+    assert diff["added"] == ["Result declared"]
+    assert diff["removed"] == ["Notice 150: recruitment update"]
+
+    assert record_snapshot(site_id, page(changed={5: "Exam postponed", 150: "Result declared"}))["added"] == []
+
+
+def test_history_is_pruned_and_readable_newest_first(site, monkeypatch):
+    site_id, flush = site
+    monkeypatch.setattr(page_snapshots, "SNAPSHOT_HISTORY", 2)
+    for version in range(3):
+        record_snapshot(site_id, page(changed={0: f"Version {version}"}))
+        flush()
+
+    snapshots = load_snapshots(site_id)
+    assert [s["text"].split("\n")[0] for s in snapshots] == ["Version 2", "Version 1"]
+    assert snapshots[0]["text"] == page(changed={0: "Version 2"})
+
+
+def test_unchanged_blocks_are_stored_once_and_orphans_collected(site):
+    site_id, flush = site
+
+    def block_count():
+        db = SessionLocal()
+        try:
+            return db.query(TextBlock).count()
+        finally:
+            db.close()
+
+    start = block_count()
+    record_snapshot(site_id, page(changed={0: "Version 0"}))
+    flush()
+    first = block_count()
+    record_snapshot(site_id, page(changed={0: "Version 1"}))
+    flush()
+    assert block_count() - first <= 1
+
+    db = SessionLocal()
+    page_snapshots.delete_snapshots(db, site_id)
+    db.commit()
+    db.close()
+    page_snapshots.collect_garbage()
+    assert block_count() <= start
+
+
+def test_format_diff_truncates_long_listings():
+    text = format_diff({"added": [f"line {i}" for i in range(10)], "removed": ["old", " "]}, max_lines=3)
+    assert text.split("\n") == ["➕ line 0", "➕ line 1", "➕ line 2", "➕ … 7 more", "➖ old"]
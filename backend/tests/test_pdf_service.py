@@ -0,0 +1,81 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import pdf_service
+
+FILES = {
+    "/notice.pdf": b"%PDF-1.4 notice A" + b"." * 1000,
+    "/mirror/notice.pdf": b"%PDF-1.4 notice A" + b"." * 1000,      # same bytes, other URL
+    "/other/notice.pdf": b"%PDF-1.4 notice B",
+    "/login.pdf": b"<html>session expired</html>",
+}
+
+
+class Portal(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+    hits = {}
+
+    def do_GET(self):
+        Portal.hits[self.path] = Portal.hits.get(self.path, 0) + 1
+        body = FILES.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.end_headers()              # no Content-Length: the limit is enforced while streaming
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def portal():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Portal)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_service, "PDF_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_service, "PDF_INDEX", str(tmp_path / "index.json"))
+    monkeypatch.setattr(pdf_service, "_index", {})
+    Portal.hits.clear()
+    return tmp_path
+
+
+def test_same_content_from_two_urls_is_stored_and_reported_once(portal, store):
+    urls = [portal + "/notice.pdf", portal + "/mirror/notice.pdf", portal + "/other/notice.pdf"]
+    results = pdf_service.fetch_pdfs(urls)
+
+    assert [r["url"] for r in results] == urls
+    assert [r["new"] for r in results] == [True, False, True]
+    assert results[0]["sha256"] == results[1]["sha256"]
+    assert all(r["filename"] == "notice.pdf" for r in results)
+    assert sorted(p for p in os.listdir(store) if p.endswith(".pdf")) == sorted(
+        {r["sha256"] + ".pdf" for r in results}
+    )
+
+
+def test_known_url_is_not_fetched_again(portal):
+    url = portal + "/notice.pdf"
+    pdf_service.fetch_pdfs([url])
+    again = pdf_service.fetch_pdfs([url, url])
+    assert [r["new"] for r in again] == [False]
+    assert Portal.hits["/notice.pdf"] == 1
+
+
+def test_non_pdf_and_oversized_responses_are_dropped(portal, store, monkeypatch):
+    monkeypatch.setattr(pdf_service, "PDF_MAX_BYTES", 100)
+    results = pdf_service.fetch_pdfs([portal + "/login.pdf", portal + "/notice.pdf", portal + "/missing.pdf"])
+    assert results == []
+    assert os.listdir(store) == []                    # no .part files left behind
+
+    assert [r["new"] for r in pdf_service.fetch_pdfs([portal + "/other/notice.pdf"])] == [True]
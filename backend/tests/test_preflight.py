@@ -0,0 +1,84 @@
+import hashlib
+
+import pytest
+
+import preflight
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=b"", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.text = body.decode("utf-8")
+        self.headers = headers or {}
+
+
+class FakeSession:
+    """
+    Returns the queued responses in order and records the request headers
+    """
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.sent.append(headers)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def session(monkeypatch):
+    def install(*responses):
+        fake = FakeSession(*responses)
+        monkeypatch.setattr(preflight, "_session", fake)
+        return fake
+    return install
+
+
+def test_not_modified_skips_and_sends_the_validators(session):
+    fake = session(FakeResponse(304))
+    result = preflight.preflight("https://a.example", etag='"v1"', last_modified="Mon, 01 Jan 2024")
+    assert result["changed"] is False
+    assert fake.sent == [{"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024"}]
+
+
+def test_same_body_hash_skips_and_new_body_escalates(session):
+    body = b"<p>Notice 1</p>"
+    known = hashlib.sha256(body).hexdigest()
+    session(FakeResponse(200, body), FakeResponse(200, b"<p>Notice 2</p>"))
+
+    assert preflight.preflight("https://a.example", body_hash=known)["changed"] is False
+    changed = preflight.preflight("https://a.example", body_hash=known)
+    assert changed["changed"] is True
+    assert changed["body_hash"] != known
+
+
+def test_body_hash_is_taken_after_noise_masking(session):
+    session(FakeResponse(200, b"visits: 10"), FakeResponse(200, b"visits: 11"))
+    mask = lambda text: text.split(":")[0]
+    first = preflight.preflight("https://a.example", normalize=mask)
+    second = preflight.preflight("https://a.example", body_hash=first["body_hash"], normalize=mask)
+    assert second["changed"] is False
+
+
+@pytest.mark.parametrize("response", [FakeResponse(403), OSError("connection reset")])
+def test_errors_and_odd_statuses_render(session, response):
+    session(response)
+    assert preflight.preflight("https://a.example", etag='"v1"', body_hash="x")["changed"] is True
+
+
+def test_render_due_after_max_skips_or_max_age(monkeypatch):
+    monkeypatch.setattr(preflight, "PREFLIGHT_MAX_SKIPS", 3)
+    monkeypatch.setattr(preflight, "PREFLIGHT_MAX_AGE", 3600)
+    now = 100_000
+    assert not preflight.render_due(2, now - 60, now)
+    assert preflight.render_due(3, now - 60, now)
+    assert preflight.render_due(0, now - 3600, now)
+    assert preflight.render_due(None, None, now)             # never rendered
+
+    monkeypatch.setattr(preflight, "PREFLIGHT_MAX_SKIPS", 0)
+    monkeypatch.setattr(preflight, "PREFLIGHT_MAX_AGE", 0)
+    assert not preflight.render_due(1000, 0, now)
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+import scan_coalescer
+from scan_coalescer import RenderCoalescer
+
+
+def page(title="Notices", png=None, error=None):
+    return {"title": title, "screenshot_png": png, "error": error}
+
+
+class Renderer:
+    """
+    Fake render(capture) → page_data; counts calls, can be held open
+    """
+    def __init__(self, png=b"png"):
+        self.calls = 0
+        self.png = png
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def __call__(self, capture):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        data = page(title=f"render {self.calls}")
+        if capture is not None and capture(data):
+            data["screenshot_png"] = self.png
+        return data
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(scan_coalescer.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_concurrent_checks_join_the_running_render():
+    coalescer = RenderCoalescer(ttl=30)
+    render = Renderer()
+    render.release.clear()
+    results = []
+
+    leader = threading.Thread(target=lambda: results.append(coalescer.render("p", render)))
+    leader.start()
+    assert render.started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(coalescer.render("p", render)))
+    follower.start()
+    while coalescer.joined == 0:
+        time.sleep(0.001)
+    render.release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert render.calls == 1
+    assert [r["title"] for r in results] == ["render 1", "render 1"]
+
+
+def test_cache_expires_after_the_ttl(clock):
+    coalescer = RenderCoalescer(ttl=30)
+    render = Renderer()
+    coalescer.render("p", render)
+
+    clock[0] += 29
+    assert coalescer.render("p", render)["title"] == "render 1"
+    clock[0] += 2
+    assert coalescer.render("p", render)["title"] == "render 2"
+    assert coalescer.cache_hits == 1
+
+
+def test_fresh_skips_the_cache(clock):
+    coalescer = RenderCoalescer(ttl=30)
+    render = Renderer()
+    coalescer.render("p", render)
+    assert coalescer.render("p", render, fresh=True)["title"] == "render 2"
+
+
+def test_expired_entries_are_purged_on_store(clock):
+    coalescer = RenderCoalescer(ttl=30)
+    render = Renderer()
+    coalescer.render("a", render)
+    coalescer.render("b", render)
+    clock[0] += 31
+    coalescer.render("c", render)
+    assert list(coalescer._cache) == ["c"]
+
+
+def test_screenshots_are_not_cached_and_alerts_render_again(clock):
+    coalescer = RenderCoalescer(ttl=30)
+    render = Renderer()
+    wants_shot = lambda data: True
+
+    first = coalescer.render("p", render, capture_if=wants_shot)
+    assert first["screenshot_png"] == b"png"
+    assert coalescer._cache["p"][1]["screenshot_png"] is None
+
+    # 📸 cached page without a screenshot → this alert gets its own render
+    second = coalescer.render("p", render, capture_if=wants_shot)
+    assert second["title"] == "render 2"
+    assert second["screenshot_png"] == b"png"
+    assert coalescer.screenshot_misses == 1
+
+    # no screenshot needed → the cached page is reused
+    assert coalescer.render("p", render, capture_if=lambda data: False)["title"] == "render 2"
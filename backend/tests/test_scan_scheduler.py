@@ -0,0 +1,156 @@
+import time
+
+import main
+from scan_scheduler import url_key
+
+
+def pick(scheduler):
+    with scheduler._cond:
+        batch, wait = scheduler._pick_due()
+    return [site_id for site_id, _, _ in batch], wait
+
+
+def test_due_sites_come_out_oldest_first(make_scheduler):
+    scheduler = make_scheduler(max_workers=10, per_domain=10)
+    now = int(time.time())
+    scheduler.upsert(1, "https://a.example/", 60, now - 70)
+    scheduler.upsert(2, "https://b.example/", 60, now - 300)
+    scheduler.upsert(3, "https://c.example/", 60, now - 100)
+    scheduler.upsert(4, "https://d.example/", 600, now - 100)     # not due yet
+
+    due, wait = pick(scheduler)
+    assert due == [2, 3, 1]
+    assert 490 < wait <= 500      # until site 4 is due
+
+
+def test_never_checked_site_is_due_now(make_scheduler):
+    scheduler = make_scheduler()
+    scheduler.upsert(1, "https://a.example/", 3600, 0)
+    assert pick(scheduler)[0] == [1]
+
+
+def test_per_domain_limit_keeps_blocked_sites_queued(make_scheduler):
+    scheduler = make_scheduler(max_workers=10, per_domain=1)
+    now = int(time.time())
+    scheduler.upsert(1, "https://ssc.example/a", 60, now - 300)
+    scheduler.upsert(2, "https://ssc.example/b", 60, now - 200)
+    scheduler.upsert(3, "https://upsc.example/", 60, now - 100)
+
+    assert pick(scheduler)[0] == [1, 3]
+    assert pick(scheduler)[0] == []
+
+    with scheduler._cond:
+        scheduler._release_slot("ssc.example")
+    assert pick(scheduler)[0] == [2]
+
+
+def test_global_worker_limit(make_scheduler):
+    scheduler = make_scheduler(max_workers=2, per_domain=10)
+    now = int(time.time())
+    for site_id in range(1, 6):
+        scheduler.upsert(site_id, f"https://s{site_id}.example/", 60, now - 100 * site_id)
+
+    assert pick(scheduler)[0] == [5, 4]
+    assert scheduler.stats()["in_flight"] == 2
+
+
+def test_site_is_rearmed_after_its_scan(make_scheduler):
+    scanned = []
+    scheduler = make_scheduler()
+    scheduler.run_scan = scanned.append
+    scheduler.upsert(1, "https://a.example/", 120, 0)
+    assert pick(scheduler)[0] == [1]
+
+    scheduler._run([1], "a.example")
+    assert scanned == [1]
+    assert not scheduler.is_running(1)
+    assert scheduler._entries[1]["due"] >= time.time() + 115
+    assert pick(scheduler)[0] == []
+
+
+def test_failed_scan_is_counted_and_rearmed(make_scheduler):
+    def boom(site_id):
+        raise RuntimeError("render crashed")
+
+    scheduler = make_scheduler()
+    scheduler.run_scan = boom
+    scheduler.upsert(1, "https://a.example/", 60, 0)
+    pick(scheduler)
+    scheduler._run([1], "a.example")
+    assert scheduler.failed == 1
+    assert scheduler._entries[1]["due"] > time.time()
+
+
+def test_removed_and_edited_sites_leave_stale_heap_items_behind(make_scheduler):
+    scheduler = make_scheduler(max_workers=10, per_domain=10)
+    now = int(time.time())
+    scheduler.upsert(1, "https://a.example/", 60, now - 100)
+    scheduler.upsert(2, "https://b.example/", 60, now - 100)
+    scheduler.remove(1)
+    scheduler.upsert(2, "https://b.example/", 3600, now - 100)     # no longer due
+
+    assert pick(scheduler)[0] == []
+    assert scheduler.stats()["sites"] == 1
+
+
+def test_sync_drops_sites_missing_from_the_db(make_scheduler):
+    scheduler = make_scheduler()
+    scheduler.upsert(1, "https://a.example/", 60, 0)
+    scheduler.sync([(2, "https://b.example/", 60, 0, False, None)])
+    assert set(scheduler._entries) == {2}
+
+
+def test_render_budget_stretches_adaptive_sites_only(make_scheduler):
+    scheduler = make_scheduler(render_budget=60)
+    scheduler.upsert(1, "https://a.example/", 120, 0)                            # 30 / hour
+    scheduler.upsert(2, "https://b.example/", 60, 0, adaptive=True, max_interval=600)
+    scheduler.upsert(3, "https://c.example/", 60, 0, adaptive=True, max_interval=90)
+
+    assert scheduler.scheduled_interval(1) == 120
+    assert scheduler.scheduled_interval(2) == 240          # 120 / hour squeezed into 30
+    assert scheduler.scheduled_interval(3) == 90           # capped at max_interval
+
+
+def test_url_key_normalizes_spelling():
+    assert url_key("HTTPS://SSC.Example:443/Jobs/#top") == "https://ssc.example/Jobs"
+    assert url_key("http://ssc.example:8080") == "http://ssc.example:8080/"
+    assert url_key("https://ssc.example/?page=2") == "https://ssc.example/?page=2"
+
+
+def test_same_url_siblings_due_soon_ride_along(make_scheduler):
+    scheduler = make_scheduler(max_workers=10, per_domain=10, coalesce_window=60)
+    now = int(time.time())
+    scheduler.upsert(1, "https://ssc.example/jobs", 300, now - 400)
+    scheduler.upsert(2, "https://SSC.example/jobs/", 300, now - 270)     # due in ~30 s
+    scheduler.upsert(3, "https://ssc.example/jobs", 300, now - 100)      # due in ~200 s
+
+    with scheduler._cond:
+        batch, _ = scheduler._pick_due()
+    assert batch == [(1, "ssc.example", [2])]
+    assert scheduler.is_running(2) and not scheduler.is_running(3)
+
+    scheduler._dispatch(batch)
+    assert scheduler._executor.submitted == [([1, 2], "ssc.example")]
+    assert scheduler.stats()["coalesced"] == 1
+
+
+def test_moved_site_leaves_its_url_group(make_scheduler):
+    scheduler = make_scheduler(coalesce_window=60)
+    scheduler.upsert(1, "https://a.example/", 60, 0)
+    scheduler.upsert(2, "https://a.example/", 60, 0)
+    assert scheduler.stats()["url_groups"] == 1
+
+    scheduler.upsert(2, "https://b.example/", 60, 0)
+    assert scheduler.stats()["url_groups"] == 0
+
+
+def test_api_writes_notify_the_schedule_index(add_sites, make_scheduler, monkeypatch):
+    scheduler = make_scheduler()
+    monkeypatch.setattr(main, "scan_scheduler", scheduler)
+    site_id = add_sites(dict(url="https://c.example/", interval=120))[0]
+
+    main.toggle_website(site_id)                    # enabled → disabled
+    assert site_id not in scheduler._entries
+    main.toggle_website(site_id)
+    assert scheduler._entries[site_id]["interval"] == 120
+    assert scheduler.notifications == 2
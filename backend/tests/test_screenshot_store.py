@@ -0,0 +1,89 @@
+import io
+import os
+
+import pytest
+from PIL import Image, ImageDraw
+
+import screenshot_store
+from database import SessionLocal
+from models import Screenshot
+
+
+def page_png(rows: int, title: str = "") -> bytes:
+    """
+    1280x720 "notice board": one text line per row
+    """
+    image = Image.new("RGB", (1280, 720), "white")
+    draw = ImageDraw.Draw(image)
+    draw.text((40, 10), title, fill="black")
+    for row in range(rows):
+        draw.text((40, 40 + row * 18), f"Notice {row + 1}: recruitment of staff 2024", fill="black")
+    out = io.BytesIO()
+    image.save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def site(add_sites):
+    return add_sites({"name": "shots"})[0]
+
+
+def rows_for(site_id):
+    db = SessionLocal()
+    try:
+        return db.query(Screenshot).filter(Screenshot.website_id == site_id).all()
+    finally:
+        db.close()
+
+
+def test_exact_repeat_is_a_duplicate(site, flush_hook):
+    first = screenshot_store.save(site, page_png(5))
+    assert not first["duplicate"]
+    assert screenshot_store.save(site, page_png(5))["duplicate"]        # still unflushed
+
+    flush_hook(screenshot_store.index)
+    again = screenshot_store.save(site, page_png(5))
+    assert again["duplicate"] and again["id"] == rows_for(site)[0].id
+
+
+def test_one_new_notice_row_is_stored_and_sent(site, flush_hook):
+    screenshot_store.save(site, page_png(5))
+    flush_hook(screenshot_store.index)
+
+    changed = screenshot_store.save(site, page_png(6))
+    assert not changed["duplicate"]
+    assert os.path.exists(changed["path"])
+    flush_hook(screenshot_store.index)
+    assert len(rows_for(site)) == 2
+
+
+def test_deleting_a_site_removes_its_unshared_files(add_sites, flush_hook):
+    gone, keeps = add_sites({"name": "gone"}, {"name": "keeps"})
+    own = screenshot_store.save(gone, page_png(1, "delete"))["path"]
+    shared = screenshot_store.save(gone, page_png(2, "delete"))["path"]
+    screenshot_store.save(keeps, page_png(2, "delete"))
+    flush_hook(screenshot_store.index)
+
+    db = SessionLocal()
+    paths = screenshot_store.delete_screenshots(db, [gone])
+    db.commit()
+    db.close()
+    assert paths == {own, shared}
+
+    assert screenshot_store.remove_unreferenced(paths) == 1
+    assert not os.path.exists(own)
+    assert os.path.exists(shared)
+    assert rows_for(gone) == []
+
+
+def test_retention_keeps_files_of_unflushed_rows(site, flush_hook, monkeypatch):
+    monkeypatch.setattr(screenshot_store, "SCREENSHOT_KEEP_PER_SITE", 1)
+    old = screenshot_store.save(site, page_png(1, "retention"))["path"]
+    screenshot_store.save(site, page_png(2, "retention"))
+    flush_hook(screenshot_store.index)
+
+    pending = screenshot_store.save(site, page_png(1, "retention"))          # same file as the pruned row
+    screenshot_store.enforce_retention()
+    assert pending["path"] == old
+    assert os.path.exists(old)
+    flush_hook(screenshot_store.index)
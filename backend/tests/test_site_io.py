@@ -0,0 +1,142 @@
+import json
+import time
+import uuid
+
+import pytest
+
+import site_io
+from database import SessionLocal
+from models import Website
+
+
+def drop_sites(condition):
+    # ORM delete: keyword rows go with their site (ids are reused)
+    db = SessionLocal()
+    try:
+        for site in db.query(Website).filter(condition):
+            db.delete(site)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_parse_csv_with_list_columns():
+    body = (
+        "name,url,interval,keywords,noise_masks,wait_selector\n"
+        'SSC,https://ssc.example/,600,admit card|result,"[""counter"", ""time""]",\n'
+    ).encode("utf-8-sig")
+    rows = site_io.parse_upload(body, "text/csv")
+    assert rows == [{
+        "name": "SSC",
+        "url": "https://ssc.example/",
+        "interval": "600",
+        "keywords": ["admit card", "result"],
+        "noise_masks": ["counter", "time"],
+    }]
+
+
+def test_parse_csv_keeps_bad_list_cells_as_row_errors():
+    rows = site_io.parse_upload(b"name,url,keywords\nA,https://a.example/,[broken\n")
+    assert rows[0]["_errors"][0].startswith("keywords:")
+
+
+def test_parse_json_list_or_wrapped():
+    sites = [{"name": "A", "url": "https://a.example/"}]
+    assert site_io.parse_upload(json.dumps(sites).encode()) == sites
+    assert site_io.parse_upload(json.dumps({"sites": sites}).encode(), "application/json") == sites
+    assert site_io.parse_upload(b"  ") == []
+
+
+def test_unreadable_uploads_are_rejected(monkeypatch):
+    with pytest.raises(site_io.UploadError):
+        site_io.parse_upload(b"[{", "application/json")
+    with pytest.raises(site_io.UploadError):
+        site_io.parse_upload(b'{"name": "A"}')
+
+    monkeypatch.setattr(site_io, "IMPORT_MAX_SITES", 2)
+    with pytest.raises(site_io.UploadError):
+        site_io.parse_upload(json.dumps([{}] * 3).encode())
+
+
+def test_validate_rows_reports_every_problem_per_row():
+    valid, errors = site_io.validate_rows([
+        {"name": "ok", "url": "https://a.example/", "keywords": ["admit", {"keyword": r"\d+", "is_regex": True}]},
+        {"name": "bad", "url": "ftp://a.example/", "interval": 0, "noise_masks": ["weather"]},
+        {"url": "https://a.example/"},
+        {"name": "regex", "url": "https://a.example/", "keywords": [{"keyword": "(a", "is_regex": True}]},
+        "not a site",
+    ])
+    assert [number for number, _ in valid] == [1]
+    assert valid[0][1].keywords[1].is_regex
+
+    by_row = {e["row"]: e["errors"] for e in errors}
+    assert by_row[2] == [
+        "url: must start with http:// or https://",
+        "interval: must be at least 1 second",
+        "unknown mask 'weather'",
+    ]
+    assert by_row[3][0].startswith("name:")
+    assert by_row[4][0].startswith("invalid regex keyword '(a'")
+    assert by_row[5] == ["not an object"]
+
+
+def test_keyword_specs_put_the_legacy_keyword_first():
+    site = site_io.WebsiteCreate(name="A", url="https://a.example/", keyword="result", keywords=[{"keyword": "admit"}])
+    assert [s.keyword for s in site_io.keyword_specs(site)] == ["result", "admit"]
+
+
+def test_import_skips_duplicates_and_staggers_first_scans():
+    host = f"https://{uuid.uuid4().hex[:8]}.example"
+    rows = [
+        {"name": "one", "url": f"{host}/jobs", "interval": 1000, "keywords": ["admit"]},
+        {"name": "two", "url": f"{host}/jobs/", "interval": 1000, "keyword": "ADMIT"},       # same as one
+        {"name": "three", "url": f"{host}/results", "interval": 1000, "keywords": ["result"]},
+    ]
+    valid, errors = site_io.validate_rows(rows)
+    assert errors == []
+
+    before = int(time.time())
+    result = site_io.import_sites(valid)
+    assert [d["row"] for d in result["duplicates"]] == [2]
+    assert len(result["created"]) == 2
+    first, second = sorted(result["created"], key=lambda c: c[3])
+    assert before <= first[3] <= before + 2
+    assert second[3] - first[3] >= 499          # 1 of 2 → half the interval later
+
+    again = site_io.import_sites(valid)
+    assert again["created"] == [] and len(again["duplicates"]) == 3
+
+    exported = json.loads("".join(site_io.export_json()))
+    mine = [row for row in exported if row["url"].startswith(host)]
+    assert {row["name"]: [k["keyword"] for k in row["keywords"]] for row in mine} == {
+        "one": ["admit"],
+        "three": ["result"],
+    }
+
+    drop_sites(Website.url.like(f"{host}%"))
+
+
+@pytest.mark.parametrize("fmt", ["json", "csv"])
+def test_export_import_round_trip_keeps_disabled_sites_disabled(fmt, add_sites):
+    host = f"https://{uuid.uuid4().hex[:8]}.example"
+    ids = add_sites(
+        dict(name="paused", url=f"{host}/paused", keyword="exam", enabled=False),
+        dict(name="active", url=f"{host}/active", keyword="exam"),
+    )
+    body = "".join(site_io.export_json() if fmt == "json" else site_io.export_csv()).encode()
+
+    drop_sites(Website.id.in_(ids))
+
+    rows = [row for row in site_io.parse_upload(body, f"text/{fmt}") if row["url"].startswith(host)]
+    valid, errors = site_io.validate_rows(rows)
+    assert errors == []
+    result = site_io.import_sites(valid, stagger=False)
+    assert sorted(row[-1] for row in result["created"]) == [False, True]
+
+    db = SessionLocal()
+    try:
+        imported = {s.name: s.enabled for s in db.query(Website).filter(Website.url.like(f"{host}%"))}
+    finally:
+        db.close()
+    drop_sites(Website.url.like(f"{host}%"))
+    assert imported == {"paused": False, "active": True}
@@ -0,0 +1,133 @@
+from sqlalchemy import text
+
+import state_writer as state_writer_module
+from database import SessionLocal
+from models import Website, WebsiteLog
+from state_writer import StateWriter
+
+
+class Hook:
+    """
+    Hook that adds nothing to the DB; fails while .broken is set
+    """
+    def __init__(self, items=()):
+        self.items = list(items)
+        self.broken = False
+        self.written, self.restored, self.released = [], [], []
+
+    def take(self):
+        batch, self.items = self.items, []
+        return batch
+
+    def write(self, db, batch):
+        if self.broken:
+            raise RuntimeError("constraint failed")
+        self.written.extend(batch)
+
+    def restore(self, batch):
+        self.restored.extend(batch)
+        self.items = batch + self.items
+
+    def release(self, batch):
+        self.released.extend(batch)
+
+
+def stored(site_id) -> Website:
+    db = SessionLocal()
+    try:
+        return db.get(Website, site_id)
+    finally:
+        db.close()
+
+
+def site_logs(site_id) -> list[str]:
+    db = SessionLocal()
+    try:
+        return [l.message for l in db.query(WebsiteLog).filter(WebsiteLog.website_id == site_id)]
+    finally:
+        db.close()
+
+
+def test_database_runs_in_wal_mode():
+    db = SessionLocal()
+    try:
+        assert db.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    finally:
+        db.close()
+
+
+def test_updates_coalesce_into_one_batched_flush(add_sites):
+    site_id = add_sites(dict())[0]
+    writer = StateWriter()
+    writer.update(site_id, last_status="error", last_checked=10)
+    writer.update(site_id, last_status="up")
+    writer.log(site_id, "up", "back")
+
+    assert stored(site_id).last_status != "up"          # nothing written yet
+    writer.flush()
+
+    site = stored(site_id)
+    assert (site.last_status, site.last_checked) == ("up", 10)
+    assert site_logs(site_id) == ["back"]
+    assert writer.stats()["updates_coalesced"] == 1
+    assert writer.flushes == 1
+
+
+def test_updates_for_deleted_rows_are_dropped(add_sites):
+    site_id = add_sites(dict())[0]
+    writer = StateWriter()
+    writer.update(site_id, last_status="up")
+    writer.update(site_id + 1000, last_status="up")
+    writer.flush()
+    assert stored(site_id).last_status == "up"
+    assert writer.failures == 0
+
+
+def test_discard_forgets_a_site(add_sites):
+    site_id = add_sites(dict(last_status="unknown"))[0]
+    writer = StateWriter()
+    writer.update(site_id, last_status="up")
+    writer.log(site_id, "up", "back")
+    writer.discard(site_id)
+    writer.flush()
+    assert stored(site_id).last_status == "unknown"
+    assert site_logs(site_id) == []
+
+
+def test_failed_flush_is_retried_with_newer_values_winning(add_sites):
+    site_id = add_sites(dict())[0]
+    writer = StateWriter()
+    hook = Hook(["row"])
+    writer.add_hook(hook)
+    hook.broken = True
+
+    writer.update(site_id, last_status="error", last_checked=1)
+    writer.flush()
+    assert writer.failures == 1 and hook.restored == ["row"]
+
+    writer.update(site_id, last_status="up")         # recorded while the batch waited
+    hook.broken = False
+    writer.flush()
+    site = stored(site_id)
+    assert (site.last_status, site.last_checked) == ("up", 1)
+    assert hook.written == ["row"] and hook.released == ["row"]
+
+
+def test_batch_is_dropped_after_max_attempts(add_sites, monkeypatch):
+    monkeypatch.setattr(state_writer_module, "STATE_FLUSH_MAX_ATTEMPTS", 2)
+    site_id = add_sites(dict(last_status="unknown"))[0]
+    writer = StateWriter()
+    hook = Hook(["row"])
+    hook.broken = True
+    writer.add_hook(hook)
+    writer.update(site_id, last_status="up")
+
+    writer.flush()
+    writer.flush()
+    assert writer.batches_dropped == 1
+    assert hook.released == ["row"]
+
+    hook.broken = False
+    writer.flush()                                   # nothing left to retry
+    assert hook.written == []
+    assert stored(site_id).last_status == "unknown"
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+
+import pytest
+
+import telegram_service
+from telegram_service import FAILED_DIR, OUTBOX_DIR, OWN_DIR, _TelegramWorker
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self.payload = payload or {"ok": status_code == 200}
+        self.text = json.dumps(self.payload)
+
+    def json(self):
+        return self.payload
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.posted = []
+
+    def post(self, url, data=None, files=None, timeout=None):
+        self.posted.append((url.rsplit("/", 1)[1], dict(data)))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def outbox(tmp_path, monkeypatch):
+    # spool paths are relative: a fresh outbox per test
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(FAILED_DIR)
+    telegram_service.heartbeat()
+    return tmp_path
+
+
+def worker_with(*responses) -> _TelegramWorker:
+    worker = _TelegramWorker()
+    worker.session = FakeSession(*responses)
+    return worker
+
+
+def message(text="Website updated", chat="1"):
+    return {
+        "id": f"{time.time_ns()}-{next(telegram_service._seq):06d}",
+        "method": "sendMessage",
+        "data": {"chat_id": chat, "text": text, "parse_mode": "Markdown"},
+        "file": None,
+        "attempts": 0,
+        "not_before": 0,
+        "created": int(time.time()),
+    }
+
+
+def spooled(folder=OWN_DIR) -> list:
+    return sorted(name for name in os.listdir(folder) if name.endswith(".json"))
+
+
+def test_message_is_spooled_until_delivered(outbox):
+    worker = worker_with(FakeResponse(200))
+    msg = message()
+    worker.put(msg)
+    assert spooled() == [f"{msg['id']}.json"]
+
+    worker._deliver(msg)
+    assert spooled() == [] and worker.pending == []
+    assert worker.sent == 1
+
+
+def test_rate_limit_honours_retry_after_for_that_chat_only(outbox):
+    worker = worker_with(FakeResponse(429, {"parameters": {"retry_after": 30}}))
+    limited, other_chat = message(chat="1"), message(chat="2")
+    worker.put(limited)
+    worker.put(other_chat)
+    worker.global_ready_at = 0
+
+    worker._deliver(limited)
+    assert limited["not_before"] >= time.time() + 29
+    worker.global_ready_at = 0
+    assert worker._next() == (other_chat, 0)
+    assert spooled() == sorted([f"{limited['id']}.json", f"{other_chat['id']}.json"])
+
+
+def test_markdown_error_is_resent_as_plain_text(outbox):
+    worker = worker_with(FakeResponse(400, {"description": "Bad Request: can't parse entities"}), FakeResponse(200))
+    msg = message(text="Exam_2024 [notice")
+    worker.put(msg)
+
+    worker._deliver(msg)
+    worker._deliver(msg)
+    assert [data.get("parse_mode") for _, data in worker.session.posted] == ["Markdown", None]
+    assert worker.sent == 1
+
+
+def test_server_errors_back_off_then_land_in_failed(outbox, monkeypatch):
+    monkeypatch.setattr(telegram_service, "TELEGRAM_MAX_ATTEMPTS", 2)
+    worker = worker_with(FakeResponse(502), FakeResponse(502))
+    msg = message()
+    worker.put(msg)
+
+    worker._deliver(msg)
+    assert msg["attempts"] == 1 and msg["not_before"] > time.time()
+    worker._deliver(msg)
+    assert spooled() == []
+    assert spooled(FAILED_DIR) == [f"{msg['id']}.json"]
+    assert worker.dropped == 1
+
+
+def test_spool_of_a_dead_worker_is_adopted_once(outbox):
+    dead = os.path.join(OUTBOX_DIR, "dead-host-1")
+    live = os.path.join(OUTBOX_DIR, "live-host-2")
+    for folder in (dead, live):
+        os.makedirs(folder)
+        with open(os.path.join(folder, "1-000001.json"), "w") as f:
+            json.dump(message(text=folder), f)
+        open(os.path.join(folder, telegram_service.ALIVE_FILE), "w").close()
+    stale = time.time() - telegram_service.OUTBOX_ORPHAN_SECONDS - 10
+    os.utime(os.path.join(dead, telegram_service.ALIVE_FILE), (stale, stale))
+
+    worker = worker_with()
+    worker.adopt()
+    assert [m["data"]["text"] for m in worker.pending] == [dead]
+    assert not os.path.exists(dead)
+    assert spooled(live) == ["1-000001.json"]
+
+    worker.adopt()
+    assert len(worker.pending) == 1
@@ -10,13 +10,45 @@ export default function Dashboard() {
 
   useEffect(() => {
     fetchWebsites()
-    const interval = setInterval(fetchWebsites, 30000)
-    return () => clearInterval(interval)
+
+    // live updates instead of fast polling: the list is reloaded when sites are
+    // added / removed / edited, or when this client fell behind (resync)
+    const source = new EventSource('/api/events')
+    const reload = () => fetchWebsites()
+    ;['hello', 'resync', 'site_added', 'site_updated', 'site_deleted', 'sites_imported', 'sites_bulk'].forEach(type =>
+      source.addEventListener(type, reload)
+    )
+    source.addEventListener('scan_finished', (e) => {
+      const event = JSON.parse((e as MessageEvent).data)
+      setWebsites(prev => prev.map(w => w.id === event.site_id ? {
+        ...w,
+        last_status: event.last_status,
+        last_checked: event.last_checked,
+        last_response_time: event.last_response_time,
+        keyword_found: event.keyword_found,
+        alert_sent: event.alert_sent,
+        effective_interval: event.effective_interval,
+        breaker_state: event.breaker_state,
+        consecutive_failures: event.consecutive_failures,
+        last_error: event.last_error
+      } : w))
+    })
+
+    // events only come from the worker process this stream is connected to:
+    // a slow revalidation picks up edits made through the others (the ETag is
+    // the site list version → a 304 costs the backend one row read)
+    const poll = setInterval(reload, 60000)
+
+    return () => {
+      clearInterval(poll)
+      source.close()
+    }
   }, [])
 
   const fetchWebsites = async () => {
     try {
-      const response = await fetch('/api/websites')
+      // revalidates with If-None-Match → 304 when nothing changed
+      const response = await fetch('/api/websites', { cache: 'no-cache' })
       if (!response.ok) throw new Error('Failed to fetch websites')
       const data = await response.json()
       setWebsites(data)